@@ -4,12 +4,29 @@ CFE Tariff Analyzer - Aplicación Principal
 Análisis interactivo de tarifas de CFE por ubicación geográfica.
 """
 
+import time
+
+# Perfil de arranque: instante de inicio del script para medir cada fase
+_T_INICIO = time.perf_counter()
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
 import streamlit as st
-import plotly.express as px
 import pandas as pd
+from packaging.version import Version
+from cache_backend import configurar_cache
+from figure_cache import get_cache_figuras
+from receipt_store import get_almacen_recibos
+from receipt_schema import get_registro_esquemas
 from data_loader import (
     load_geografia,
     load_tarifas,
+    get_indice_tarifas,
+    get_backend_datos,
+    get_almacen_sql,
     get_estados,
     get_municipios,
     get_divisiones,
@@ -17,11 +34,15 @@ from data_loader import (
     get_anios_disponibles,
     es_tarifa_horaria,
     get_data_stats,
+    hay_incrementos_nuevos,
+    actualizar_tarifas,
+    normalizar_texto,
     verificar_match_regiones,
-    calcular_variacion_diciembre,
-    calcular_variacion_componentes,
-    get_datos_tendencia_comparativa,
-    calcular_variacion_promedio_anual,
+    get_analisis_tarifa,
+    simular_recibos,
+    get_matriz_mensual,
+    calcular_ranking_diciembre,
+    calcular_matriz_componentes,
     mes_a_numero,
     numero_a_mes,
     calcular_rango_12_meses,
@@ -29,6 +50,53 @@ from data_loader import (
     MESES_NOMBRES,
 )
 
+# La app usa el cache de Streamlit; scripts y notebooks usan el LRU en proceso
+configurar_cache("streamlit")
+
+# Duración (ms) de cada fase del arranque: imports, carga CSV, estadísticas, primer render
+_tiempos_arranque = {}
+_t_fase = _T_INICIO
+
+
+def _marcar_fase(fase: str) -> None:
+    """Registra la duración de la fase que termina ahora."""
+    global _t_fase
+    ahora = time.perf_counter()
+    _tiempos_arranque[fase] = round((ahora - _t_fase) * 1000, 1)
+    _t_fase = ahora
+
+
+def _px():
+    """Importa plotly.express solo cuando se dibuja la primera gráfica."""
+    import plotly.express as px
+    return px
+
+
+def _mostrar_figura(clave: tuple, construir) -> None:
+    """
+    Dibuja una gráfica Plotly usando el cache de figuras.
+    
+    clave = (tarifa, region, anio_actual, anio_anterior, horario, tipo_cargo, tipo_grafica);
+    construir() solo se ejecuta si la figura no está en el cache.
+    """
+    st.plotly_chart(get_cache_figuras().obtener(clave, construir), use_container_width=True)
+
+
+def _bytes_a_mb(valor):
+    """Convierte bytes a MB con 2 decimales (None si no se midió)."""
+    return round(valor / 1024 ** 2, 2) if valor is not None else None
+
+
+_marcar_fase("imports")
+
+
+# Formato y paso de st.number_input por tipo de campo del esquema de recibo
+FORMATO_CAMPO_RECIBO = {
+    "numerico": ("%.2f", 1.0),
+    "monetario": ("%.2f", 0.01),
+    "factor_potencia": ("%.4f", 0.01),
+}
+
 
 def _render_formulario_datos_generales_recibo(key_suffix: str = "") -> bool:
     """HU-6.1: Bloque de datos generales del recibo. Devuelve True si todos los obligatorios están completos."""
@@ -58,7 +126,7 @@ def _render_formulario_datos_generales_recibo(key_suffix: str = "") -> bool:
     numero_servicio = st.text_input(
         "Número de servicio",
         value=st.session_state.recibo_numero_servicio,
-        key=f"recibo_numero_servicio{key_suffix}",
+        key=f"recibo_input_numero_servicio{key_suffix}",
         placeholder="Ej: 1234567890",
         help="Número de servicio del suministro (obligatorio)",
     )
@@ -73,7 +141,7 @@ def _render_formulario_datos_generales_recibo(key_suffix: str = "") -> bool:
             "Mes del periodo facturado",
             options=[""] + MESES_NOMBRES,
             index=idx_mes + 1 if st.session_state.recibo_mes else 0,
-            key=f"recibo_mes{key_suffix}",
+            key=f"recibo_select_mes{key_suffix}",
             help="Mes que corresponde al periodo del recibo (obligatorio)",
         )
         st.session_state.recibo_mes = (mes_periodo.strip() if mes_periodo else "")
@@ -86,7 +154,7 @@ def _render_formulario_datos_generales_recibo(key_suffix: str = "") -> bool:
             options=[None] + anios_recibo,
             index=idx_anio + 1 if st.session_state.recibo_anio else 0,
             format_func=lambda x: str(x) if x is not None else "Selecciona año",
-            key=f"recibo_anio{key_suffix}",
+            key=f"recibo_select_anio{key_suffix}",
             help="Año del periodo facturado (obligatorio)",
         )
         st.session_state.recibo_anio = anio_periodo
@@ -98,11 +166,869 @@ def _render_formulario_datos_generales_recibo(key_suffix: str = "") -> bool:
     )
     if not datos_completos:
         st.warning("Completa tarifa, número de servicio y periodo facturado (mes y año) para poder continuar.")
+    
+    # HU-6.2/6.3: campos variables de la tarifa; el esquema ya viene compilado del registro
+    valores_campos = {}
+    if st.session_state.recibo_tarifa:
+        esquema = get_registro_esquemas().obtener(st.session_state.recibo_tarifa)
+        st.markdown(f"##### 🧾 Datos del recibo {esquema.tarifa}")
+        if not esquema.campos:
+            st.caption(f"{esquema.tarifa} no tiene esquema de campos definido: solo se guardan los datos generales.")
+        columnas_campos = st.columns(2)
+        for i, campo in enumerate(esquema.campos):
+            etiqueta = campo.etiqueta + (" *" if campo.obligatorio else "")
+            # La clave incluye la tarifa: al cambiar de tarifa los campos capturados se reinician
+            clave = f"recibo_campo_{esquema.tarifa}_{campo.nombre}{key_suffix}"
+            with columnas_campos[i % 2]:
+                if campo.es_numerico:
+                    formato, paso = FORMATO_CAMPO_RECIBO[campo.tipo]
+                    valores_campos[campo.nombre] = st.number_input(
+                        etiqueta, value=None, step=paso, format=formato, key=clave
+                    )
+                else:
+                    valores_campos[campo.nombre] = st.text_input(etiqueta, key=clave)
+    
     if st.button("Guardar recibo", type="primary", disabled=not datos_completos, key=f"recibo_btn_guardar{key_suffix}"):
-        st.info("El guardado definitivo se implementará en HU-6.5. Los datos generales están listos.")
+        recibo = {
+            "tarifa": st.session_state.recibo_tarifa,
+            "numero_servicio": st.session_state.recibo_numero_servicio,
+            "mes": st.session_state.recibo_mes,
+            "anio": st.session_state.recibo_anio,
+            "campos": valores_campos,
+        }
+        # HU-6.4: no se guarda si algún campo no pasa las validaciones
+        recibo["campos"], errores = get_registro_esquemas().validar(recibo)
+        if errores:
+            etiquetas = {campo.nombre: campo.etiqueta for campo in esquema.campos}
+            st.error("No se pudo guardar el recibo. Revisa estos campos:\n" + "\n".join(
+                f"- **{etiquetas.get(nombre, nombre)}:** {mensaje}" for nombre, mensaje in errores.items()
+            ))
+        else:
+            try:
+                guardado = get_almacen_recibos().guardar(recibo)
+            except (ValueError, sqlite3.Error, OSError) as error:
+                st.error(f"No se pudo guardar el recibo: {error}")
+            else:
+                # HU-6.5: el registro es definitivo; no hay flujo de edición ni eliminación
+                st.success(
+                    f"✅ Recibo guardado (folio {guardado['id']}, capturado {guardado['timestamp_captura']} UTC). "
+                    "Los recibos guardados no se pueden editar ni eliminar."
+                )
     return datos_completos
 
 
+def _tabs_bajo_demanda(etiquetas: list, key: str):
+    """
+    st.tabs con seguimiento de la pestaña abierta: cambiar de pestaña reejecuta y
+    tab.open indica cuál está visible, para calcular solo esa. En versiones de
+    Streamlit sin tabs con estado se crean tabs normales (tab.open es None).
+    """
+    try:
+        return st.tabs(etiquetas, key=key, on_change="rerun")
+    except TypeError:
+        return st.tabs(etiquetas)
+
+
+def _boton_descarga_diferida(etiqueta: str, generar, key: str, version=None, etiqueta_preparar: str = "Preparar archivo", **kwargs):
+    """
+    st.download_button que genera el archivo solo al hacer clic (data callable,
+    Streamlit 1.52+) y sin reejecutar la app (on_click="ignore").
+    
+    En versiones anteriores ninguna de las dos opciones existe y falla sin
+    TypeError (la data callable se rechaza al dibujar el botón), así que se
+    decide por versión: un botón aparte (etiqueta_preparar) genera el archivo
+    y lo guarda en st.session_state junto con version, así las reejecuciones
+    no lo regeneran hasta que los datos cambien.
+    """
+    if Version(st.__version__) >= Version("1.52.0"):
+        return st.download_button(etiqueta, data=generar, key=key, on_click="ignore", **kwargs)
+    
+    clave = f"{key}_preparado"
+    preparado = st.session_state.get(clave)
+    if preparado is None or preparado["version"] != version:
+        if not st.button(
+            etiqueta_preparar, key=f"{key}_preparar", disabled=kwargs.get("disabled", False),
+            use_container_width=kwargs.get("use_container_width", False),
+        ):
+            return False
+        with st.spinner("Generando archivo..."):
+            preparado = {"version": version, "datos": generar()}
+        st.session_state[clave] = preparado
+    return st.download_button(etiqueta, data=preparado["datos"], key=key, **kwargs)
+
+
+@st.fragment
+def _render_analisis_tarifa(tarifa: str, division_seleccionada: str, anio_seleccionado: int, anio_comparativo: int, descripcion_tarifa: str):
+    """HU-2.2: Análisis de una tarifa (sub-pestaña). Fragmento: se reejecuta sin recalcular las demás tarifas."""
+    # Calcular variación
+    # Todos los cálculos de la tarifa en una sola llamada cacheada
+    analisis = get_analisis_tarifa(tarifa, division_seleccionada, anio_seleccionado, anio_comparativo)
+    resultado = analisis["diciembre"]
+    
+    if resultado["disponible"]:
+        # === HU-1.5: Descripción completa de la tarifa seleccionada ===
+        if descripcion_tarifa:
+            st.info(f"**{tarifa}** — {descripcion_tarifa}")
+        
+        # === TABLA RESUMEN ===
+        st.markdown("##### 📋 Resumen de Tarifas")
+        
+        if resultado["es_horaria"]:
+            horarios_info = [
+                ("B", "Base"),
+                ("I", "Intermedia"),
+                ("P", "Punta"),
+                ("capacidad", "Capacidad"),
+            ]
+            
+            col_headers = st.columns(5)
+            col_headers[0].markdown("**Concepto**")
+            col_headers[1].markdown(f"**Dic {anio_comparativo}**")
+            col_headers[2].markdown(f"**Dic {anio_seleccionado}**")
+            col_headers[3].markdown("**Variación**")
+            col_headers[4].markdown("**Unidad**")
+            
+            for key, nombre in horarios_info:
+                datos = resultado["horarios"].get(key, {})
+                cols = st.columns(5)
+                
+                if datos.get("actual") is not None:
+                    anterior = datos.get("anterior")
+                    actual = datos.get("actual")
+                    variacion = datos.get("variacion_pct")
+                    unidad = "$/kW" if key == "capacidad" else "$/kWh"
+                    
+                    cols[0].write(f"⏰ {nombre}" if key != "capacidad" else f"⚡ {nombre}")
+                    cols[1].write(f"${anterior:.4f}" if anterior else "N/D")
+                    cols[2].write(f"${actual:.4f}")
+                    if variacion is not None:
+                        color = "🔴" if variacion > 0 else "🟢"
+                        cols[3].write(f"{color} {variacion:+.2f}%")
+                    else:
+                        cols[3].write("N/D")
+                    cols[4].write(unidad)
+                else:
+                    cols[0].write(f"⏰ {nombre}" if key != "capacidad" else f"⚡ {nombre}")
+                    cols[1].write("N/D")
+                    cols[2].write("N/D")
+                    cols[3].write("N/D")
+                    cols[4].write("-")
+        else:
+            col_headers = st.columns(5)
+            col_headers[0].markdown("**Concepto**")
+            col_headers[1].markdown(f"**Dic {anio_comparativo}**")
+            col_headers[2].markdown(f"**Dic {anio_seleccionado}**")
+            col_headers[3].markdown("**Variación**")
+            col_headers[4].markdown("**Unidad**")
+            
+            for key, nombre, unidad in [("simple", "Variable (Energía)", "$/kWh"), ("capacidad", "Capacidad", "$/kW")]:
+                datos = resultado["horarios"].get(key, {})
+                cols = st.columns(5)
+                
+                if datos.get("actual") is not None:
+                    anterior = datos.get("anterior")
+                    actual = datos.get("actual")
+                    variacion = datos.get("variacion_pct")
+                    
+                    cols[0].write(f"📊 {nombre}")
+                    cols[1].write(f"${anterior:.4f}" if anterior else "N/D")
+                    cols[2].write(f"${actual:.4f}")
+                    if variacion is not None:
+                        color = "🔴" if variacion > 0 else "🟢"
+                        cols[3].write(f"{color} {variacion:+.2f}%")
+                    else:
+                        cols[3].write("N/D")
+                    cols[4].write(unidad)
+                else:
+                    cols[0].write(f"📊 {nombre}")
+                    cols[1].write("N/D")
+                    cols[2].write("N/D")
+                    cols[3].write("N/D")
+                    cols[4].write("-")
+        
+        # === GRÁFICA COMPARATIVA ===
+        st.markdown("##### 📊 Gráfica Comparativa")
+        
+        datos_kwh = []
+        datos_kw = []
+        
+        for key, datos_cargo in resultado["horarios"].items():
+            if datos_cargo.get("actual") is not None or datos_cargo.get("anterior") is not None:
+                if key == "B":
+                    concepto, es_capacidad = "Base", False
+                elif key == "I":
+                    concepto, es_capacidad = "Intermedia", False
+                elif key == "P":
+                    concepto, es_capacidad = "Punta", False
+                elif key == "capacidad":
+                    concepto, es_capacidad = "Capacidad", True
+                elif key == "simple":
+                    concepto, es_capacidad = "Variable", False
+                else:
+                    concepto, es_capacidad = key, False
+                
+                lista_destino = datos_kw if es_capacidad else datos_kwh
+                
+                if datos_cargo.get("anterior") is not None:
+                    lista_destino.append({
+                        "Concepto": concepto,
+                        "Año": str(anio_comparativo),
+                        "Valor": datos_cargo["anterior"]
+                    })
+                if datos_cargo.get("actual") is not None:
+                    lista_destino.append({
+                        "Concepto": concepto,
+                        "Año": str(anio_seleccionado),
+                        "Valor": datos_cargo["actual"]
+                    })
+        
+        colores = {
+            str(anio_comparativo): "#636EFA",
+            str(anio_seleccionado): "#EF553B"
+        }
+        
+        tiene_kwh = len(datos_kwh) > 0
+        tiene_kw = len(datos_kw) > 0
+        
+        if tiene_kwh and tiene_kw:
+            col_kwh, col_kw = st.columns([3, 1])
+        elif tiene_kwh:
+            col_kwh, col_kw = st.container(), None
+        elif tiene_kw:
+            col_kwh, col_kw = None, st.container()
+        else:
+            col_kwh, col_kw = None, None
+        
+        # Llave base del cache de figuras de esta tarifa
+        clave_fig = (tarifa, division_seleccionada, anio_seleccionado, anio_comparativo)
+        
+        if tiene_kwh and col_kwh:
+            with col_kwh:
+                def _figura_kwh():
+                    df_kwh = pd.DataFrame(datos_kwh)
+                    fig_kwh = _px().bar(df_kwh, x="Concepto", y="Valor", color="Año",
+                                    barmode="group", title="Variable ($/kWh)",
+                                    color_discrete_map=colores, text_auto=".2f")
+                    fig_kwh.update_layout(yaxis_title="$/kWh", xaxis_title="",
+                                        legend_title="Año", height=300, margin=dict(t=40, b=40))
+                    fig_kwh.update_traces(hovertemplate="<b>%{x}</b><br>$%{y:.4f}/kWh<extra></extra>")
+                    return fig_kwh
+                _mostrar_figura(clave_fig + (None, "Variable", "comparativa"), _figura_kwh)
+        
+        if tiene_kw and col_kw:
+            with col_kw:
+                def _figura_kw():
+                    df_kw = pd.DataFrame(datos_kw)
+                    fig_kw = _px().bar(df_kw, x="Concepto", y="Valor", color="Año",
+                                   barmode="group", title="Capacidad ($/kW)",
+                                   color_discrete_map=colores, text_auto=".2f")
+                    fig_kw.update_layout(yaxis_title="$/kW", xaxis_title="",
+                                       legend_title="Año", height=300, margin=dict(t=40, b=40),
+                                       showlegend=False)
+                    fig_kw.update_traces(hovertemplate="<b>%{x}</b><br>$%{y:.2f}/kW<extra></extra>")
+                    return fig_kw
+                _mostrar_figura(clave_fig + (None, "Capacidad", "comparativa"), _figura_kw)
+        
+        # === DESGLOSE POR COMPONENTES ===
+        st.markdown("##### 🔍 Desglose por Componente")
+        
+        if resultado["es_horaria"]:
+            horarios_analizar = [("B", "Base"), ("I", "Intermedia"), ("P", "Punta")]
+            cols_desglose = st.columns(3)
+            for idx, (horario_key, horario_nombre) in enumerate(horarios_analizar):
+                with cols_desglose[idx]:
+                    componentes = analisis["componentes"][horario_key]
+                    if componentes:
+                        datos_comp = [
+                            {"Componente": c["nombre"], "Variación": c["var_absoluta"],
+                             "Anterior": c["anterior"] or 0, "Actual": c["actual"] or 0,
+                             "Var %": c["var_pct"] or 0}
+                            for c in componentes if c["var_absoluta"] is not None
+                        ]
+                        if datos_comp:
+                            def _figura_comp():
+                                df_comp = pd.DataFrame(datos_comp)
+                                df_comp["Color"] = df_comp["Variación"].apply(
+                                    lambda x: "Subió" if x > 0 else "Bajó"
+                                )
+                                fig_comp = _px().bar(
+                                    df_comp, y="Componente", x="Variación", color="Color",
+                                    orientation="h", title=f"{horario_nombre}",
+                                    color_discrete_map={"Subió": "#EF553B", "Bajó": "#00CC96"},
+                                    text=df_comp["Var %"].apply(lambda x: f"{x:+.1f}%")
+                                )
+                                fig_comp.update_layout(
+                                    xaxis_title="$/kWh", yaxis_title="",
+                                    height=250, showlegend=False,
+                                    margin=dict(l=10, r=10, t=30, b=30)
+                                )
+                                fig_comp.update_traces(
+                                    hovertemplate="<b>%{y}</b><br>Var: $%{x:.4f}<extra></extra>"
+                                )
+                                return fig_comp
+                            _mostrar_figura(clave_fig + (horario_key, "Variable", "componentes"), _figura_comp)
+        else:
+            componentes = analisis["componentes"][None]
+            if componentes:
+                datos_comp = [
+                    {"Componente": c["nombre"], "Variación": c["var_absoluta"],
+                     "Anterior": c["anterior"] or 0, "Actual": c["actual"] or 0,
+                     "Var %": c["var_pct"] or 0}
+                    for c in componentes if c["var_absoluta"] is not None
+                ]
+                if datos_comp:
+                    def _figura_comp():
+                        df_comp = pd.DataFrame(datos_comp)
+                        df_comp["Color"] = df_comp["Variación"].apply(
+                            lambda x: "Subió 🔴" if x > 0 else "Bajó 🟢"
+                        )
+                        fig_comp = _px().bar(
+                            df_comp, y="Componente", x="Variación", color="Color",
+                            orientation="h", title="Variación por Componente",
+                            color_discrete_map={"Subió 🔴": "#EF553B", "Bajó 🟢": "#00CC96"},
+                            text=df_comp["Var %"].apply(lambda x: f"{x:+.1f}%")
+                        )
+                        fig_comp.update_layout(
+                            xaxis_title="Variación ($/kWh)", yaxis_title="",
+                            height=300, showlegend=True, legend_title="",
+                            margin=dict(l=10, r=10, t=40, b=40)
+                        )
+                        return fig_comp
+                    _mostrar_figura(clave_fig + (None, "Variable", "componentes"), _figura_comp)
+        
+        # === COMPONENTES A LO LARGO DEL HISTÓRICO ===
+        st.markdown("##### 🧭 Componentes en el Histórico")
+        st.caption("Qué componentes impulsaron el cambio del cargo Variable entre cada par de diciembres consecutivos")
+        
+        if resultado["es_horaria"]:
+            horario_historial = st.radio(
+                "Horario",
+                options=["B", "I", "P"],
+                format_func={"B": "Base", "I": "Intermedia", "P": "Punta"}.get,
+                horizontal=True,
+                key=f"horario_historial_{tarifa}",
+            )
+        else:
+            horario_historial = None
+        
+        matriz = calcular_matriz_componentes(tarifa, division_seleccionada, horario_historial, "Variable")
+        if not matriz.empty:
+            def _figura_historial():
+                df_hist = matriz.assign(
+                    Periodo=matriz["anio_anterior"].astype(str) + "→" + matriz["anio"].astype(str),
+                    Componente=matriz["nombre"],
+                    Variacion=matriz["var_absoluta"],
+                    VarPct=matriz["var_pct"],
+                )
+                fig_hist = _px().bar(
+                    df_hist, x="Periodo", y="Variacion", color="Componente",
+                    barmode="relative", custom_data=["VarPct"],
+                    title="Variación por componente (Dic vs Dic)"
+                )
+                fig_hist.update_layout(
+                    xaxis_title="", yaxis_title="Variación ($/kWh)",
+                    height=350, legend_title="", margin=dict(t=40, b=40)
+                )
+                fig_hist.update_traces(
+                    hovertemplate="<b>%{x}</b><br>Var: $%{y:.4f} (%{customdata[0]:+.1f}%)<extra></extra>"
+                )
+                return fig_hist
+            _mostrar_figura((tarifa, division_seleccionada, None, None, horario_historial, "Variable", "historial"), _figura_historial)
+        else:
+            st.info("Sin datos de componentes en el histórico")
+        
+        # === KPI DE PROMEDIO ANUAL (HU-3.1) ===
+        st.markdown("##### 📊 Promedio Anual")
+        
+        if resultado["es_horaria"]:
+            prom_fijo = analisis["promedio_fijo"]
+            cols_fijo_horarios = st.columns([1, 1, 1, 1])
+            with cols_fijo_horarios[0]:
+                if prom_fijo["disponible"]:
+                    st.metric(
+                        label="📋 Cargo Fijo",
+                        value=f"${prom_fijo['promedio_actual']:.2f}/mes",
+                        delta=f"{prom_fijo['variacion_pct']:+.1f}%",
+                        delta_color="inverse",
+                        help=f"Promedio de {prom_fijo['num_meses_comunes']} meses. Anterior: ${prom_fijo['promedio_anterior']:.2f}"
+                    )
+                else:
+                    st.metric(label="📋 Cargo Fijo", value="N/D", delta="Sin datos")
+            horarios_prom = [("B", "Base"), ("I", "Intermedia"), ("P", "Punta")]
+            for idx, (horario_key, horario_nombre) in enumerate(horarios_prom):
+                with cols_fijo_horarios[idx + 1]:
+                    prom_data = analisis["promedios"][horario_key]
+                    if prom_data["disponible"]:
+                        st.metric(
+                            label=f"⏰ {horario_nombre}",
+                            value=f"${prom_data['promedio_actual']:.4f}/kWh",
+                            delta=f"{prom_data['variacion_pct']:+.1f}%",
+                            delta_color="inverse",
+                            help=f"Promedio de {prom_data['num_meses_comunes']} meses. Anterior: ${prom_data['promedio_anterior']:.4f}"
+                        )
+                    else:
+                        st.metric(label=f"⏰ {horario_nombre}", value="N/D", delta="Sin datos")
+            st.caption("🕐 **Horarios típicos:** Base (0:00-6:00) | Intermedia (6:00-18:00, 22:00-0:00) | Punta (18:00-22:00)")
+        else:
+            cols_simple = st.columns(2)
+            with cols_simple[0]:
+                prom_fijo = analisis["promedio_fijo"]
+                if prom_fijo["disponible"]:
+                    st.metric(
+                        label="📋 Promedio Cargo Fijo",
+                        value=f"${prom_fijo['promedio_actual']:.2f}/mes",
+                        delta=f"{prom_fijo['variacion_pct']:+.1f}%",
+                        delta_color="inverse",
+                        help=f"Promedio de {prom_fijo['num_meses_comunes']} meses. Anterior: ${prom_fijo['promedio_anterior']:.2f}"
+                    )
+                else:
+                    st.metric(label="📋 Promedio Cargo Fijo", value="N/D", delta="Sin datos")
+            with cols_simple[1]:
+                prom_data = analisis["promedios"][None]
+                if prom_data["disponible"]:
+                    st.metric(
+                        label="⚡ Promedio Variable (Energía)",
+                        value=f"${prom_data['promedio_actual']:.4f}/kWh",
+                        delta=f"{prom_data['variacion_pct']:+.1f}%",
+                        delta_color="inverse",
+                        help=f"Promedio de {prom_data['num_meses_comunes']} meses. Anterior: ${prom_data['promedio_anterior']:.4f}"
+                    )
+                else:
+                    st.metric(label="⚡ Promedio Variable", value="N/D", delta="Sin datos")
+        
+        # === GRÁFICA DE TENDENCIA MENSUAL (HU-3.4) ===
+        st.markdown("##### 📈 Tendencia Mensual")
+        
+        if resultado["es_horaria"]:
+            horarios_tendencia = [("B", "Base"), ("I", "Intermedia"), ("P", "Punta")]
+            cols_tendencia = st.columns(3)
+            for idx, (horario_key, horario_nombre) in enumerate(horarios_tendencia):
+                with cols_tendencia[idx]:
+                    datos_tend = analisis["tendencias"][horario_key]
+                    if datos_tend:
+                        def _figura_tend():
+                            df_tend = pd.DataFrame(datos_tend)
+                            df_tend = df_tend.sort_values("Mes_Num")
+                            fig_tend = _px().line(
+                                df_tend, x="Mes", y="Valor", color="Año",
+                                title=f"{horario_nombre}",
+                                markers=True,
+                                color_discrete_map={
+                                    str(anio_comparativo): "#636EFA",
+                                    str(anio_seleccionado): "#EF553B"
+                                }
+                            )
+                            fig_tend.update_layout(
+                                xaxis_title="", yaxis_title="$/kWh",
+                                height=280, showlegend=True,
+                                legend=dict(orientation="h", yanchor="bottom", y=1.02),
+                                margin=dict(l=10, r=10, t=50, b=30)
+                            )
+                            fig_tend.update_traces(
+                                hovertemplate="<b>%{x}</b><br>$%{y:.4f}/kWh<extra></extra>"
+                            )
+                            return fig_tend
+                        _mostrar_figura(clave_fig + (horario_key, "Variable", "tendencia"), _figura_tend)
+                    else:
+                        st.info(f"Sin datos para {horario_nombre}")
+        else:
+            datos_tend = analisis["tendencias"][None]
+            if datos_tend:
+                def _figura_tend():
+                    df_tend = pd.DataFrame(datos_tend)
+                    df_tend = df_tend.sort_values("Mes_Num")
+                    fig_tend = _px().line(
+                        df_tend, x="Mes", y="Valor", color="Año",
+                        title="Evolución Mensual Variable (Energía)",
+                        markers=True,
+                        color_discrete_map={
+                            str(anio_comparativo): "#636EFA",
+                            str(anio_seleccionado): "#EF553B"
+                        }
+                    )
+                    fig_tend.update_layout(
+                        xaxis_title="Mes", yaxis_title="$/kWh",
+                        height=350, showlegend=True,
+                        legend=dict(orientation="h", yanchor="bottom", y=1.02),
+                        margin=dict(l=10, r=10, t=50, b=40)
+                    )
+                    fig_tend.update_traces(
+                        hovertemplate="<b>%{x}</b><br>$%{y:.4f}/kWh<extra></extra>"
+                    )
+                    return fig_tend
+                _mostrar_figura(clave_fig + (None, "Variable", "tendencia"), _figura_tend)
+            else:
+                st.info("Sin datos de tendencia mensual")
+    else:
+        st.warning(f"No hay datos de diciembre para {tarifa} en {anio_seleccionado} o {anio_comparativo}")
+
+
+@st.fragment
+def _render_tab_analisis(division_seleccionada: str, tarifas_seleccionadas: list, anio_seleccionado: int, anio_comparativo: int, tarifa_descripcion: dict):
+    """Tab Análisis de Comportamiento. Fragmento: sus interacciones no reejecutan el resto de la app."""
+    # KPI de Variación Total Diciembre (HU-2.1)
+    st.markdown("---")
+    st.subheader("📊 Comparativo Diciembre vs Diciembre")
+    st.caption(f"Variación del costo total entre diciembre {anio_comparativo} y diciembre {anio_seleccionado}")
+    
+    # Obtener años para la validación
+    anios = get_anios_disponibles()
+    
+    # Advertencia si es el año más reciente (puede no tener diciembre)
+    if anio_seleccionado == max(anios):
+        st.warning(f"⚠️ {anio_seleccionado} es el año más reciente. Si no hay datos de diciembre, selecciona un año anterior.")
+    
+    # Pestañas por tarifa (HU-2.2 mejora de UX): solo se calcula la pestaña abierta
+    tabs = _tabs_bajo_demanda(tarifas_seleccionadas, key=f"tabs_analisis_{'_'.join(tarifas_seleccionadas)}")
+    
+    for tab, tarifa in zip(tabs, tarifas_seleccionadas):
+        with tab:
+            # open es False solo para pestañas ocultas con tabs bajo demanda; None = sin seguimiento
+            if getattr(tab, "open", None) is False:
+                continue
+            _render_analisis_tarifa(
+                tarifa, division_seleccionada, anio_seleccionado, anio_comparativo,
+                tarifa_descripcion.get(tarifa, "")
+            )
+
+
+@st.fragment
+def _render_tab_historico(division_seleccionada: str, tarifas_seleccionadas: list, anio_seleccionado: int):
+    """HU-5.1: Tab Generar Histórico. Fragmento: cambiar tarifa o mes final solo reejecuta este tab."""
+    # Una tarifa para el histórico (selector si hay varias)
+    if len(tarifas_seleccionadas) == 1:
+        tarifa_historico = tarifas_seleccionadas[0]
+    else:
+        tarifa_historico = st.selectbox(
+            "Tarifa para histórico",
+            options=tarifas_seleccionadas,
+            key="tarifa_historico",
+            help="Elige la tarifa para generar la tabla de 12 meses"
+        )
+    
+    st.subheader("📋 Rango de 12 meses")
+    mes_final_nombre = st.selectbox(
+        "Mes final del rango",
+        options=MESES_NOMBRES,
+        index=11,
+        key="mes_final_historico",
+        help="Se calcularán 12 meses hacia atrás desde este mes y año"
+    )
+    mes_final_num = mes_a_numero(mes_final_nombre)
+    
+    # Calcular rango con casos borde
+    rango = calcular_rango_12_meses(
+        mes_final_num, anio_seleccionado,
+        tarifa=tarifa_historico, division=division_seleccionada
+    )
+    mes_inicial, anio_inicial, mes_final_ajustado, anio_final_ajustado, mensaje_info = rango
+    
+    if mensaje_info:
+        st.info(mensaje_info)
+    
+    # Filtrar datos en el rango: solo se leen las particiones (año, tarifa) del rango
+    df_tarifas = load_tarifas(
+        anios=tuple(range(anio_inicial, anio_final_ajustado + 1)), tarifas=(tarifa_historico,)
+    )
+    start_ord = anio_inicial * 12 + mes_inicial
+    end_ord = anio_final_ajustado * 12 + mes_final_ajustado
+    fecha_ord = df_tarifas["anio"] * 12 + df_tarifas["mes_numero"]
+    mask_hist = (
+        (df_tarifas["region"] == division_seleccionada.upper().strip()) &
+        (df_tarifas["tarifa"] == tarifa_historico) &
+        (fecha_ord >= start_ord) &
+        (fecha_ord <= end_ord)
+    )
+    df_hist = df_tarifas.loc[mask_hist].copy()
+    df_hist = df_hist.sort_values(by=["anio", "mes_numero", "cargo", "int_horario"], ignore_index=True)
+
+    # Vista pivotada: una fila por mes (Año, Mes, Fecha, Cargo Fijo, Base, Intermedia, Punta, Cargo Cap)
+    df_vista = pivotar_historico_por_mes(df_hist)
+
+    def fmt_miles(v):
+        if v is None or (isinstance(v, float) and pd.isna(v)):
+            return ""
+        return f"{float(v):,.2f}"
+
+    def fmt_cuatro(v):
+        if v is None or (isinstance(v, float) and pd.isna(v)):
+            return ""
+        return f"{float(v):.4f}"
+
+    df_display = df_vista.copy()
+    for col in ["Cargo Fijo", "Cargo Cap"]:
+        if col in df_display.columns:
+            df_display[col] = df_display[col].apply(fmt_miles)
+    for col in ["Base", "Intermedia", "Punta"]:
+        if col in df_display.columns:
+            df_display[col] = df_display[col].apply(fmt_cuatro)
+
+    st.caption(f"**Total:** {len(df_display)} meses. Rango: {numero_a_mes(mes_inicial)} {anio_inicial} — {numero_a_mes(mes_final_ajustado)} {anio_final_ajustado}")
+
+    if df_display.empty:
+        st.warning("No hay datos en el rango calculado para esta tarifa y división.")
+    else:
+        st.dataframe(
+            df_display,
+            use_container_width=True,
+            column_config={
+                "Año": st.column_config.NumberColumn("Año", format="%d", width="small"),
+                "Mes": st.column_config.TextColumn("Mes", width="medium"),
+                "Fecha": st.column_config.TextColumn("Fecha", width="small"),
+                "Cargo Fijo": st.column_config.TextColumn("Cargo Fijo", width="medium"),
+                "Base": st.column_config.TextColumn("Base", width="medium"),
+                "Intermedia": st.column_config.TextColumn("Intermedia", width="medium"),
+                "Punta": st.column_config.TextColumn("Punta", width="medium"),
+                "Cargo Cap": st.column_config.TextColumn("Cargo Cap", width="medium"),
+            },
+        )
+
+        # Exportar CSV: mismo contenido mostrado (vista pivotada formateada)
+        nombre_archivo = f"historico_{tarifa_historico}_{division_seleccionada.replace(' ', '_')}_{numero_a_mes(mes_inicial)}{anio_inicial}_{numero_a_mes(mes_final_ajustado)}{anio_final_ajustado}.csv"
+        csv_bytes = df_display.to_csv(index=False, encoding="utf-8")
+        st.download_button(
+            "Descargar CSV",
+            data=csv_bytes,
+            file_name=nombre_archivo,
+            mime="text/csv",
+            key="download_historico_csv"
+        )
+
+
+# Nombre de cada concepto del comparativo de diciembre en el ranking nacional
+NOMBRES_CONCEPTO_RANKING = {
+    "B": "Base",
+    "I": "Intermedia",
+    "P": "Punta",
+    "simple": "Variable (Energía)",
+    "capacidad": "Capacidad",
+}
+
+
+@st.fragment
+def _render_tab_ranking(anio_predeterminado: int = None, key_suffix: str = ""):
+    """Tab Ranking Nacional: variación diciembre vs diciembre de todas las divisiones y tarifas."""
+    st.subheader("🏆 Ranking Nacional Diciembre vs Diciembre")
+    # Años con año anterior para comparar; default: año del análisis o el más reciente
+    anios = get_anios_disponibles()
+    if not anios:
+        st.info("Se necesitan al menos dos años de datos para el ranking")
+        return
+    index_anio = anios.index(anio_predeterminado) if anio_predeterminado in anios else len(anios) - 1
+    col_r1, col_r2, col_r3 = st.columns(3)
+    with col_r1:
+        anio_ranking = st.selectbox(
+            "Año de análisis",
+            options=anios,
+            index=index_anio,
+            key=f"ranking_anio{key_suffix}",
+            help="Se compara diciembre de este año contra diciembre del año anterior"
+        )
+    
+    ranking = calcular_ranking_diciembre(anio_ranking, anio_ranking - 1)
+    if ranking.empty:
+        st.warning(f"No hay datos de diciembre para comparar {anio_ranking} vs {anio_ranking - 1}")
+        return
+    
+    with col_r2:
+        tarifas_ranking = st.multiselect(
+            "Tarifas",
+            options=sorted(ranking["tarifa"].unique()),
+            key=f"ranking_tarifas{key_suffix}",
+            help="Vacío = todas las tarifas"
+        )
+    with col_r3:
+        conceptos_ranking = st.multiselect(
+            "Conceptos",
+            options=[c for c in NOMBRES_CONCEPTO_RANKING if c in set(ranking["concepto"])],
+            format_func=NOMBRES_CONCEPTO_RANKING.get,
+            key=f"ranking_conceptos{key_suffix}",
+            help="Vacío = todos los conceptos"
+        )
+    
+    if tarifas_ranking:
+        ranking = ranking[ranking["tarifa"].isin(tarifas_ranking)]
+    if conceptos_ranking:
+        ranking = ranking[ranking["concepto"].isin(conceptos_ranking)]
+    
+    df_display = ranking.assign(
+        concepto=ranking["concepto"].map(NOMBRES_CONCEPTO_RANKING),
+        unidad=ranking["concepto"].map(lambda c: "$/kW" if c == "capacidad" else "$/kWh"),
+    ).rename(columns={
+        "posicion": "Posición",
+        "tarifa": "Tarifa",
+        "region": "División",
+        "concepto": "Concepto",
+        "anterior": f"Dic {anio_ranking - 1}",
+        "actual": f"Dic {anio_ranking}",
+        "variacion_pct": "Variación %",
+        "unidad": "Unidad",
+    })[["Posición", "Tarifa", "División", "Concepto", f"Dic {anio_ranking - 1}", f"Dic {anio_ranking}", "Variación %", "Unidad"]]
+    
+    st.caption(
+        f"**Total:** {len(df_display)} combinaciones división × tarifa × concepto. "
+        "Posición 1 = mayor alza dentro de su tarifa y concepto. Haz clic en un encabezado para ordenar."
+    )
+    st.dataframe(
+        df_display,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Posición": st.column_config.NumberColumn("Posición", format="%d", width="small"),
+            f"Dic {anio_ranking - 1}": st.column_config.NumberColumn(f"Dic {anio_ranking - 1}", format="$%.4f"),
+            f"Dic {anio_ranking}": st.column_config.NumberColumn(f"Dic {anio_ranking}", format="$%.4f"),
+            "Variación %": st.column_config.NumberColumn("Variación %", format="%+.2f%%"),
+        },
+    )
+
+
+# Sliders de consumo de tarifas horarias: (periodo, nombre, kWh por default)
+PERIODOS_SIMULADOR = [("B", "Base", 10_000), ("I", "Intermedia", 20_000), ("P", "Punta", 5_000)]
+
+NOMBRES_IMPORTE_RECIBO = {"fijo": "Cargo Fijo", "energia": "Energía", "capacidad": "Capacidad"}
+
+
+@st.fragment
+def _render_tab_simulador(division_seleccionada: str, tarifas_seleccionadas: list, anio_seleccionado: int):
+    """Tab Simulador de Recibo. Fragmento: mover los sliders solo reejecuta este tab."""
+    if len(tarifas_seleccionadas) == 1:
+        tarifa_simulador = tarifas_seleccionadas[0]
+    else:
+        tarifa_simulador = st.selectbox(
+            "Tarifa a simular",
+            options=tarifas_seleccionadas,
+            key="tarifa_simulador",
+            help="Elige la tarifa con la que se calcula el recibo"
+        )
+    
+    st.subheader("🧮 Simulador de Recibo")
+    st.caption(
+        f"Recibo en pesos de un mismo consumo mensual con las tarifas de cada mes del histórico "
+        f"({tarifa_simulador}, {division_seleccionada})"
+    )
+    
+    es_horaria = es_tarifa_horaria(tarifa_simulador)
+    tiene_capacidad = not get_matriz_mensual(tarifa_simulador, division_seleccionada, "Capacidad").empty
+    columnas_consumo = st.columns(4 if es_horaria else 2)
+    kwh, kwh_periodos = 0, None
+    if es_horaria:
+        kwh_periodos = {}
+        for col, (periodo, nombre, default) in zip(columnas_consumo, PERIODOS_SIMULADOR):
+            with col:
+                kwh_periodos[periodo] = st.slider(
+                    f"kWh {nombre}", min_value=0, max_value=200_000, value=default, step=500,
+                    key=f"simulador_kwh_{periodo}"
+                )
+    else:
+        with columnas_consumo[0]:
+            kwh = st.slider(
+                "Consumo mensual (kWh)", min_value=0, max_value=50_000, value=1_000, step=50,
+                key="simulador_kwh"
+            )
+    demanda_kw = 0
+    with columnas_consumo[-1]:
+        if tiene_capacidad:
+            demanda_kw = st.slider(
+                "Demanda (kW)", min_value=0, max_value=2_000, value=100, step=5,
+                key="simulador_demanda_kw",
+                help="Se cobra con el cargo de Capacidad ($/kW)"
+            )
+        else:
+            st.caption(f"{tarifa_simulador} no tiene cargo de Capacidad: la demanda no cambia el recibo.")
+    
+    simulacion = simular_recibos(
+        tarifa_simulador, division_seleccionada, kwh=kwh, kwh_periodos=kwh_periodos, demanda_kw=demanda_kw
+    )
+    mensual, diciembre = simulacion["mensual"], simulacion["diciembre"]
+    if mensual.empty:
+        st.warning(f"No hay tarifas de {tarifa_simulador} para esta división.")
+        return
+    
+    # Impacto diciembre vs diciembre en pesos para el año de análisis
+    st.markdown(f"##### 📅 Recibo de Diciembre {anio_seleccionado - 1} vs {anio_seleccionado}")
+    cierre = diciembre[diciembre["anio"] == anio_seleccionado]
+    total_actual = cierre["total"].iloc[0] if not cierre.empty else float("nan")
+    total_anterior = cierre["anterior"].iloc[0] if not cierre.empty else float("nan")
+    col_m1, col_m2, col_m3 = st.columns(3)
+    with col_m1:
+        st.metric(f"Recibo Dic {anio_seleccionado - 1}", f"${total_anterior:,.2f}" if pd.notna(total_anterior) else "N/D")
+    with col_m2:
+        st.metric(f"Recibo Dic {anio_seleccionado}", f"${total_actual:,.2f}" if pd.notna(total_actual) else "N/D")
+    with col_m3:
+        if pd.notna(total_actual) and pd.notna(total_anterior):
+            impacto = total_actual - total_anterior
+            st.metric(
+                "Impacto en el recibo",
+                f"{'+' if impacto >= 0 else '-'}${abs(impacto):,.2f}",
+                delta=f"{cierre['var_pct'].iloc[0]:+.1f}%",
+                delta_color="inverse",
+            )
+        else:
+            st.metric("Impacto en el recibo", "N/D", delta="Sin datos")
+    
+    # Trayectoria del recibo en todo el histórico, apilada por concepto
+    df_trayectoria = mensual.melt(
+        id_vars=["fecha"], value_vars=list(NOMBRES_IMPORTE_RECIBO), var_name="Concepto", value_name="Importe"
+    )
+    df_trayectoria["Concepto"] = df_trayectoria["Concepto"].map(NOMBRES_IMPORTE_RECIBO)
+    fig_trayectoria = _px().area(
+        df_trayectoria, x="fecha", y="Importe", color="Concepto",
+        title="Recibo mensual simulado"
+    )
+    fig_trayectoria.update_layout(
+        xaxis_title="", yaxis_title="Recibo ($)",
+        height=350, legend_title="", margin=dict(t=40, b=40)
+    )
+    fig_trayectoria.update_traces(hovertemplate="<b>%{x|%b %Y}</b><br>$%{y:,.2f}<extra></extra>")
+    st.plotly_chart(fig_trayectoria, use_container_width=True)
+    st.caption("Los meses sin alguna de las tarifas que usa el consumo quedan en blanco.")
+    
+    df_diciembre = diciembre.rename(columns={
+        "anio": "Año",
+        "fijo": "Cargo Fijo",
+        "energia": "Energía",
+        "capacidad": "Capacidad",
+        "total": "Recibo Dic",
+        "var_absoluta": "Impacto vs Dic anterior",
+        "var_pct": "Variación %",
+    }).drop(columns="anterior")
+    formato_pesos = {col: st.column_config.NumberColumn(col, format="$%.2f") for col in ["Cargo Fijo", "Energía", "Capacidad", "Recibo Dic", "Impacto vs Dic anterior"]}
+    st.dataframe(
+        df_diciembre,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Año": st.column_config.NumberColumn("Año", format="%d", width="small"),
+            **formato_pesos,
+            "Variación %": st.column_config.NumberColumn("Variación %", format="%+.2f%%"),
+        },
+    )
+
+
+@st.fragment
+def _render_tab_captura(key_suffix: str = ""):
+    """HU-6.1: Tab Captura de Datos. Fragmento: capturar el recibo no reejecuta el análisis."""
+    _render_formulario_datos_generales_recibo(key_suffix=key_suffix)
+    
+    # HU-6.6: exportación del histórico completo. El CSV se genera por bloques al hacer clic
+    st.markdown("---")
+    st.subheader("📤 Exportar histórico")
+    almacen = get_almacen_recibos()
+    total_recibos = almacen.contar()
+    st.caption(f"{total_recibos:,} recibos guardados. Columnas: datos generales + todos los campos de todas las tarifas.")
+    _boton_descarga_diferida(
+        "Exportar histórico a CSV",
+        lambda: b"".join(almacen.iterar_csv()),
+        file_name=f"recibos_historico_{datetime.now():%Y%m%d}.csv",
+        mime="text/csv",
+        disabled=total_recibos == 0,
+        key=f"recibo_btn_exportar{key_suffix}",
+        version=total_recibos,
+        etiqueta_preparar="Preparar CSV",
+        use_container_width=True,
+    )
+
+
 # Configuración de la página
 st.set_page_config(
     page_title="CFE - Analizador de Tarifas",
@@ -123,9 +1049,29 @@ st.markdown("---")
 # Cargar datos al iniciar
 with st.spinner("Cargando datos..."):
     df_geografia = load_geografia()
-    df_tarifas = load_tarifas()
+    # Con CFE_DATA_BACKEND=sqlite las vistas consultan la base local: no se carga el histórico completo.
+    # Con pandas se prepara el índice compartido (cache_resource): una sola copia del histórico,
+    # sin deserializar otra en cada reejecución como haría load_tarifas() con cache_data
+    if get_backend_datos() == "sqlite":
+        get_almacen_sql()
+    else:
+        get_indice_tarifas()
+    # Meses nuevos dejados en data/: se agregan sin recargar el histórico completo
+    if hay_incrementos_nuevos():
+        actualizacion = actualizar_tarifas()
+        if actualizacion["recarga_completa"]:
+            get_cache_figuras().limpiar()
+        else:
+            series_actualizadas = {(tarifa, region) for tarifa, region, _ in actualizacion["afectadas"]}
+            get_cache_figuras().invalidar(
+                lambda clave: (clave[0], normalizar_texto(clave[1])) in series_actualizadas
+            )
+        if actualizacion["archivos"]:
+            st.toast(f"📥 Datos nuevos agregados: {', '.join(actualizacion['archivos'])} ({actualizacion['filas']} filas)")
+    _marcar_fase("carga_csv")
     stats = get_data_stats()
     match_info = verificar_match_regiones()
+    _marcar_fase("estadisticas")
 
 # Inicializar session_state para mantener estado entre modos
 if 'estado_seleccionado' not in st.session_state:
@@ -198,6 +1144,9 @@ else:
     if match_info["solo_en_tarifas"]:
         st.caption(f"Solo en tarifas: {', '.join(match_info['solo_en_tarifas'])}")
 
+# Pantalla de bienvenida completa: fin del primer render
+_marcar_fase("primer_render")
+
 # Selectores Geográficos (Feature 1: Smart Locator)
 st.markdown("---")
 st.subheader("📍 Selector Geográfico")
@@ -398,516 +1347,38 @@ if tarifas_seleccionadas:
     
     # Sistema de navegación con tabs (HU-5.2)
     st.markdown("---")
-    modo_tabs = st.tabs(["📊 Análisis de Comportamiento", "📋 Generar Histórico", "📥 Captura de Datos"])
+    modo_tabs = st.tabs(["📊 Análisis de Comportamiento", "📋 Generar Histórico", "🏆 Ranking Nacional", "🧮 Simulador de Recibo", "📥 Captura de Datos"])
     
     # Tab 1: Análisis de Comportamiento (Features 2 y 3 existentes)
     with modo_tabs[0]:
         if division_seleccionada and tarifas_seleccionadas and anio_seleccionado:
-            # KPI de Variación Total Diciembre (HU-2.1)
-            st.markdown("---")
-            st.subheader("📊 Comparativo Diciembre vs Diciembre")
-            st.caption(f"Variación del costo total entre diciembre {anio_comparativo} y diciembre {anio_seleccionado}")
-            
-            # Obtener años para la validación
-            anios = get_anios_disponibles()
-            
-            # Advertencia si es el año más reciente (puede no tener diciembre)
-            if anio_seleccionado == max(anios):
-                st.warning(f"⚠️ {anio_seleccionado} es el año más reciente. Si no hay datos de diciembre, selecciona un año anterior.")
-            
-            # Pestañas por tarifa (HU-2.2 mejora de UX)
-            tabs = st.tabs(tarifas_seleccionadas)
-            
-            for tab, tarifa in zip(tabs, tarifas_seleccionadas):
-                with tab:
-                    # Calcular variación
-                    resultado = calcular_variacion_diciembre(
-                        tarifa=tarifa,
-                        region=division_seleccionada,
-                        anio_actual=anio_seleccionado,
-                        anio_anterior=anio_comparativo
-                    )
-                    
-                    if resultado["disponible"]:
-                        # === HU-1.5: Descripción completa de la tarifa seleccionada ===
-                        descripcion_tarifa = tarifa_descripcion.get(tarifa, "")
-                        if descripcion_tarifa:
-                            st.info(f"**{tarifa}** — {descripcion_tarifa}")
-                        
-                        # === TABLA RESUMEN ===
-                        st.markdown("##### 📋 Resumen de Tarifas")
-                        
-                        if resultado["es_horaria"]:
-                            horarios_info = [
-                                ("B", "Base"),
-                                ("I", "Intermedia"),
-                                ("P", "Punta"),
-                                ("capacidad", "Capacidad"),
-                            ]
-                            
-                            col_headers = st.columns(5)
-                            col_headers[0].markdown("**Concepto**")
-                            col_headers[1].markdown(f"**Dic {anio_comparativo}**")
-                            col_headers[2].markdown(f"**Dic {anio_seleccionado}**")
-                            col_headers[3].markdown("**Variación**")
-                            col_headers[4].markdown("**Unidad**")
-                            
-                            for key, nombre in horarios_info:
-                                datos = resultado["horarios"].get(key, {})
-                                cols = st.columns(5)
-                                
-                                if datos.get("actual") is not None:
-                                    anterior = datos.get("anterior")
-                                    actual = datos.get("actual")
-                                    variacion = datos.get("variacion_pct")
-                                    unidad = "$/kW" if key == "capacidad" else "$/kWh"
-                                    
-                                    cols[0].write(f"⏰ {nombre}" if key != "capacidad" else f"⚡ {nombre}")
-                                    cols[1].write(f"${anterior:.4f}" if anterior else "N/D")
-                                    cols[2].write(f"${actual:.4f}")
-                                    if variacion is not None:
-                                        color = "🔴" if variacion > 0 else "🟢"
-                                        cols[3].write(f"{color} {variacion:+.2f}%")
-                                    else:
-                                        cols[3].write("N/D")
-                                    cols[4].write(unidad)
-                                else:
-                                    cols[0].write(f"⏰ {nombre}" if key != "capacidad" else f"⚡ {nombre}")
-                                    cols[1].write("N/D")
-                                    cols[2].write("N/D")
-                                    cols[3].write("N/D")
-                                    cols[4].write("-")
-                        else:
-                            col_headers = st.columns(5)
-                            col_headers[0].markdown("**Concepto**")
-                            col_headers[1].markdown(f"**Dic {anio_comparativo}**")
-                            col_headers[2].markdown(f"**Dic {anio_seleccionado}**")
-                            col_headers[3].markdown("**Variación**")
-                            col_headers[4].markdown("**Unidad**")
-                            
-                            for key, nombre, unidad in [("simple", "Variable (Energía)", "$/kWh"), ("capacidad", "Capacidad", "$/kW")]:
-                                datos = resultado["horarios"].get(key, {})
-                                cols = st.columns(5)
-                                
-                                if datos.get("actual") is not None:
-                                    anterior = datos.get("anterior")
-                                    actual = datos.get("actual")
-                                    variacion = datos.get("variacion_pct")
-                                    
-                                    cols[0].write(f"📊 {nombre}")
-                                    cols[1].write(f"${anterior:.4f}" if anterior else "N/D")
-                                    cols[2].write(f"${actual:.4f}")
-                                    if variacion is not None:
-                                        color = "🔴" if variacion > 0 else "🟢"
-                                        cols[3].write(f"{color} {variacion:+.2f}%")
-                                    else:
-                                        cols[3].write("N/D")
-                                    cols[4].write(unidad)
-                                else:
-                                    cols[0].write(f"📊 {nombre}")
-                                    cols[1].write("N/D")
-                                    cols[2].write("N/D")
-                                    cols[3].write("N/D")
-                                    cols[4].write("-")
-                        
-                        # === GRÁFICA COMPARATIVA ===
-                        st.markdown("##### 📊 Gráfica Comparativa")
-                        
-                        datos_kwh = []
-                        datos_kw = []
-                        
-                        for key, datos_cargo in resultado["horarios"].items():
-                            if datos_cargo.get("actual") is not None or datos_cargo.get("anterior") is not None:
-                                if key == "B":
-                                    concepto, es_capacidad = "Base", False
-                                elif key == "I":
-                                    concepto, es_capacidad = "Intermedia", False
-                                elif key == "P":
-                                    concepto, es_capacidad = "Punta", False
-                                elif key == "capacidad":
-                                    concepto, es_capacidad = "Capacidad", True
-                                elif key == "simple":
-                                    concepto, es_capacidad = "Variable", False
-                                else:
-                                    concepto, es_capacidad = key, False
-                                
-                                lista_destino = datos_kw if es_capacidad else datos_kwh
-                                
-                                if datos_cargo.get("anterior") is not None:
-                                    lista_destino.append({
-                                        "Concepto": concepto,
-                                        "Año": str(anio_comparativo),
-                                        "Valor": datos_cargo["anterior"]
-                                    })
-                                if datos_cargo.get("actual") is not None:
-                                    lista_destino.append({
-                                        "Concepto": concepto,
-                                        "Año": str(anio_seleccionado),
-                                        "Valor": datos_cargo["actual"]
-                                    })
-                        
-                        colores = {
-                            str(anio_comparativo): "#636EFA",
-                            str(anio_seleccionado): "#EF553B"
-                        }
-                        
-                        tiene_kwh = len(datos_kwh) > 0
-                        tiene_kw = len(datos_kw) > 0
-                        
-                        if tiene_kwh and tiene_kw:
-                            col_kwh, col_kw = st.columns([3, 1])
-                        elif tiene_kwh:
-                            col_kwh, col_kw = st.container(), None
-                        elif tiene_kw:
-                            col_kwh, col_kw = None, st.container()
-                        else:
-                            col_kwh, col_kw = None, None
-                        
-                        if tiene_kwh and col_kwh:
-                            with col_kwh:
-                                df_kwh = pd.DataFrame(datos_kwh)
-                                fig_kwh = px.bar(df_kwh, x="Concepto", y="Valor", color="Año",
-                                                barmode="group", title="Variable ($/kWh)",
-                                                color_discrete_map=colores, text_auto=".2f")
-                                fig_kwh.update_layout(yaxis_title="$/kWh", xaxis_title="",
-                                                    legend_title="Año", height=300, margin=dict(t=40, b=40))
-                                fig_kwh.update_traces(hovertemplate="<b>%{x}</b><br>$%{y:.4f}/kWh<extra></extra>")
-                                st.plotly_chart(fig_kwh, use_container_width=True)
-                        
-                        if tiene_kw and col_kw:
-                            with col_kw:
-                                df_kw = pd.DataFrame(datos_kw)
-                                fig_kw = px.bar(df_kw, x="Concepto", y="Valor", color="Año",
-                                               barmode="group", title="Capacidad ($/kW)",
-                                               color_discrete_map=colores, text_auto=".2f")
-                                fig_kw.update_layout(yaxis_title="$/kW", xaxis_title="",
-                                                   legend_title="Año", height=300, margin=dict(t=40, b=40),
-                                                   showlegend=False)
-                                fig_kw.update_traces(hovertemplate="<b>%{x}</b><br>$%{y:.2f}/kW<extra></extra>")
-                                st.plotly_chart(fig_kw, use_container_width=True)
-                        
-                        # === DESGLOSE POR COMPONENTES ===
-                        st.markdown("##### 🔍 Desglose por Componente")
-                        
-                        if resultado["es_horaria"]:
-                            horarios_analizar = [("B", "Base"), ("I", "Intermedia"), ("P", "Punta")]
-                            cols_desglose = st.columns(3)
-                            for idx, (horario_key, horario_nombre) in enumerate(horarios_analizar):
-                                with cols_desglose[idx]:
-                                    componentes = calcular_variacion_componentes(
-                                        tarifa=tarifa, region=division_seleccionada,
-                                        anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                        horario=horario_key, tipo_cargo="Variable"
-                                    )
-                                    if componentes:
-                                        datos_comp = [
-                                            {"Componente": c["nombre"], "Variación": c["var_absoluta"],
-                                             "Anterior": c["anterior"] or 0, "Actual": c["actual"] or 0,
-                                             "Var %": c["var_pct"] or 0}
-                                            for c in componentes if c["var_absoluta"] is not None
-                                        ]
-                                        if datos_comp:
-                                            df_comp = pd.DataFrame(datos_comp)
-                                            df_comp["Color"] = df_comp["Variación"].apply(
-                                                lambda x: "Subió" if x > 0 else "Bajó"
-                                            )
-                                            fig_comp = px.bar(
-                                                df_comp, y="Componente", x="Variación", color="Color",
-                                                orientation="h", title=f"{horario_nombre}",
-                                                color_discrete_map={"Subió": "#EF553B", "Bajó": "#00CC96"},
-                                                text=df_comp["Var %"].apply(lambda x: f"{x:+.1f}%")
-                                            )
-                                            fig_comp.update_layout(
-                                                xaxis_title="$/kWh", yaxis_title="",
-                                                height=250, showlegend=False,
-                                                margin=dict(l=10, r=10, t=30, b=30)
-                                            )
-                                            fig_comp.update_traces(
-                                                hovertemplate="<b>%{y}</b><br>Var: $%{x:.4f}<extra></extra>"
-                                            )
-                                            st.plotly_chart(fig_comp, use_container_width=True)
-                        else:
-                            componentes = calcular_variacion_componentes(
-                                tarifa=tarifa, region=division_seleccionada,
-                                anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                horario=None, tipo_cargo="Variable"
-                            )
-                            if componentes:
-                                datos_comp = [
-                                    {"Componente": c["nombre"], "Variación": c["var_absoluta"],
-                                     "Anterior": c["anterior"] or 0, "Actual": c["actual"] or 0,
-                                     "Var %": c["var_pct"] or 0}
-                                    for c in componentes if c["var_absoluta"] is not None
-                                ]
-                                if datos_comp:
-                                    df_comp = pd.DataFrame(datos_comp)
-                                    df_comp["Color"] = df_comp["Variación"].apply(
-                                        lambda x: "Subió 🔴" if x > 0 else "Bajó 🟢"
-                                    )
-                                    fig_comp = px.bar(
-                                        df_comp, y="Componente", x="Variación", color="Color",
-                                        orientation="h", title="Variación por Componente",
-                                        color_discrete_map={"Subió 🔴": "#EF553B", "Bajó 🟢": "#00CC96"},
-                                        text=df_comp["Var %"].apply(lambda x: f"{x:+.1f}%")
-                                    )
-                                    fig_comp.update_layout(
-                                        xaxis_title="Variación ($/kWh)", yaxis_title="",
-                                        height=300, showlegend=True, legend_title="",
-                                        margin=dict(l=10, r=10, t=40, b=40)
-                                    )
-                                    st.plotly_chart(fig_comp, use_container_width=True)
-                        
-                        # === KPI DE PROMEDIO ANUAL (HU-3.1) ===
-                        st.markdown("##### 📊 Promedio Anual")
-                        
-                        if resultado["es_horaria"]:
-                            prom_fijo = calcular_variacion_promedio_anual(
-                                tarifa=tarifa, region=division_seleccionada,
-                                anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                horario=None, tipo_cargo="Fijo"
-                            )
-                            cols_fijo_horarios = st.columns([1, 1, 1, 1])
-                            with cols_fijo_horarios[0]:
-                                if prom_fijo["disponible"]:
-                                    st.metric(
-                                        label="📋 Cargo Fijo",
-                                        value=f"${prom_fijo['promedio_actual']:.2f}/mes",
-                                        delta=f"{prom_fijo['variacion_pct']:+.1f}%",
-                                        delta_color="inverse",
-                                        help=f"Promedio de {prom_fijo['num_meses_comunes']} meses. Anterior: ${prom_fijo['promedio_anterior']:.2f}"
-                                    )
-                                else:
-                                    st.metric(label="📋 Cargo Fijo", value="N/D", delta="Sin datos")
-                            horarios_prom = [("B", "Base"), ("I", "Intermedia"), ("P", "Punta")]
-                            for idx, (horario_key, horario_nombre) in enumerate(horarios_prom):
-                                with cols_fijo_horarios[idx + 1]:
-                                    prom_data = calcular_variacion_promedio_anual(
-                                        tarifa=tarifa, region=division_seleccionada,
-                                        anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                        horario=horario_key, tipo_cargo="Variable"
-                                    )
-                                    if prom_data["disponible"]:
-                                        st.metric(
-                                            label=f"⏰ {horario_nombre}",
-                                            value=f"${prom_data['promedio_actual']:.4f}/kWh",
-                                            delta=f"{prom_data['variacion_pct']:+.1f}%",
-                                            delta_color="inverse",
-                                            help=f"Promedio de {prom_data['num_meses_comunes']} meses. Anterior: ${prom_data['promedio_anterior']:.4f}"
-                                        )
-                                    else:
-                                        st.metric(label=f"⏰ {horario_nombre}", value="N/D", delta="Sin datos")
-                            st.caption("🕐 **Horarios típicos:** Base (0:00-6:00) | Intermedia (6:00-18:00, 22:00-0:00) | Punta (18:00-22:00)")
-                        else:
-                            cols_simple = st.columns(2)
-                            with cols_simple[0]:
-                                prom_fijo = calcular_variacion_promedio_anual(
-                                    tarifa=tarifa, region=division_seleccionada,
-                                    anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                    horario=None, tipo_cargo="Fijo"
-                                )
-                                if prom_fijo["disponible"]:
-                                    st.metric(
-                                        label="📋 Promedio Cargo Fijo",
-                                        value=f"${prom_fijo['promedio_actual']:.2f}/mes",
-                                        delta=f"{prom_fijo['variacion_pct']:+.1f}%",
-                                        delta_color="inverse",
-                                        help=f"Promedio de {prom_fijo['num_meses_comunes']} meses. Anterior: ${prom_fijo['promedio_anterior']:.2f}"
-                                    )
-                                else:
-                                    st.metric(label="📋 Promedio Cargo Fijo", value="N/D", delta="Sin datos")
-                            with cols_simple[1]:
-                                prom_data = calcular_variacion_promedio_anual(
-                                    tarifa=tarifa, region=division_seleccionada,
-                                    anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                    horario=None, tipo_cargo="Variable"
-                                )
-                                if prom_data["disponible"]:
-                                    st.metric(
-                                        label="⚡ Promedio Variable (Energía)",
-                                        value=f"${prom_data['promedio_actual']:.4f}/kWh",
-                                        delta=f"{prom_data['variacion_pct']:+.1f}%",
-                                        delta_color="inverse",
-                                        help=f"Promedio de {prom_data['num_meses_comunes']} meses. Anterior: ${prom_data['promedio_anterior']:.4f}"
-                                    )
-                                else:
-                                    st.metric(label="⚡ Promedio Variable", value="N/D", delta="Sin datos")
-                        
-                        # === GRÁFICA DE TENDENCIA MENSUAL (HU-3.4) ===
-                        st.markdown("##### 📈 Tendencia Mensual")
-                        
-                        if resultado["es_horaria"]:
-                            horarios_tendencia = [("B", "Base"), ("I", "Intermedia"), ("P", "Punta")]
-                            cols_tendencia = st.columns(3)
-                            for idx, (horario_key, horario_nombre) in enumerate(horarios_tendencia):
-                                with cols_tendencia[idx]:
-                                    datos_tend = get_datos_tendencia_comparativa(
-                                        tarifa=tarifa, region=division_seleccionada,
-                                        anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                        horario=horario_key, tipo_cargo="Variable"
-                                    )
-                                    if datos_tend:
-                                        df_tend = pd.DataFrame(datos_tend)
-                                        df_tend = df_tend.sort_values("Mes_Num")
-                                        fig_tend = px.line(
-                                            df_tend, x="Mes", y="Valor", color="Año",
-                                            title=f"{horario_nombre}",
-                                            markers=True,
-                                            color_discrete_map={
-                                                str(anio_comparativo): "#636EFA",
-                                                str(anio_seleccionado): "#EF553B"
-                                            }
-                                        )
-                                        fig_tend.update_layout(
-                                            xaxis_title="", yaxis_title="$/kWh",
-                                            height=280, showlegend=True,
-                                            legend=dict(orientation="h", yanchor="bottom", y=1.02),
-                                            margin=dict(l=10, r=10, t=50, b=30)
-                                        )
-                                        fig_tend.update_traces(
-                                            hovertemplate="<b>%{x}</b><br>$%{y:.4f}/kWh<extra></extra>"
-                                        )
-                                        st.plotly_chart(fig_tend, use_container_width=True)
-                                    else:
-                                        st.info(f"Sin datos para {horario_nombre}")
-                        else:
-                            datos_tend = get_datos_tendencia_comparativa(
-                                tarifa=tarifa, region=division_seleccionada,
-                                anio_actual=anio_seleccionado, anio_anterior=anio_comparativo,
-                                horario=None, tipo_cargo="Variable"
-                            )
-                            if datos_tend:
-                                df_tend = pd.DataFrame(datos_tend)
-                                df_tend = df_tend.sort_values("Mes_Num")
-                                fig_tend = px.line(
-                                    df_tend, x="Mes", y="Valor", color="Año",
-                                    title="Evolución Mensual Variable (Energía)",
-                                    markers=True,
-                                    color_discrete_map={
-                                        str(anio_comparativo): "#636EFA",
-                                        str(anio_seleccionado): "#EF553B"
-                                    }
-                                )
-                                fig_tend.update_layout(
-                                    xaxis_title="Mes", yaxis_title="$/kWh",
-                                    height=350, showlegend=True,
-                                    legend=dict(orientation="h", yanchor="bottom", y=1.02),
-                                    margin=dict(l=10, r=10, t=50, b=40)
-                                )
-                                fig_tend.update_traces(
-                                    hovertemplate="<b>%{x}</b><br>$%{y:.4f}/kWh<extra></extra>"
-                                )
-                                st.plotly_chart(fig_tend, use_container_width=True)
-                            else:
-                                st.info("Sin datos de tendencia mensual")
-                    else:
-                        st.warning(f"No hay datos de diciembre para {tarifa} en {anio_seleccionado} o {anio_comparativo}")
+            _render_tab_analisis(
+                division_seleccionada, tarifas_seleccionadas, anio_seleccionado, anio_comparativo, tarifa_descripcion
+            )
         else:
             st.info("👆 Selecciona Estado, Municipio, Tarifa y Año para ver el análisis de comportamiento")
     
     # Tab 2: Generar Histórico (HU-5.1)
     with modo_tabs[1]:
         if division_seleccionada and tarifas_seleccionadas and anio_seleccionado:
-            # Una tarifa para el histórico (selector si hay varias)
-            if len(tarifas_seleccionadas) == 1:
-                tarifa_historico = tarifas_seleccionadas[0]
-            else:
-                tarifa_historico = st.selectbox(
-                    "Tarifa para histórico",
-                    options=tarifas_seleccionadas,
-                    key="tarifa_historico",
-                    help="Elige la tarifa para generar la tabla de 12 meses"
-                )
-            
-            st.subheader("📋 Rango de 12 meses")
-            mes_final_nombre = st.selectbox(
-                "Mes final del rango",
-                options=MESES_NOMBRES,
-                index=11,
-                key="mes_final_historico",
-                help="Se calcularán 12 meses hacia atrás desde este mes y año"
-            )
-            mes_final_num = mes_a_numero(mes_final_nombre)
-            
-            # Calcular rango con casos borde
-            rango = calcular_rango_12_meses(
-                mes_final_num, anio_seleccionado, df_tarifas,
-                tarifa_historico, division_seleccionada
-            )
-            mes_inicial, anio_inicial, mes_final_ajustado, anio_final_ajustado, mensaje_info = rango
-            
-            if mensaje_info:
-                st.info(mensaje_info)
-            
-            # Filtrar datos en el rango
-            start_ord = anio_inicial * 12 + mes_inicial
-            end_ord = anio_final_ajustado * 12 + mes_final_ajustado
-            fecha_ord = df_tarifas["anio"] * 12 + df_tarifas["mes_numero"]
-            mask_hist = (
-                (df_tarifas["region"] == division_seleccionada.upper().strip()) &
-                (df_tarifas["tarifa"] == tarifa_historico) &
-                (fecha_ord >= start_ord) &
-                (fecha_ord <= end_ord)
-            )
-            df_hist = df_tarifas.loc[mask_hist].copy()
-            df_hist = df_hist.sort_values(by=["anio", "mes_numero", "cargo", "int_horario"], ignore_index=True)
-
-            # Vista pivotada: una fila por mes (Año, Mes, Fecha, Cargo Fijo, Base, Intermedia, Punta, Cargo Cap)
-            df_vista = pivotar_historico_por_mes(df_hist)
-
-            def fmt_miles(v):
-                if v is None or (isinstance(v, float) and pd.isna(v)):
-                    return ""
-                return f"{float(v):,.2f}"
-
-            def fmt_cuatro(v):
-                if v is None or (isinstance(v, float) and pd.isna(v)):
-                    return ""
-                return f"{float(v):.4f}"
-
-            df_display = df_vista.copy()
-            for col in ["Cargo Fijo", "Cargo Cap"]:
-                if col in df_display.columns:
-                    df_display[col] = df_display[col].apply(fmt_miles)
-            for col in ["Base", "Intermedia", "Punta"]:
-                if col in df_display.columns:
-                    df_display[col] = df_display[col].apply(fmt_cuatro)
-
-            st.caption(f"**Total:** {len(df_display)} meses. Rango: {numero_a_mes(mes_inicial)} {anio_inicial} — {numero_a_mes(mes_final_ajustado)} {anio_final_ajustado}")
-
-            if df_display.empty:
-                st.warning("No hay datos en el rango calculado para esta tarifa y división.")
-            else:
-                st.dataframe(
-                    df_display,
-                    use_container_width=True,
-                    column_config={
-                        "Año": st.column_config.NumberColumn("Año", format="%d", width="small"),
-                        "Mes": st.column_config.TextColumn("Mes", width="medium"),
-                        "Fecha": st.column_config.TextColumn("Fecha", width="small"),
-                        "Cargo Fijo": st.column_config.TextColumn("Cargo Fijo", width="medium"),
-                        "Base": st.column_config.TextColumn("Base", width="medium"),
-                        "Intermedia": st.column_config.TextColumn("Intermedia", width="medium"),
-                        "Punta": st.column_config.TextColumn("Punta", width="medium"),
-                        "Cargo Cap": st.column_config.TextColumn("Cargo Cap", width="medium"),
-                    },
-                )
-
-                # Exportar CSV: mismo contenido mostrado (vista pivotada formateada)
-                nombre_archivo = f"historico_{tarifa_historico}_{division_seleccionada.replace(' ', '_')}_{numero_a_mes(mes_inicial)}{anio_inicial}_{numero_a_mes(mes_final_ajustado)}{anio_final_ajustado}.csv"
-                csv_bytes = df_display.to_csv(index=False, encoding="utf-8")
-                st.download_button(
-                    "Descargar CSV",
-                    data=csv_bytes,
-                    file_name=nombre_archivo,
-                    mime="text/csv",
-                    key="download_historico_csv"
-                )
+            _render_tab_historico(division_seleccionada, tarifas_seleccionadas, anio_seleccionado)
         else:
             st.info("👆 Selecciona Estado, Municipio, Tarifa y Año para generar el histórico")
     
-    # Tab 3: Captura de Datos de Recibo (Feature 6 - HU-6.1)
+    # Tab 3: Ranking Nacional (no depende de la división seleccionada)
     with modo_tabs[2]:
-        _render_formulario_datos_generales_recibo(key_suffix="")
+        _render_tab_ranking(anio_seleccionado)
+    
+    # Tab 4: Simulador de Recibo (costo en pesos sobre todo el histórico)
+    with modo_tabs[3]:
+        if division_seleccionada and tarifas_seleccionadas and anio_seleccionado:
+            _render_tab_simulador(division_seleccionada, tarifas_seleccionadas, anio_seleccionado)
+        else:
+            st.info("👆 Selecciona Estado, Municipio, Tarifa y Año para simular el recibo")
+    
+    # Tab 5: Captura de Datos de Recibo (Feature 6 - HU-6.1)
+    with modo_tabs[4]:
+        _render_tab_captura(key_suffix="")
 else:
     # Selector deshabilitado si no hay tarifas
     st.selectbox(
@@ -919,7 +1390,7 @@ else:
     
     # Mostrar tabs incluso si no hay selección completa
     st.markdown("---")
-    modo_tabs = st.tabs(["📊 Análisis de Comportamiento", "📋 Generar Histórico", "📥 Captura de Datos"])
+    modo_tabs = st.tabs(["📊 Análisis de Comportamiento", "📋 Generar Histórico", "🏆 Ranking Nacional", "🧮 Simulador de Recibo", "📥 Captura de Datos"])
     
     with modo_tabs[0]:
         st.info("👆 Completa los selectores arriba para ver el análisis de comportamiento")
@@ -928,8 +1399,51 @@ else:
         st.info("👆 Completa los selectores arriba para generar el histórico")
     
     with modo_tabs[2]:
-        _render_formulario_datos_generales_recibo(key_suffix="_alt")
+        _render_tab_ranking(key_suffix="_alt")
+    
+    with modo_tabs[3]:
+        st.info("👆 Completa los selectores arriba para simular el recibo")
+    
+    with modo_tabs[4]:
+        _render_tab_captura(key_suffix="_alt")
 
 # Footer
 st.markdown("---")
 st.caption("CFE Analizador de Tarifas v1.6.3 | Desarrollado con Streamlit")
+
+# Perfil de arranque: se registra en el log en cada ejecución y se muestra con CFE_PERFIL_ARRANQUE=1
+_tiempos_arranque["total"] = round((time.perf_counter() - _T_INICIO) * 1000, 1)
+logging.getLogger("cfe.arranque").info(json.dumps(_tiempos_arranque))
+if os.environ.get("CFE_PERFIL_ARRANQUE") == "1":
+    with st.expander("⏱️ Perfil de arranque (ms)"):
+        st.json(_tiempos_arranque)
+
+# Diagnóstico de memoria (CFE_DIAGNOSTICO=1): columnas, caches y pico de RSS
+if os.environ.get("CFE_DIAGNOSTICO") == "1":
+    with st.expander("🩺 Diagnóstico de memoria"):
+        memoria = get_data_stats(detalle_memoria=True)["memoria"]
+        col_d1, col_d2, col_d3 = st.columns(3)
+        with col_d1:
+            st.metric("RSS pico (MB)", _bytes_a_mb(memoria["rss_pico"]) if memoria["rss_pico"] else "N/D")
+        with col_d2:
+            st.metric("Tarifas (MB)", _bytes_a_mb(sum(memoria["columnas_tarifas"].values())))
+        with col_d3:
+            st.metric("Caches (MB)", _bytes_a_mb(sum(c["bytes"] or 0 for c in memoria["caches"].values())))
+        st.caption("RSS pico al terminar cada carga (MB): " + ", ".join(
+            f"{nombre}: {_bytes_a_mb(valor)}" for nombre, valor in memoria["rss_pico_carga"].items()
+        ))
+        stats_figuras = get_cache_figuras().estadisticas()
+        st.caption(
+            f"Cache de figuras: {stats_figuras['entradas']} figuras, {_bytes_a_mb(stats_figuras['bytes'])} MB, "
+            f"{stats_figuras['aciertos']} aciertos / {stats_figuras['fallos']} fallos"
+        )
+        df_caches = pd.DataFrame([
+            {"Función": nombre, "Tipo": c["tipo"], "Entradas": c["entradas"], "MB": _bytes_a_mb(c["bytes"])}
+            for nombre, c in memoria["caches"].items()
+        ]).sort_values("MB", ascending=False, na_position="last")
+        st.dataframe(df_caches, hide_index=True, use_container_width=True)
+        df_columnas = pd.DataFrame(
+            [{"Tabla": "tarifas", "Columna": col, "MB": _bytes_a_mb(b)} for col, b in memoria["columnas_tarifas"].items()]
+            + [{"Tabla": "geografía", "Columna": col, "MB": _bytes_a_mb(b)} for col, b in memoria["columnas_geografia"].items()]
+        ).sort_values("MB", ascending=False)
+        st.dataframe(df_columnas, hide_index=True, use_container_width=True)
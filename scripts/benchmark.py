@@ -0,0 +1,426 @@
+"""
+CFE Tariff Analyzer - Benchmark
+===============================
+Mide el rendimiento de data_loader sobre historiales de tarifas sintéticos
+con el mismo esquema que 02_tarifas_finales_suministro_basico.csv.
+
+Escalas (multiplican años, regiones y tarifas del tamaño real):
+- 1×: 2017-2025, 17 divisiones, 7 tarifas
+- 10×: el doble de años y 5 veces las divisiones
+- 100×: 4 veces los años, 5 veces las divisiones y 5 veces las tarifas
+
+Uso:
+    python scripts/benchmark.py --escalas 1 10 --salida bench.json
+    python scripts/benchmark.py --comparar bench_main.json --tolerancia 0.25
+
+El resultado es JSON; con --comparar se marca como regresión cualquier tiempo
+que empeore más que la tolerancia respecto a la corrida base (código de salida 1).
+"""
+
+from typing import Callable, List, Optional, Tuple
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import cache_backend
+import data_loader
+
+# Divisiones CFE del catálogo real (antes de normalizar)
+REGIONES_BASE = [
+    "BAJÍO", "BAJA CALIFORNIA", "CENTRO OCCIDENTE", "CENTRO ORIENTE", "CENTRO SUR",
+    "GOLFO CENTRO", "GOLFO NORTE", "JALISCO", "NOROESTE", "NORTE", "ORIENTE",
+    "PENINSULAR", "SURESTE", "VALLE DE MÉXICO CENTRO", "VALLE DE MÉXICO NORTE",
+    "VALLE DE MÉXICO SUR", "SUR",
+]
+
+# Tarifas base: código -> descripción
+TARIFAS_BASE = {
+    "GDMTH": "Gran demanda en media tensión horaria",
+    "DIST": "Demanda industrial en subtransmisión",
+    "DIT": "Demanda industrial en transmisión",
+    "GDMTO": "Gran demanda en media tensión ordinaria",
+    "PDBT": "Pequeña demanda en baja tensión",
+    "GDBT": "Gran demanda en baja tensión",
+    "RABT": "Riego agrícola en baja tensión",
+}
+
+ANIO_FINAL = 2025
+ANIOS_BASE = 9
+
+# escala -> (factor de años, factor de regiones, factor de tarifas)
+ESCALAS = {
+    1: (1, 1, 1),
+    10: (2, 5, 1),
+    100: (4, 5, 5),
+}
+
+COLUMNAS_CSV = [
+    "anio", "mes", "tarifa", "descripcion", "int_horario", "cargo", "unidades", "region",
+] + data_loader.COMPONENTES + ["total"]
+
+# Diferencia mínima (ms) para considerar una regresión; evita falsos positivos por ruido
+UMBRAL_RUIDO_MS = 1.0
+
+
+def _filas_por_tarifa(tarifa: str) -> List[Tuple[str, str, str]]:
+    """Filas (int_horario, cargo, unidades) que publica una tarifa cada mes."""
+    filas = [("sin dato", "Fijo", "$/mes")]
+    if data_loader.es_tarifa_horaria(tarifa):
+        filas += [(h, "Variable (Energía)", "$/kWh") for h in ("B", "I", "P")]
+    else:
+        filas.append(("sin dato", "Variable (Energía)", "$/kWh"))
+    if tarifa not in ("PDBT", "RABT"):
+        filas.append(("sin dato", "Capacidad", "$/kW"))
+    return filas
+
+
+def generar_tarifas_sinteticas(escala: int, semilla: int = 0) -> pd.DataFrame:
+    """
+    Genera un historial de tarifas sintético con el esquema del CSV real.
+
+    Args:
+        escala: Clave de ESCALAS (1, 10 o 100)
+        semilla: Semilla del generador aleatorio
+
+    Returns:
+        DataFrame con las columnas de COLUMNAS_CSV
+    """
+    f_anios, f_regiones, f_tarifas = ESCALAS[escala]
+    rng = np.random.default_rng(semilla)
+
+    anios = np.arange(ANIO_FINAL - ANIOS_BASE * f_anios + 1, ANIO_FINAL + 1)
+    regiones = list(REGIONES_BASE)
+    for i in range(len(REGIONES_BASE) * (f_regiones - 1)):
+        regiones.append(f"REGIÓN SINTÉTICA {i + 1:03d}")
+    tarifas = dict(TARIFAS_BASE)
+    for i in range(len(TARIFAS_BASE) * (f_tarifas - 1)):
+        tarifas[f"SINT{i + 1:03d}"] = f"Tarifa sintética {i + 1}"
+
+    # Producto (anio, mes, region) común a todas las tarifas
+    n_periodos = len(anios) * 12 * len(regiones)
+    base_anio = np.repeat(anios, 12 * len(regiones))
+    base_mes = np.tile(np.repeat(np.arange(12), len(regiones)), len(anios))
+    base_region = np.tile(np.arange(len(regiones)), len(anios) * 12)
+
+    bloques = []
+    for tarifa, descripcion in tarifas.items():
+        plantilla = _filas_por_tarifa(tarifa)
+        k = len(plantilla)
+        bloques.append(pd.DataFrame({
+            "anio": np.repeat(base_anio, k),
+            "mes": np.array(data_loader.MESES_NOMBRES, dtype=object)[np.repeat(base_mes, k)],
+            "tarifa": tarifa,
+            "descripcion": descripcion,
+            "int_horario": np.tile([p[0] for p in plantilla], n_periodos),
+            "cargo": np.tile([p[1] for p in plantilla], n_periodos),
+            "unidades": np.tile([p[2] for p in plantilla], n_periodos),
+            "region": np.array(regiones, dtype=object)[np.repeat(base_region, k)],
+        }))
+    df = pd.concat(bloques, ignore_index=True)
+
+    # Componentes con ~20% de vacíos y total como suma de los presentes
+    n = len(df)
+    componentes = rng.uniform(0, 1, size=(n, len(data_loader.COMPONENTES))).round(4)
+    componentes[rng.random((n, len(data_loader.COMPONENTES))) < 0.2] = np.nan
+    for i, col in enumerate(data_loader.COMPONENTES):
+        df[col] = componentes[:, i]
+    df["total"] = np.nansum(componentes, axis=1).round(4)
+
+    # El último año solo llega a septiembre, como en la publicación real
+    df = df[~((df["anio"] == ANIO_FINAL) & (df["mes"].isin(data_loader.MESES_NOMBRES[9:])))]
+    return df[COLUMNAS_CSV].reset_index(drop=True)
+
+
+def _medir(func: Callable, *args, **kwargs) -> Tuple[float, object]:
+    """Ejecuta func y devuelve (milisegundos, resultado)."""
+    inicio = time.perf_counter()
+    resultado = func(*args, **kwargs)
+    return (time.perf_counter() - inicio) * 1000, resultado
+
+
+def _resumen(tiempos: List[float]) -> dict:
+    """Mediana, p95 y máximo (ms) de una lista de tiempos."""
+    ordenados = sorted(tiempos)
+    p95 = ordenados[min(len(ordenados) - 1, int(round(0.95 * (len(ordenados) - 1))))]
+    return {
+        "llamadas": len(ordenados),
+        "mediana_ms": round(statistics.median(ordenados), 3),
+        "p95_ms": round(p95, 3),
+        "max_ms": round(ordenados[-1], 3),
+    }
+
+
+def _reiniciar_caches_derivados() -> None:
+    """Vacía los caches en proceso y deja caliente la fuente de datos (Parquet o base SQLite)."""
+    cache_backend.limpiar_caches()
+    if data_loader.get_backend_datos() == "sqlite":
+        data_loader.get_almacen_sql()
+    else:
+        data_loader.load_tarifas()
+
+
+def _muestra_argumentos(df: pd.DataFrame, n: int, semilla: int) -> List[Tuple[str, str, int]]:
+    """Combinaciones (tarifa, región, año) presentes en los datos, con año anterior disponible."""
+    anios = sorted(df["anio"].unique())
+    tarifas = sorted(df["tarifa"].unique())
+    regiones = sorted(data_loader.normalizar_serie(df["region"]).unique())
+    azar = random.Random(semilla)
+    return [
+        (azar.choice(tarifas), azar.choice(regiones), int(azar.choice(anios[1:])))
+        for _ in range(n)
+    ]
+
+
+def medir_escala(escala: int, directorio: Path, repeticiones: int, semilla: int = 0) -> dict:
+    """
+    Genera el dataset de una escala y mide load_tarifas y las funciones de cálculo.
+
+    Para cada función se reporta la primera llamada con caches vacíos
+    (incluye índices y cubos derivados) y el resumen de `repeticiones`
+    llamadas con argumentos variados. load_tarifas se mide desde CSV,
+    desde el Parquet de cache y desde memoria.
+
+    Args:
+        escala: Clave de ESCALAS
+        directorio: Directorio de trabajo para el CSV y el cache Parquet
+        repeticiones: Llamadas por función en la fase repetida
+        semilla: Semilla para datos y argumentos
+
+    Returns:
+        Diccionario con tamaño del dataset y tiempos por función
+    """
+    ruta_csv = directorio / f"tarifas_x{escala}.csv"
+    inicio = time.perf_counter()
+    df_csv = generar_tarifas_sinteticas(escala, semilla)
+    df_csv.to_csv(ruta_csv, index=False)
+    segundos_generacion = time.perf_counter() - inicio
+
+    data_loader.TARIFAS_FILE = ruta_csv
+    data_loader.CACHE_DIR = directorio / f".cache_x{escala}"
+    funciones = {}
+
+    # load_tarifas: CSV (sin Parquet), Parquet (cache persistente) y memoria
+    cache_backend.limpiar_caches()
+    ms_csv, df = _medir(data_loader.load_tarifas)
+    cache_backend.limpiar_caches()
+    ms_parquet, _ = _medir(data_loader.load_tarifas)
+    ms_memoria, _ = _medir(data_loader.load_tarifas)
+    # Lectura de una sola partición (último año, una tarifa); la primera crea el dataset particionado
+    particion = {"anios": (int(df["anio"].max()),), "tarifas": (str(df["tarifa"].iloc[0]),)}
+    _medir(data_loader.load_tarifas, **particion)
+    data_loader.load_tarifas.clear()
+    ms_particion, _ = _medir(data_loader.load_tarifas, **particion)
+    funciones["load_tarifas"] = {
+        "csv_ms": round(ms_csv, 3),
+        "parquet_ms": round(ms_parquet, 3),
+        "memoria_ms": round(ms_memoria, 3),
+        "particion_ms": round(ms_particion, 3),
+    }
+
+    argumentos = _muestra_argumentos(df_csv, repeticiones, semilla)
+
+    def variacion_diciembre(tarifa, region, anio):
+        return data_loader.calcular_variacion_diciembre(tarifa, region, anio, anio - 1)
+
+    def variacion_componentes(tarifa, region, anio):
+        horario = "B" if data_loader.es_tarifa_horaria(tarifa) else None
+        return data_loader.calcular_variacion_componentes(tarifa, region, anio, anio - 1, horario)
+
+    def matriz_componentes(tarifa, region, anio):
+        horario = "B" if data_loader.es_tarifa_horaria(tarifa) else None
+        return data_loader.calcular_matriz_componentes(tarifa, region, horario)
+
+    def variacion_promedio(tarifa, region, anio):
+        horario = "B" if data_loader.es_tarifa_horaria(tarifa) else None
+        return data_loader.calcular_variacion_promedio_anual(tarifa, region, anio, anio - 1, horario)
+
+    def rango_12_meses(tarifa, region, anio):
+        return data_loader.calcular_rango_12_meses(12, anio, tarifa=tarifa, division=region)
+
+    def ranking_diciembre(tarifa, region, anio):
+        return data_loader.calcular_ranking_diciembre(anio, anio - 1)
+
+    def simulacion_recibos(tarifa, region, anio):
+        if data_loader.es_tarifa_horaria(tarifa):
+            return data_loader.simular_recibos(tarifa, region, kwh_periodos={"B": 10_000, "I": 20_000, "P": 5_000}, demanda_kw=100)
+        return data_loader.simular_recibos(tarifa, region, kwh=1_000, demanda_kw=100)
+
+    casos = {
+        "calcular_variacion_diciembre": variacion_diciembre,
+        "calcular_ranking_diciembre": ranking_diciembre,
+        "calcular_variacion_componentes": variacion_componentes,
+        "calcular_matriz_componentes": matriz_componentes,
+        "calcular_variacion_promedio_anual": variacion_promedio,
+        "calcular_rango_12_meses": rango_12_meses,
+        "simular_recibos": simulacion_recibos,
+    }
+    for nombre, caso in casos.items():
+        _reiniciar_caches_derivados()
+        ms_primera, _ = _medir(caso, *argumentos[0])
+        tiempos = [_medir(caso, *args)[0] for args in argumentos]
+        funciones[nombre] = {"primera_ms": round(ms_primera, 3), **_resumen(tiempos)}
+
+    # pivotar_historico_por_mes recibe el recorte de 12 meses que arma app.py
+    fecha_ord = df["anio"].astype(int) * 12 + df["mes_numero"]
+    recortes = []
+    for tarifa, region, anio in argumentos:
+        mask = (df["tarifa"] == tarifa) & (df["region"] == region) & fecha_ord.between(anio * 12 + 1, anio * 12 + 12)
+        recortes.append(df.loc[mask].sort_values(by=["anio", "mes_numero", "cargo", "int_horario"], ignore_index=True))
+    tiempos = [_medir(data_loader.pivotar_historico_por_mes, recorte)[0] for recorte in recortes]
+    funciones["pivotar_historico_por_mes"] = {"primera_ms": round(tiempos[0], 3), **_resumen(tiempos)}
+
+    return {
+        "escala": escala,
+        "filas": len(df),
+        "bytes_csv": ruta_csv.stat().st_size,
+        "anios": int(df["anio"].nunique()),
+        "regiones": int(df["region"].nunique()),
+        "tarifas": int(df["tarifa"].nunique()),
+        "generacion_s": round(segundos_generacion, 3),
+        "funciones": funciones,
+    }
+
+
+def ejecutar_benchmark(
+    escalas: List[int],
+    repeticiones: int = 50,
+    directorio: Optional[Path] = None,
+    semilla: int = 0,
+    backend_datos: str = "pandas",
+) -> dict:
+    """
+    Ejecuta el benchmark completo con el backend de cache LRU en proceso.
+
+    Args:
+        escalas: Escalas a medir (claves de ESCALAS)
+        repeticiones: Llamadas por función en la fase repetida
+        directorio: Directorio de trabajo; si es None se usa uno temporal
+        semilla: Semilla para datos y argumentos
+        backend_datos: "pandas" o "sqlite" (ver data_loader.configurar_backend_datos).
+            Con "sqlite", csv_ms de load_tarifas incluye construir la base y
+            parquet_ms es la lectura completa desde la base
+
+    Returns:
+        Diccionario serializable a JSON con entorno y resultados por escala
+    """
+    cache_backend.configurar_cache("lru")
+    backend_original = data_loader.get_backend_datos()
+    data_loader.configurar_backend_datos(backend_datos)
+    tarifas_original = data_loader.TARIFAS_FILE
+    cache_original = data_loader.CACHE_DIR
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="cfe_bench_") as tmp:
+            base = Path(directorio) if directorio else Path(tmp)
+            base.mkdir(parents=True, exist_ok=True)
+            for escala in escalas:
+                resultados.append(medir_escala(escala, base, repeticiones, semilla))
+    finally:
+        data_loader.TARIFAS_FILE = tarifas_original
+        data_loader.CACHE_DIR = cache_original
+        data_loader.configurar_backend_datos(backend_original)
+        cache_backend.limpiar_caches()
+
+    return {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+            "cache_backend": cache_backend.get_cache_backend().nombre,
+            "backend_datos": backend_datos,
+        },
+        "repeticiones": repeticiones,
+        "semilla": semilla,
+        "escalas": resultados,
+    }
+
+
+def comparar_resultados(base: dict, actual: dict, tolerancia: float = 0.25) -> List[dict]:
+    """
+    Compara dos corridas y devuelve los tiempos que empeoraron.
+
+    Un tiempo es regresión si supera al de la base en más de `tolerancia`
+    (fracción) y en más de UMBRAL_RUIDO_MS.
+
+    Args:
+        base: Resultado JSON de la corrida de referencia
+        actual: Resultado JSON de la corrida nueva
+        tolerancia: Empeoramiento relativo permitido (0.25 = 25%)
+
+    Returns:
+        Lista de dicts con escala, funcion, metrica, base_ms, actual_ms y cambio_pct
+    """
+    por_escala = {r["escala"]: r["funciones"] for r in base.get("escalas", [])}
+    regresiones = []
+    for resultado in actual.get("escalas", []):
+        funciones_base = por_escala.get(resultado["escala"])
+        if not funciones_base:
+            continue
+        for funcion, metricas in resultado["funciones"].items():
+            for metrica, valor in metricas.items():
+                if not metrica.endswith("_ms"):
+                    continue
+                valor_base = funciones_base.get(funcion, {}).get(metrica)
+                if not valor_base:
+                    continue
+                if valor > valor_base * (1 + tolerancia) and valor - valor_base > UMBRAL_RUIDO_MS:
+                    regresiones.append({
+                        "escala": resultado["escala"],
+                        "funcion": funcion,
+                        "metrica": metrica,
+                        "base_ms": valor_base,
+                        "actual_ms": valor,
+                        "cambio_pct": round((valor - valor_base) / valor_base * 100, 1),
+                    })
+    return regresiones
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de data_loader con tarifas sintéticas")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10, 100], choices=sorted(ESCALAS))
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--directorio", type=Path, default=None, help="Conserva aquí los CSV generados")
+    parser.add_argument("--salida", type=Path, default=None, help="Archivo JSON de salida (default: stdout)")
+    parser.add_argument("--comparar", type=Path, default=None, help="JSON de una corrida base para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--backend-datos", choices=list(data_loader.BACKENDS_DATOS), default="pandas")
+    args = parser.parse_args(argv)
+
+    resultado = ejecutar_benchmark(args.escalas, args.repeticiones, args.directorio, args.semilla, args.backend_datos)
+
+    codigo = 0
+    if args.comparar:
+        base = json.loads(args.comparar.read_text(encoding="utf-8"))
+        regresiones = comparar_resultados(base, resultado, args.tolerancia)
+        resultado["regresiones"] = regresiones
+        for r in regresiones:
+            print(
+                f"REGRESIÓN x{r['escala']} {r['funcion']}.{r['metrica']}: "
+                f"{r['base_ms']} -> {r['actual_ms']} ms (+{r['cambio_pct']}%)",
+                file=sys.stderr,
+            )
+        codigo = 1 if regresiones else 0
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        args.salida.write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,441 @@
+"""
+CFE Tariff Analyzer - Cache Backend
+===================================
+Decoradores de cache para data_loader independientes de Streamlit.
+
+Las funciones se decoran con `cache_data` (resultados que se entregan como
+copia, equivalente a st.cache_data) o `cache_resource` (objetos compartidos,
+equivalente a st.cache_resource). El backend real se resuelve en la primera
+llamada, así que importar data_loader no importa Streamlit:
+
+- "streamlit": st.cache_data / st.cache_resource (lo usa app.py)
+- "lru": cache en proceso con desalojo LRU (default para scripts y notebooks)
+- "none": sin cache, cada llamada ejecuta la función
+
+El backend se elige con configurar_cache() o con la variable de entorno
+CFE_CACHE_BACKEND.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Union
+from collections import OrderedDict
+import copy
+import functools
+import os
+import sys
+import threading
+
+# Variable de entorno para elegir el backend sin tocar código
+ENV_CACHE_BACKEND = "CFE_CACHE_BACKEND"
+BACKEND_DEFAULT = "lru"
+
+# Máximo de entradas por función en el backend LRU
+LRU_MAX_ENTRADAS = 256
+
+
+class CacheBackend:
+    """
+    Interfaz de un backend de cache.
+
+    Cada backend sabe envolver una función como cache de datos (el llamador
+    recibe una copia) o como cache de recurso (el llamador recibe el mismo
+    objeto compartido).
+    """
+
+    nombre = "base"
+
+    def envolver_datos(self, func: Callable) -> Callable:
+        """Envuelve func con cache de datos."""
+        raise NotImplementedError
+
+    def envolver_recurso(self, func: Callable) -> Callable:
+        """Envuelve func con cache de recurso compartido."""
+        raise NotImplementedError
+
+    def limpiar(self, envuelta: Callable) -> None:
+        """Vacía el cache de una función envuelta por este backend."""
+        raise NotImplementedError
+
+    def invalidar(self, envuelta: Callable, args: tuple, kwargs: dict) -> None:
+        """Elimina del cache solo la entrada de una llamada (args, kwargs)."""
+        raise NotImplementedError
+
+    def llaves(self, envuelta: Callable) -> Optional[List[tuple]]:
+        """
+        Llamadas (args, kwargs ordenados) con entrada vigente en el cache.
+
+        Returns:
+            Lista de llaves, o None si el backend no las expone (FuncionCacheada
+            registra entonces las llamadas por su cuenta)
+        """
+        return None
+
+    def estadisticas(self, envuelta: Callable) -> dict:
+        """
+        Entradas y tamaño estimado del cache de una función envuelta.
+
+        Returns:
+            Diccionario con entradas y bytes (None si el backend no lo expone)
+        """
+        return {"entradas": None, "bytes": None}
+
+
+class StreamlitCacheBackend(CacheBackend):
+    """Backend sobre st.cache_data / st.cache_resource (import diferido)."""
+
+    nombre = "streamlit"
+
+    def envolver_datos(self, func: Callable) -> Callable:
+        import streamlit as st
+        return st.cache_data(func)
+
+    def envolver_recurso(self, func: Callable) -> Callable:
+        import streamlit as st
+        return st.cache_resource(func)
+
+    def limpiar(self, envuelta: Callable) -> None:
+        envuelta.clear()
+
+    def invalidar(self, envuelta: Callable, args: tuple, kwargs: dict) -> None:
+        # Con argumentos, clear() de Streamlit elimina solo esa entrada
+        envuelta.clear(*args, **kwargs)
+
+    def estadisticas(self, envuelta: Callable) -> dict:
+        # Streamlit no expone entradas por función; se leen sus registros
+        # internos y, si cambian entre versiones, se reporta como desconocido.
+        nombre = f"{envuelta.__module__}.{envuelta.__qualname__}"
+        try:
+            from streamlit.runtime.caching.cache_data_api import _data_caches
+            from streamlit.runtime.caching.cache_resource_api import _resource_caches
+
+            entradas, total = 0, 0
+            for caches in list(_data_caches._function_caches.values()):
+                for cache in list(caches.values()):
+                    if cache.display_name != nombre:
+                        continue
+                    for stats in cache.get_stats().values():
+                        entradas += len(stats)
+                        total += sum(stat.byte_length for stat in stats)
+            for caches in list(_resource_caches._function_caches.values()):
+                for cache in list(caches.values()):
+                    if cache.display_name != nombre:
+                        continue
+                    valores = list(cache._mem_cache.values())
+                    entradas += len(valores)
+                    total += sum(estimar_bytes(getattr(v, "value", v)) for v in valores)
+            return {"entradas": entradas, "bytes": total}
+        except (ImportError, AttributeError):
+            return super().estadisticas(envuelta)
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    Cache en memoria del proceso con desalojo LRU por función.
+
+    Las llaves son los argumentos de la llamada; si algún argumento no es
+    hashable la llamada se ejecuta sin cache.
+    """
+
+    nombre = "lru"
+
+    def __init__(self, max_entradas: int = LRU_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+
+    def _envolver(self, func: Callable, copiar: bool) -> Callable:
+        entradas: "OrderedDict[Any, Any]" = OrderedDict()
+        candado = threading.Lock()
+        max_entradas = self.max_entradas
+
+        @functools.wraps(func)
+        def envuelta(*args, **kwargs):
+            llave = (args, tuple(sorted(kwargs.items())))
+            try:
+                hash(llave)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            with candado:
+                if llave in entradas:
+                    entradas.move_to_end(llave)
+                    valor = entradas[llave]
+                    return copy.deepcopy(valor) if copiar else valor
+
+            valor = func(*args, **kwargs)
+            with candado:
+                entradas[llave] = valor
+                entradas.move_to_end(llave)
+                while len(entradas) > max_entradas:
+                    entradas.popitem(last=False)
+            return copy.deepcopy(valor) if copiar else valor
+
+        envuelta.entradas = entradas
+        envuelta.candado = candado
+        return envuelta
+
+    def envolver_datos(self, func: Callable) -> Callable:
+        return self._envolver(func, copiar=True)
+
+    def envolver_recurso(self, func: Callable) -> Callable:
+        return self._envolver(func, copiar=False)
+
+    def limpiar(self, envuelta: Callable) -> None:
+        with envuelta.candado:
+            envuelta.entradas.clear()
+
+    def invalidar(self, envuelta: Callable, args: tuple, kwargs: dict) -> None:
+        with envuelta.candado:
+            envuelta.entradas.pop((args, tuple(sorted(kwargs.items()))), None)
+
+    def llaves(self, envuelta: Callable) -> Optional[List[tuple]]:
+        # Las llaves desalojadas por LRU desaparecen junto con su entrada
+        with envuelta.candado:
+            return list(envuelta.entradas)
+
+    def estadisticas(self, envuelta: Callable) -> dict:
+        with envuelta.candado:
+            valores = list(envuelta.entradas.values())
+        return {"entradas": len(valores), "bytes": sum(estimar_bytes(v) for v in valores)}
+
+
+class NoOpCacheBackend(CacheBackend):
+    """Backend sin cache: cada llamada ejecuta la función (útil para depurar)."""
+
+    nombre = "none"
+
+    def envolver_datos(self, func: Callable) -> Callable:
+        return func
+
+    def envolver_recurso(self, func: Callable) -> Callable:
+        return func
+
+    def limpiar(self, envuelta: Callable) -> None:
+        pass
+
+    def invalidar(self, envuelta: Callable, args: tuple, kwargs: dict) -> None:
+        pass
+
+    def llaves(self, envuelta: Callable) -> Optional[List[tuple]]:
+        return []
+
+    def estadisticas(self, envuelta: Callable) -> dict:
+        return {"entradas": 0, "bytes": 0}
+
+
+def estimar_bytes(valor: Any, _vistos: Optional[set] = None) -> int:
+    """
+    Estima la memoria (deep) de un valor cacheado.
+
+    DataFrames/Series usan memory_usage(deep=True), arreglos NumPy nbytes y
+    contenedores se recorren recursivamente (cada objeto se cuenta una vez).
+
+    Args:
+        valor: Objeto a medir
+
+    Returns:
+        Bytes estimados
+    """
+    vistos = set() if _vistos is None else _vistos
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+
+    uso = getattr(valor, "memory_usage", None)
+    if callable(uso):
+        try:
+            total = uso(deep=True)
+            return int(total.sum()) if hasattr(total, "sum") else int(total)
+        except TypeError:
+            pass
+    if hasattr(valor, "nbytes") and hasattr(valor, "dtype"):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(
+            estimar_bytes(k, vistos) + estimar_bytes(v, vistos) for k, v in valor.items()
+        )
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(estimar_bytes(v, vistos) for v in valor)
+    return sys.getsizeof(valor)
+
+
+BACKENDS = {
+    "streamlit": StreamlitCacheBackend,
+    "lru": LRUCacheBackend,
+    "none": NoOpCacheBackend,
+}
+
+_backend: Optional[CacheBackend] = None
+_funciones: List["FuncionCacheada"] = []
+
+
+def configurar_cache(backend: Union[str, CacheBackend]) -> CacheBackend:
+    """
+    Selecciona el backend de cache para todas las funciones decoradas.
+
+    Args:
+        backend: "streamlit", "lru", "none" o una instancia de CacheBackend
+
+    Returns:
+        Backend activo
+    """
+    global _backend
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de cache desconocido: {backend!r}. Opciones: {', '.join(BACKENDS)}")
+        backend = BACKENDS[backend]()
+    _backend = backend
+    return _backend
+
+
+def get_cache_backend() -> CacheBackend:
+    """
+    Obtiene el backend activo; si no se configuró, usa CFE_CACHE_BACKEND o "lru".
+
+    Returns:
+        Backend activo
+    """
+    if _backend is None:
+        configurar_cache(os.environ.get(ENV_CACHE_BACKEND, BACKEND_DEFAULT))
+    return _backend
+
+
+class FuncionCacheada:
+    """
+    Función decorada cuyo cache se crea con el backend activo en la primera
+    llamada (y se vuelve a crear si el backend cambia).
+
+    Para invalidar entradas sueltas con invalidar() sin vaciar todo el cache
+    usa las llaves del backend (ver CacheBackend.llaves); si el backend no las
+    expone, registra los argumentos de cada llamada. El registro se protege
+    con un candado porque Streamlit atiende cada sesión en su propio hilo.
+    """
+
+    def __init__(self, func: Callable, tipo: str):
+        self.func = func
+        self.tipo = tipo
+        self._backend: Optional[CacheBackend] = None
+        self._envuelta: Optional[Callable] = None
+        self._llamadas: set = set()
+        self._llamadas_sin_llave = False
+        self._registrar = False
+        self._candado = threading.Lock()
+        functools.update_wrapper(self, func)
+
+    def _resolver(self) -> Callable:
+        backend = get_cache_backend()
+        if self._backend is not backend:
+            with self._candado:
+                if self._backend is not backend:
+                    if self.tipo == "recurso":
+                        envuelta = backend.envolver_recurso(self.func)
+                    else:
+                        envuelta = backend.envolver_datos(self.func)
+                    self._registrar = backend.llaves(envuelta) is None
+                    self._llamadas = set()
+                    self._llamadas_sin_llave = False
+                    self._envuelta = envuelta
+                    self._backend = backend
+        return self._envuelta
+
+    def __call__(self, *args, **kwargs):
+        envuelta = self._resolver()
+        if self._registrar:
+            with self._candado:
+                try:
+                    self._llamadas.add((args, tuple(sorted(kwargs.items()))))
+                except TypeError:
+                    self._llamadas_sin_llave = True
+        return envuelta(*args, **kwargs)
+
+    def _llaves(self) -> List[tuple]:
+        """Copia de las llamadas con entrada en el cache (del backend o registradas)."""
+        llaves = self._backend.llaves(self._envuelta)
+        if llaves is not None:
+            return llaves
+        with self._candado:
+            return list(self._llamadas)
+
+    def clear(self) -> None:
+        """Vacía el cache de esta función."""
+        with self._candado:
+            if self._envuelta is not None:
+                self._backend.limpiar(self._envuelta)
+            self._llamadas = set()
+            self._llamadas_sin_llave = False
+
+    def invalidar(self, predicado: Callable[..., bool]) -> int:
+        """
+        Elimina del cache solo las llamadas cuyos argumentos cumplen el predicado.
+
+        Si hubo llamadas con argumentos no hashables (no registrables) se
+        vacía todo el cache de la función.
+
+        Args:
+            predicado: Función que recibe los mismos argumentos que la función
+                cacheada y devuelve True si su resultado ya no es válido
+
+        Returns:
+            Número de entradas invalidadas
+        """
+        if self._envuelta is None:
+            return 0
+        if self._llamadas_sin_llave:
+            invalidadas = len(self._llaves())
+            self.clear()
+            return invalidadas
+        invalidadas = 0
+        for llave in self._llaves():
+            args, kwargs = llave[0], dict(llave[1])
+            if predicado(*args, **kwargs):
+                self._backend.invalidar(self._envuelta, args, kwargs)
+                with self._candado:
+                    self._llamadas.discard(llave)
+                invalidadas += 1
+        return invalidadas
+
+    def estadisticas(self) -> dict:
+        """Entradas y bytes estimados del cache de esta función."""
+        if self._envuelta is None:
+            return {"entradas": 0, "bytes": 0}
+        return self._backend.estadisticas(self._envuelta)
+
+
+def cache_data(func: Callable) -> FuncionCacheada:
+    """Decorador: cache de datos (equivalente a st.cache_data)."""
+    funcion = FuncionCacheada(func, "datos")
+    _funciones.append(funcion)
+    return funcion
+
+
+def cache_resource(func: Callable) -> FuncionCacheada:
+    """Decorador: cache de recurso compartido (equivalente a st.cache_resource)."""
+    funcion = FuncionCacheada(func, "recurso")
+    _funciones.append(funcion)
+    return funcion
+
+
+def limpiar_caches() -> None:
+    """Vacía el cache de todas las funciones decoradas."""
+    for funcion in _funciones:
+        funcion.clear()
+
+
+def get_estadisticas_caches() -> Dict[str, dict]:
+    """
+    Entradas y bytes estimados del cache de cada función decorada.
+
+    Returns:
+        Diccionario {nombre: {"tipo": "datos"|"recurso", "entradas", "bytes"}}
+    """
+    return {
+        nombre: {"tipo": funcion.tipo, **funcion.estadisticas()}
+        for nombre, funcion in get_funciones_cacheadas().items()
+    }
+
+
+def get_funciones_cacheadas() -> Dict[str, FuncionCacheada]:
+    """
+    Obtiene las funciones decoradas registradas.
+
+    Returns:
+        Diccionario {nombre_calificado: función}
+    """
+    return {f"{f.func.__module__}.{f.func.__qualname__}": f for f in _funciones}
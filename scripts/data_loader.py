@@ -2,15 +2,47 @@
 CFE Tariff Analyzer - Data Loader Module
 =========================================
 Funciones para carga y gestión de datos desde archivos CSV.
-Todas las funciones usan cache de Streamlit para optimizar rendimiento.
+Las funciones cacheadas usan el backend de cache_backend (Streamlit en la app,
+LRU en proceso para scripts y notebooks), así que el módulo no depende de Streamlit.
 """
 
 from typing import Optional, List, Tuple
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
 import unicodedata
+import numpy as np
 import pandas as pd
-import streamlit as st
+from pandas.api.types import union_categoricals
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+if __package__:
+    from .cache_backend import cache_data, cache_resource, get_estadisticas_caches, limpiar_caches
+    from .sql_store import AlmacenSQL
+else:
+    from cache_backend import cache_data, cache_resource, get_estadisticas_caches, limpiar_caches
+    from sql_store import AlmacenSQL
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage
+    resource = None
+
 # Orden de meses en español (minúsculas) para conversión 1-12
 MESES_NOMBRES = [
     "enero", "febrero", "marzo", "abril", "mayo", "junio",
@@ -39,6 +71,27 @@ def normalizar_texto(texto: str) -> str:
     texto = ''.join(c for c in texto if unicodedata.category(c) != 'Mn')
     return texto
 
+
+def normalizar_serie(serie: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de normalizar_texto para una columna completa.
+    
+    Cada valor distinto se normaliza una sola vez y el resultado se
+    reasigna a las filas, por lo que el costo depende del número de
+    nombres distintos y no del número de filas.
+    
+    Args:
+        serie: Columna a normalizar
+        
+    Returns:
+        Serie normalizada con el mismo índice (nulos -> "")
+    """
+    codigos, unicos = pd.factorize(serie)
+    # El código -1 (nulos) toma el último elemento: cadena vacía
+    normalizados = np.array([normalizar_texto(v) for v in unicos] + [""], dtype=object)
+    return pd.Series(normalizados[codigos], index=serie.index, name=serie.name)
+
+
 def mes_a_numero(mes_nombre: str) -> int:
     """
     Convierte nombre de mes en español a número 1-12.
@@ -77,8 +130,62 @@ DATA_DIR = Path(__file__).parent.parent / "data"
 GEOGRAFIA_FILE = DATA_DIR / "01_catalogo_regiones.csv"
 TARIFAS_FILE = DATA_DIR / "02_tarifas_finales_suministro_basico.csv"
 
+# Cache columnar (Parquet) del CSV de tarifas ya normalizado. No se versiona en git.
+CACHE_DIR = DATA_DIR / ".cache"
+# Incrementar cuando cambie la normalización para invalidar caches existentes
+VERSION_CACHE_TARIFAS = 2
+
+# Columnas de baja cardinalidad que se guardan como categóricas (códigos enteros
+# + diccionario de valores). Las comparaciones con strings siguen funcionando igual.
+COLUMNAS_CATEGORICAS_TARIFAS = ["tarifa", "descripcion", "region", "mes", "cargo", "int_horario"]
+
+# Columnas numéricas del CSV de tarifas (vacíos -> NaN)
+COLUMNAS_NUMERICAS_TARIFAS = [
+    "transmision", "distribucion", "cenace", "suministro",
+    "scnmem", "generacion", "capacidad", "total"
+]
+
+# Backend de consultas del histórico: "pandas" (DataFrame en memoria, default)
+# o "sqlite" (base local en CACHE_DIR, ver get_almacen_sql)
+ENV_DATA_BACKEND = "CFE_DATA_BACKEND"
+BACKENDS_DATOS = ("pandas", "sqlite")
+# Incrementar cuando cambie el esquema de la base SQLite para reconstruirla
+VERSION_ALMACEN_SQL = 1
+# Filas del CSV que se normalizan e insertan a la vez al construir la base
+LOTE_CSV_SQL = 100_000
+
+# Pico de RSS (bytes) registrado al terminar cada carga real de datos
+_rss_pico_carga = {}
+
+# Incrementos mensuales incluidos en la última carga de cada CSV de tarifas {ruta: [nombres]}
+_incrementos_cargados = {}
+
+# Serializa la escritura del dataset particionado entre hilos (entre procesos: _candado_archivo)
+_candado_particiones = threading.Lock()
+
+# Serializa la extensión del histórico con incrementos (ver actualizar_tarifas); reentrante
+# porque actualizar_tarifas puede construir la base SQLite, que también agrega incrementos
+_candado_actualizacion = threading.RLock()
+
+# Backend de datos activo (se resuelve en la primera consulta, ver get_backend_datos)
+_backend_datos: Optional[str] = None
+
+
+def rss_pico_bytes() -> Optional[int]:
+    """
+    Pico de memoria residente (RSS) del proceso hasta ahora.
+    
+    Returns:
+        Bytes, o None si la plataforma no lo expone
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB; macOS reporta bytes
+    return int(pico if sys.platform == "darwin" else pico * 1024)
+
 
-@st.cache_data
+@cache_data
 def load_geografia() -> pd.DataFrame:
     """
     Carga el catálogo de geografía (Estados, Municipios, Divisiones).
@@ -93,45 +200,827 @@ def load_geografia() -> pd.DataFrame:
     df.columns = ["estado", "municipio", "division"]
     
     # Normalizar: UPPER CASE, sin acentos, sin espacios extras
-    df["estado"] = df["estado"].apply(normalizar_texto)
-    df["municipio"] = df["municipio"].apply(normalizar_texto)
-    df["division"] = df["division"].apply(normalizar_texto)
+    df["estado"] = normalizar_serie(df["estado"])
+    df["municipio"] = normalizar_serie(df["municipio"])
+    df["division"] = normalizar_serie(df["division"])
     
     # Eliminar filas con valores nulos
     df = df.dropna()
     
+    _rss_pico_carga["geografia"] = rss_pico_bytes()
     return df
 
 
-@st.cache_data
-def load_tarifas() -> pd.DataFrame:
+def _normalizar_tarifas(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Carga el histórico de tarifas de CFE.
+    Aplica la normalización del CSV de tarifas (región, numéricos, meses).
     
+    Args:
+        df: DataFrame leído directamente del CSV
+        
     Returns:
-        DataFrame con todas las columnas del CSV, región normalizada a UPPER CASE
+        DataFrame normalizado
     """
-    df = pd.read_csv(TARIFAS_FILE)
-    
     # Normalizar región: UPPER CASE, sin acentos para match con geografía
-    df["region"] = df["region"].apply(normalizar_texto)
+    df["region"] = normalizar_serie(df["region"])
     
     # Convertir columnas numéricas (manejar valores vacíos)
-    numeric_cols = [
-        "transmision", "distribucion", "cenace", "suministro", 
-        "scnmem", "generacion", "capacidad", "total"
-    ]
-    for col in numeric_cols:
+    for col in COLUMNAS_NUMERICAS_TARIFAS:
         df[col] = pd.to_numeric(df[col], errors="coerce")
     
     # Añadir mes_numero (1-12) para ordenamiento y filtrado
     df["mes"] = df["mes"].astype(str).str.strip().str.lower()
-    df["mes_numero"] = df["mes"].apply(mes_a_numero)
+    meses_a_numero = {mes: i + 1 for i, mes in enumerate(MESES_NOMBRES)}
+    df["mes_numero"] = df["mes"].map(meses_a_numero).fillna(0).astype(int)
+    
+    # Representación compacta de columnas repetidas en cada fila
+    for col in COLUMNAS_CATEGORICAS_TARIFAS:
+        df[col] = df[col].astype("category")
+    
+    return df
+
+
+def huella_archivo(ruta: Path, con_hash: bool = True) -> dict:
+    """
+    Obtiene la huella de un archivo para validar caches derivados de él.
+    
+    Args:
+        ruta: Ruta del archivo
+        con_hash: Si True incluye el SHA-256 del contenido
+        
+    Returns:
+        Diccionario con tamano, mtime_ns y (opcional) sha256
+    """
+    info = ruta.stat()
+    huella = {"tamano": info.st_size, "mtime_ns": info.st_mtime_ns}
+    if con_hash:
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                sha.update(bloque)
+        huella["sha256"] = sha.hexdigest()
+    return huella
+
+
+def _huella_vigente(guardada: Optional[dict], ruta: Path) -> Optional[dict]:
+    """
+    Compara un archivo contra la huella guardada en los metadatos del cache.
+    
+    Si el tamaño y mtime coinciden no se recalcula el hash. Si solo cambió el
+    mtime (ej. checkout nuevo) se compara el SHA-256 del contenido.
+    
+    Args:
+        guardada: Huella guardada (tamano, mtime_ns, sha256) o None
+        ruta: Archivo a comparar
+        
+    Returns:
+        Huella actual si el contenido no cambió, None en caso contrario
+    """
+    if not guardada:
+        return None
+    huella = huella_archivo(ruta, con_hash=False)
+    if guardada.get("tamano") != huella["tamano"]:
+        return None
+    if guardada.get("mtime_ns") == huella["mtime_ns"]:
+        return {**huella, "sha256": guardada.get("sha256")}
+    huella = huella_archivo(ruta)
+    return huella if guardada.get("sha256") == huella["sha256"] else None
+
+
+def _escribir_parquet(df: pd.DataFrame, ruta_parquet: Path) -> bool:
+    """
+    Escribe un Parquet de forma atómica.
+    
+    Returns:
+        False si pyarrow no está disponible o el directorio no es escribible
+    """
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = ruta_parquet.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta_parquet)
+        return True
+    except (ImportError, OSError, ValueError):
+        return False
+
+
+def _leer_meta_cache(ruta_meta: Path) -> Optional[dict]:
+    """Metadatos del cache Parquet, o None si no existen, están dañados o son de otra versión."""
+    try:
+        meta = json.loads(ruta_meta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == VERSION_CACHE_TARIFAS else None
+
+
+def archivos_incremento_tarifas(ruta_csv: Optional[Path] = None) -> List[Path]:
+    """
+    Archivos mensuales que se agregan al histórico sin reemplazar el CSV principal.
+    
+    Un incremento tiene el mismo esquema que el CSV de tarifas y se llama
+    "<nombre del CSV>_<sufijo>.csv" en el mismo directorio, por ejemplo
+    02_tarifas_finales_suministro_basico_2025_07.csv. Se agregan en orden
+    alfabético, así que el sufijo debe ordenar cronológicamente (AAAA_MM).
+    
+    Args:
+        ruta_csv: CSV principal (default: TARIFAS_FILE)
+        
+    Returns:
+        Rutas de los incrementos en orden de aplicación
+    """
+    ruta_csv = ruta_csv or TARIFAS_FILE
+    return sorted(ruta_csv.parent.glob(f"{ruta_csv.stem}_*.csv"))
+
+
+def _leer_incremento(ruta: Path, guardado: Optional[dict]) -> Tuple[pd.DataFrame, dict]:
+    """
+    Lee un incremento normalizado: desde su Parquet en CACHE_DIR si el CSV no
+    cambió, o normalizando el CSV y guardando su Parquet.
+    
+    Args:
+        ruta: CSV del incremento
+        guardado: Huella registrada en los metadatos del cache (o None)
+        
+    Returns:
+        (DataFrame normalizado, huella con "nombre" para los metadatos)
+    """
+    ruta_parquet = CACHE_DIR / f"{ruta.stem}.parquet"
+    huella = _huella_vigente(guardado, ruta)
+    if huella is not None:
+        try:
+            return pd.read_parquet(ruta_parquet), {"nombre": ruta.name, **huella}
+        except (ImportError, OSError, ValueError):
+            pass
+    df = _normalizar_tarifas(pd.read_csv(ruta))
+    _escribir_parquet(df, ruta_parquet)
+    return df, {"nombre": ruta.name, **huella_archivo(ruta)}
+
+
+def _concatenar_tarifas(partes: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Une DataFrames de tarifas normalizados conservando las columnas categóricas
+    (la unión de categorías evita pasar por objetos Python fila por fila).
+    Las categorías quedan ordenadas, igual que al leer un solo archivo: una
+    tarifa que aparece por primera vez en un incremento no queda al final.
+    
+    Args:
+        partes: DataFrames normalizados en el orden en que se agregan
+        
+    Returns:
+        DataFrame con las filas de todas las partes e índice 0..n-1
+    """
+    if len(partes) == 1:
+        return partes[0]
+    columnas = list(partes[0].columns)
+    categoricas = [col for col in COLUMNAS_CATEGORICAS_TARIFAS if col in columnas]
+    df = pd.concat([p.drop(columns=categoricas, errors="ignore") for p in partes], ignore_index=True)
+    for col in categoricas:
+        valores = [p[col] if col in p.columns else pd.Series(np.nan, index=p.index).astype("category") for p in partes]
+        try:
+            df[col] = union_categoricals(valores, sort_categories=True)
+        except TypeError:
+            # Categorías de distinto tipo (ej. columna vacía en un incremento)
+            df[col] = pd.concat([v.astype(object) for v in valores], ignore_index=True).astype("category")
+    return df[columnas + [c for c in df.columns if c not in columnas]]
+
+
+def _leer_tarifas_con_cache(ruta_csv: Path) -> pd.DataFrame:
+    """
+    Lee el CSV de tarifas normalizado, reutilizando el Parquet de CACHE_DIR
+    cuando la huella del CSV (tamaño, mtime y SHA-256) no ha cambiado.
+    
+    Si el tamaño y mtime coinciden con los guardados no se recalcula el hash.
+    Si solo cambió el mtime (ej. checkout nuevo) pero el contenido es igual,
+    se reutiliza el Parquet y se actualiza la huella. Si pyarrow no está
+    disponible o el directorio no es escribible, se lee el CSV directamente.
+    
+    Los archivos de incremento (archivos_incremento_tarifas) se agregan al
+    final; cada uno tiene su propio Parquet, así que un mes nuevo solo
+    normaliza su archivo.
+    
+    Args:
+        ruta_csv: Ruta del CSV de tarifas
+        
+    Returns:
+        DataFrame normalizado
+    """
+    ruta_parquet = CACHE_DIR / f"{ruta_csv.stem}.parquet"
+    ruta_meta = CACHE_DIR / f"{ruta_csv.stem}.json"
+    
+    meta = _leer_meta_cache(ruta_meta) if ruta_parquet.exists() else None
+    df = None
+    huella = _huella_vigente(meta, ruta_csv)
+    if huella is not None:
+        try:
+            df = pd.read_parquet(ruta_parquet)
+        except (ImportError, OSError, ValueError):
+            df = None
+    
+    if df is None:
+        df = _normalizar_tarifas(pd.read_csv(ruta_csv))
+        huella = huella_archivo(ruta_csv)
+        if not _escribir_parquet(df, ruta_parquet):
+            # Sin pyarrow o sin permisos de escritura: seguir sin cache persistente
+            meta = None
+        else:
+            meta = {}
+    
+    # Incrementos mensuales: Parquet propio por archivo
+    guardados = {inc["nombre"]: inc for inc in (meta or {}).get("incrementos", [])}
+    partes, incrementos = [df], []
+    for ruta in archivos_incremento_tarifas(ruta_csv):
+        df_inc, huella_inc = _leer_incremento(ruta, guardados.get(ruta.name))
+        partes.append(df_inc)
+        incrementos.append(huella_inc)
+    _incrementos_cargados[str(ruta_csv)] = [inc["nombre"] for inc in incrementos]
+    
+    if meta is not None:
+        nueva_meta = {"version": VERSION_CACHE_TARIFAS, **huella, "incrementos": incrementos}
+        if nueva_meta != meta:
+            try:
+                _escribir_meta_cache(ruta_meta, nueva_meta)
+            except OSError:
+                pass
+    
+    return _concatenar_tarifas(partes)
+
+
+def _escribir_meta_cache(ruta_meta: Path, meta: dict) -> None:
+    """Escribe de forma atómica el archivo de metadatos del cache."""
+    tmp = ruta_meta.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, ruta_meta)
+
+
+# Columnas de partición del dataset Parquet de tarifas (anio=2024/tarifa=GDMTH/...)
+COLUMNAS_PARTICION_TARIFAS = ["anio", "tarifa"]
+
+
+def _ruta_dataset_tarifas(ruta_csv: Path) -> Path:
+    """Directorio del dataset particionado derivado de un CSV de tarifas."""
+    return CACHE_DIR / f"{ruta_csv.stem}_particionado"
+
+
+@contextmanager
+def _candado_archivo(ruta: Path):
+    """
+    Candado exclusivo entre procesos sobre un archivo (fcntl en POSIX, msvcrt
+    en Windows). Si la plataforma no ofrece ninguno no bloquea.
+    """
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, "a+b") as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            archivo.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK se rinde tras 10 intentos de un segundo
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _escribir_particiones(df: pd.DataFrame, ruta_dataset: Path, orden: int) -> None:
+    """
+    Agrega filas normalizadas al dataset particionado por anio y tarifa.
+    
+    Cada escritura usa su propio prefijo de archivo (orden), así que dentro de
+    una partición los archivos se leen en el orden en que se agregaron y las
+    filas conservan el orden del CSV.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    
+    tabla = pa.Table.from_pandas(df.astype({"tarifa": object}), preserve_index=False)
+    ds.write_dataset(
+        tabla, ruta_dataset, format="parquet",
+        partitioning=COLUMNAS_PARTICION_TARIFAS, partitioning_flavor="hive",
+        basename_template=f"{orden:04d}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        preserve_order=True,
+    )
+
+
+def _asegurar_particiones(ruta_csv: Path) -> Optional[Path]:
+    """
+    Mantiene el dataset particionado al día con el CSV y sus incrementos.
+    
+    Si solo hay incrementos nuevos se escriben únicamente sus particiones;
+    si cambió el CSV base o un incremento ya escrito, el dataset se
+    reconstruye completo en un directorio temporal y se reemplaza.
+    
+    Las escrituras se serializan entre hilos y procesos (candado de módulo y
+    de archivo), cada una escribe en su propio directorio temporal y
+    _estado.json solo registra archivos ya escritos completos.
+    
+    Args:
+        ruta_csv: Ruta del CSV de tarifas
+        
+    Returns:
+        Directorio del dataset, o None si pyarrow no está disponible o el
+        cache no es escribible
+    """
+    try:
+        import pyarrow.dataset  # noqa: F401
+    except ImportError:
+        return None
+    
+    ruta_dataset = _ruta_dataset_tarifas(ruta_csv)
+    try:
+        with _candado_particiones, _candado_archivo(ruta_dataset.with_name(ruta_dataset.name + ".lock")):
+            return _actualizar_particiones(ruta_csv, ruta_dataset)
+    except OSError:
+        return None
+
+
+def _actualizar_particiones(ruta_csv: Path, ruta_dataset: Path) -> Optional[Path]:
+    """Cuerpo de _asegurar_particiones; se llama con los candados tomados."""
+    ruta_parquet = CACHE_DIR / f"{ruta_csv.stem}.parquet"
+    ruta_meta = CACHE_DIR / f"{ruta_csv.stem}.json"
+    meta = _leer_meta_cache(ruta_meta) if ruta_parquet.exists() else None
+    incrementos = archivos_incremento_tarifas(ruta_csv)
+    vigente = (
+        meta is not None
+        and _huella_vigente(meta, ruta_csv) is not None
+        and [inc["nombre"] for inc in meta.get("incrementos", [])] == [ruta.name for ruta in incrementos]
+        and all(_huella_vigente(inc, ruta) for inc, ruta in zip(meta["incrementos"], incrementos))
+    )
+    if not vigente:
+        # El Parquet plano está desactualizado: se regenera (una lectura completa)
+        _leer_tarifas_con_cache(ruta_csv)
+        meta = _leer_meta_cache(ruta_meta)
+        if meta is None:
+            return None
+    
+    ruta_estado = ruta_dataset / "_estado.json"
+    # Temporales de escrituras interrumpidas (con el candado tomado nadie más escribe)
+    for huerfano in CACHE_DIR.glob(f"{ruta_dataset.name}.tmp*"):
+        shutil.rmtree(huerfano, ignore_errors=True)
+    esperados = [{"nombre": inc["nombre"], "sha256": inc["sha256"]} for inc in meta.get("incrementos", [])]
+    try:
+        estado = json.loads(ruta_estado.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        estado = None
+    
+    try:
+        if (
+            estado is not None
+            and estado.get("sha256") == meta["sha256"]
+            and esperados[:len(estado["incrementos"])] == estado["incrementos"]
+        ):
+            # Solo los incrementos que aún no tienen particiones
+            for orden in range(len(estado["incrementos"]), len(esperados)):
+                ruta_inc = CACHE_DIR / f"{Path(esperados[orden]['nombre']).stem}.parquet"
+                # Se escribe aparte y cada archivo se mueve completo: un lector nunca ve uno a medias
+                tmp = Path(tempfile.mkdtemp(prefix=f"{ruta_dataset.name}.tmp", dir=CACHE_DIR))
+                try:
+                    _escribir_particiones(pd.read_parquet(ruta_inc), tmp, orden + 1)
+                    for archivo in sorted(tmp.rglob("*.parquet")):
+                        destino = ruta_dataset / archivo.relative_to(tmp)
+                        destino.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(archivo, destino)
+                finally:
+                    shutil.rmtree(tmp, ignore_errors=True)
+                estado["incrementos"].append(esperados[orden])
+                _escribir_meta_cache(ruta_estado, estado)
+            return ruta_dataset
+        
+        df = _leer_tarifas_con_cache(ruta_csv)
+        tmp = Path(tempfile.mkdtemp(prefix=f"{ruta_dataset.name}.tmp", dir=CACHE_DIR))
+        try:
+            _escribir_particiones(df, tmp, 0)
+            _escribir_meta_cache(tmp / "_estado.json", {
+                "sha256": meta["sha256"], "incrementos": esperados, "columnas": list(df.columns),
+            })
+            # El dataset anterior se aparta antes de borrarlo: la ruta queda sin dataset solo un instante
+            if ruta_dataset.exists():
+                os.replace(ruta_dataset, tmp.with_name(tmp.name + "-anterior"))
+            os.replace(tmp, ruta_dataset)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            shutil.rmtree(tmp.with_name(tmp.name + "-anterior"), ignore_errors=True)
+        return ruta_dataset
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def _leer_particiones(ruta_dataset: Path, anios: Optional[Tuple[int, ...]], tarifas: Optional[Tuple[str, ...]]) -> pd.DataFrame:
+    """
+    Lee del dataset particionado solo las particiones (anio, tarifa) pedidas:
+    el filtro se evalúa sobre las rutas, sin abrir los demás archivos.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    
+    particion = ds.partitioning(pa.schema([("anio", pa.int64()), ("tarifa", pa.string())]), flavor="hive")
+    dataset = ds.dataset(ruta_dataset, format="parquet", partitioning=particion)
+    filtro = None
+    if anios is not None:
+        filtro = ds.field("anio").isin([int(a) for a in anios])
+    if tarifas is not None:
+        filtro_tarifa = ds.field("tarifa").isin(list(tarifas))
+        filtro = filtro_tarifa if filtro is None else filtro & filtro_tarifa
+    
+    df = dataset.to_table(filter=filtro).to_pandas()
+    df["tarifa"] = df["tarifa"].astype("category")
+    columnas = json.loads((ruta_dataset / "_estado.json").read_text(encoding="utf-8"))["columnas"]
+    return df[columnas]
+
+
+@cache_data
+def load_tarifas(anios: Optional[Tuple[int, ...]] = None, tarifas: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """
+    Carga el histórico de tarifas de CFE.
+    
+    Usa el cache Parquet de data/.cache cuando el CSV no ha cambiado;
+    en caso contrario lee y normaliza el CSV y regenera el cache.
+    
+    Con anios y/o tarifas solo se leen las particiones (anio, tarifa)
+    correspondientes del dataset particionado, sin cargar el resto del
+    histórico. Sin pyarrow se filtra el histórico completo en memoria.
+    Con el backend "sqlite" las filas se consultan en la base local.
+    
+    Args:
+        anios: Años a cargar (tupla), o None para todos
+        tarifas: Tarifas a cargar (tupla), o None para todas
+    
+    Returns:
+        DataFrame con todas las columnas del CSV, región normalizada a UPPER CASE.
+        Con filtros, las filas quedan agrupadas por (anio, tarifa) y en el orden
+        del CSV dentro de cada grupo
+    """
+    if _usar_sql():
+        orden = "fila" if anios is None and tarifas is None else "anio, tarifa, fila"
+        return _consultar_tarifas_sql(tarifas=tarifas, anios=anios, orden=orden)
+    
+    if anios is None and tarifas is None:
+        df = _leer_tarifas_con_cache(TARIFAS_FILE)
+        _rss_pico_carga["tarifas"] = rss_pico_bytes()
+        return df
+    
+    ruta_dataset = _asegurar_particiones(TARIFAS_FILE)
+    if ruta_dataset is not None:
+        try:
+            return _leer_particiones(ruta_dataset, anios, tarifas)
+        except (OSError, ValueError):
+            # Dataset reemplazado por otro proceso durante la lectura (ArrowInvalid es ValueError)
+            pass
+    
+    df = get_indice_tarifas()["df"]
+    mask = pd.Series(True, index=df.index)
+    if anios is not None:
+        mask &= df["anio"].isin(anios)
+    if tarifas is not None:
+        mask &= df["tarifa"].isin(tarifas)
+    return df[mask].sort_values(COLUMNAS_PARTICION_TARIFAS, kind="stable", ignore_index=True)
+
+
+def configurar_backend_datos(nombre: str) -> str:
+    """
+    Selecciona dónde se consultan los datos: "pandas" (histórico completo en
+    un DataFrame) o "sqlite" (base local con índices, ver get_almacen_sql).
+    
+    Ambos backends dan los mismos resultados (verificar_equivalencia_sql).
+    Al cambiar de backend se vacían los caches, porque sus llaves no
+    incluyen el backend.
+    
+    Args:
+        nombre: "pandas" o "sqlite"
+    
+    Returns:
+        Backend activo
+    """
+    global _backend_datos
+    nombre = nombre.strip().lower()
+    if nombre not in BACKENDS_DATOS:
+        raise ValueError(f"Backend de datos desconocido: {nombre!r}. Opciones: {', '.join(BACKENDS_DATOS)}")
+    if _backend_datos is not None and nombre != _backend_datos:
+        limpiar_caches()
+        _incrementos_cargados.pop(str(TARIFAS_FILE), None)
+    _backend_datos = nombre
+    return _backend_datos
+
+
+def get_backend_datos() -> str:
+    """
+    Obtiene el backend de datos activo; si no se configuró, usa CFE_DATA_BACKEND o "pandas".
+    
+    Returns:
+        "pandas" o "sqlite"
+    """
+    if _backend_datos is None:
+        configurar_backend_datos(os.environ.get(ENV_DATA_BACKEND, BACKENDS_DATOS[0]))
+    return _backend_datos
+
+
+def _usar_sql() -> bool:
+    """True si las consultas van a la base SQLite."""
+    return get_backend_datos() == "sqlite"
+
+
+def _huellas_incrementos_vigentes(guardados: List[dict], incrementos: List[Path]) -> bool:
+    """True si los incrementos registrados son un prefijo sin cambios de los archivos actuales."""
+    return (
+        [inc["nombre"] for inc in guardados] == [ruta.name for ruta in incrementos[:len(guardados)]]
+        and all(_huella_vigente(inc, ruta) for inc, ruta in zip(guardados, incrementos))
+    )
+
+
+def _agregar_incrementos_sql(almacen: AlmacenSQL, rutas: List[Path]) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Normaliza archivos de incremento y los agrega al final de la base SQLite
+    (los que otro proceso ya agregó se omiten, ver AlmacenSQL.agregar_tarifas).
+    
+    Returns:
+        (DataFrame con las filas agregadas, nombres de los archivos agregados)
+    """
+    with _candado_actualizacion:
+        leidos = [_leer_incremento(ruta, None) for ruta in rutas]
+        agregados = [huella["nombre"] for huella in almacen.agregar_tarifas([(huella, df) for df, huella in leidos])]
+    partes = [df for df, huella in leidos if huella["nombre"] in agregados]
+    return (_concatenar_tarifas(partes) if partes else leidos[0][0].iloc[:0]), agregados
+
+
+@cache_resource
+def get_almacen_sql() -> AlmacenSQL:
+    """
+    Base SQLite del backend "sqlite" (CACHE_DIR/<CSV>.sqlite), al día con el
+    CSV de tarifas, sus incrementos y el catálogo geográfico.
     
+    Se construye leyendo el CSV por lotes de LOTE_CSV_SQL filas, así que la
+    memoria no crece con el tamaño del histórico. Si solo hay incrementos
+    nuevos se agregan al final; si cambió el CSV, la geografía o un
+    incremento ya agregado, la base se reconstruye.
+    
+    Returns:
+        AlmacenSQL compartido (también sirve para consultas ad hoc, ver consultar_sql)
+    """
+    almacen = AlmacenSQL(CACHE_DIR / f"{TARIFAS_FILE.stem}.sqlite")
+    incrementos = archivos_incremento_tarifas(TARIFAS_FILE)
+    
+    meta = almacen.meta()
+    if (
+        meta is not None
+        and meta.get("version") == VERSION_ALMACEN_SQL
+        and _huella_vigente(meta.get("tarifas"), TARIFAS_FILE) is not None
+        and _huella_vigente(meta.get("geografia"), GEOGRAFIA_FILE) is not None
+        and _huellas_incrementos_vigentes(meta.get("incrementos", []), incrementos)
+    ):
+        nuevos = incrementos[len(meta["incrementos"]):]
+        if nuevos:
+            _agregar_incrementos_sql(almacen, nuevos)
+    else:
+        def lotes():
+            for lote in pd.read_csv(TARIFAS_FILE, chunksize=LOTE_CSV_SQL):
+                yield _normalizar_tarifas(lote)
+            for ruta in incrementos:
+                yield _normalizar_tarifas(pd.read_csv(ruta))
+        
+        almacen.construir(lotes(), load_geografia(), {
+            "version": VERSION_ALMACEN_SQL,
+            "tarifas": huella_archivo(TARIFAS_FILE),
+            "geografia": huella_archivo(GEOGRAFIA_FILE),
+            "incrementos": [{"nombre": ruta.name, **huella_archivo(ruta)} for ruta in incrementos],
+        })
+    
+    _incrementos_cargados[str(TARIFAS_FILE)] = [ruta.name for ruta in incrementos]
+    return almacen
+
+
+def consultar_sql(sql: str, parametros: tuple = ()) -> pd.DataFrame:
+    """
+    Ejecuta una consulta SQL de solo lectura sobre la base local de tarifas.
+    
+    Tablas: tarifas (columnas del CSV normalizadas, más mes_numero y fila =
+    orden del CSV) y geografia (estado, municipio, division). Funciona con
+    cualquier backend; la base se construye en la primera llamada.
+    
+    Args:
+        sql: Sentencia SELECT (parámetros con ?)
+        parametros: Valores de los parámetros
+    
+    Returns:
+        DataFrame con el resultado
+    
+    Ejemplo:
+        consultar_sql("SELECT region, AVG(total) AS promedio FROM tarifas "
+                      "WHERE tarifa = ? AND anio = ? GROUP BY region", ("GDMTH", 2024))
+    """
+    return get_almacen_sql().consultar(sql, parametros)
+
+
+def _consultar_tarifas_sql(
+    columnas: Optional[List[str]] = None,
+    tarifas: Optional[Tuple[str, ...]] = None,
+    region: Optional[str] = None,
+    anios: Optional[Tuple[int, ...]] = None,
+    mes_numero: Optional[int] = None,
+    orden: str = "fila",
+) -> pd.DataFrame:
+    """
+    Filas de la tabla tarifas con los tipos de load_tarifas (categóricas y numéricos).
+    
+    Args:
+        columnas: Columnas a traer (None = todas las del CSV normalizado)
+        tarifas, region, anios, mes_numero: Filtros (None = sin filtro)
+        orden: Cláusula ORDER BY ("fila" = orden del CSV)
+    """
+    almacen = get_almacen_sql()
+    columnas = columnas or almacen.columnas("tarifas")
+    condiciones, parametros = [], []
+    for columna, valores in (("tarifa", tarifas), ("anio", anios)):
+        if valores is not None:
+            condiciones.append(f"{columna} IN ({', '.join('?' * len(valores))})")
+            parametros.extend(int(v) if columna == "anio" else v for v in valores)
+    if region is not None:
+        condiciones.append("region = ?")
+        parametros.append(region)
+    if mes_numero is not None:
+        condiciones.append("mes_numero = ?")
+        parametros.append(int(mes_numero))
+    
+    sql = f"SELECT {', '.join(columnas)} FROM tarifas"
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    df = almacen.consultar(f"{sql} ORDER BY {orden}", tuple(parametros))
+    
+    for col in df.columns:
+        if col in COLUMNAS_CATEGORICAS_TARIFAS:
+            df[col] = df[col].astype("category")
+        elif col in COLUMNAS_NUMERICAS_TARIFAS:
+            # Columna sin ningún dato: SQLite devuelve None, pandas NaN
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+        elif col in ("anio", "mes_numero") and df.empty:
+            df[col] = df[col].astype("int64")
     return df
 
 
-@st.cache_data
+@cache_resource
+def _get_catalogo_sql() -> dict:
+    """Valores distintos de cargo en la base SQLite (las llaves del índice que usa _cargos_por_tipo)."""
+    cargos = consultar_sql("SELECT DISTINCT cargo FROM tarifas WHERE cargo IS NOT NULL ORDER BY cargo")
+    return {"cargos": cargos["cargo"].tolist(), "cargos_por_tipo": {}}
+
+
+def _cargos_de_tipo(tipo_cargo: str) -> List[str]:
+    """_cargos_por_tipo con el catálogo del backend activo (con "sqlite" no se construye el índice)."""
+    return _cargos_por_tipo(_get_catalogo_sql() if _usar_sql() else get_indice_tarifas(), tipo_cargo)
+
+
+# Columnas que forman la llave del índice de tarifas
+CLAVE_INDICE_TARIFAS = ["tarifa", "region", "anio", "mes_numero", "cargo", "int_horario"]
+
+
+def _posiciones_por_grupo(df: pd.DataFrame, columnas: List[str]) -> dict:
+    """
+    Equivalente a df.groupby(columnas, sort=False, dropna=False).indices, pero
+    agrupando sobre códigos enteros: evita convertir a objeto Python cada
+    valor categórico, que domina el tiempo de groupby(...).indices.
+    
+    Args:
+        df: DataFrame a agrupar
+        columnas: Columnas de la llave
+        
+    Returns:
+        Diccionario {tupla_de_valores (o valor si es una columna): posiciones},
+        en orden de primera aparición
+    """
+    llave = np.zeros(len(df), dtype=np.int64)
+    codigos_por_col, valores_por_col = [], []
+    for col in columnas:
+        codigos, unicos = pd.factorize(df[col], use_na_sentinel=False)
+        llave = llave * len(unicos) + codigos
+        codigos_por_col.append(codigos)
+        valores_por_col.append(unicos.tolist())
+    
+    grupo, _ = pd.factorize(llave)
+    orden = np.argsort(grupo, kind="stable")
+    cortes = np.cumsum(np.bincount(grupo))[:-1]
+    posiciones = np.split(orden, cortes)
+    
+    # Valores de la llave tomados de la primera fila de cada grupo
+    primeras = orden[np.r_[0, cortes]] if len(orden) else orden
+    valores = [
+        np.array(unicos, dtype=object)[codigos[primeras]]
+        for unicos, codigos in zip(valores_por_col, codigos_por_col)
+    ]
+    claves = zip(*valores) if len(valores) > 1 else valores[0]
+    return dict(zip(claves, posiciones))
+
+
+@cache_resource
+def get_indice_tarifas() -> dict:
+    """
+    Construye una sola vez el índice de filas del histórico de tarifas.
+    
+    Las funciones get_* consultan este índice en lugar de aplicar máscaras
+    booleanas sobre todo el DataFrame en cada llamada.
+    
+    Returns:
+        Diccionario con:
+        - "df": DataFrame de tarifas compartido (no modificar)
+        - "total": columna total como arreglo NumPy
+        - "filas": {(tarifa, region, anio, mes_numero, cargo, int_horario): posiciones}
+        - "cargos": valores distintos de la columna cargo
+        - "horarios": valores distintos de la columna int_horario
+        - "periodos": {(tarifa, region): (primer_ord, ultimo_ord)} con ord = anio * 12 + mes
+        - "series": {(tarifa, region): posiciones} de todas las filas de cada serie
+        - "incrementos": nombres de los archivos de incremento incluidos en "df"
+    """
+    df = load_tarifas()
+    
+    # Posiciones (iloc) de cada combinación, en el orden original del CSV
+    filas = _posiciones_por_grupo(df, CLAVE_INDICE_TARIFAS)
+    
+    series = _posiciones_por_grupo(df, ["tarifa", "region"])
+    
+    fecha_ord = (df["anio"] * 12 + df["mes_numero"]).to_numpy()
+    periodos = {}
+    for clave, pos in series.items():
+        fechas = fecha_ord[pos]
+        periodos[clave] = (int(fechas.min()), int(fechas.max()))
+    
+    return {
+        "df": df,
+        "total": df["total"].to_numpy(dtype=float),
+        "filas": filas,
+        "cargos": [c for c in df["cargo"].unique().tolist() if isinstance(c, str)],
+        "horarios": df["int_horario"].unique().tolist(),
+        "periodos": periodos,
+        "series": series,
+        "cargos_por_tipo": {},
+        "incrementos": list(_incrementos_cargados.get(str(TARIFAS_FILE), [])),
+    }
+
+
+def _cargos_por_tipo(indice: dict, tipo_cargo: str) -> List[str]:
+    """
+    Valores de cargo que contienen tipo_cargo (sin distinguir mayúsculas),
+    equivalente a df["cargo"].str.contains(tipo_cargo, case=False).
+    """
+    cache = indice["cargos_por_tipo"]
+    if tipo_cargo not in cache:
+        patron = re.compile(tipo_cargo, flags=re.IGNORECASE)
+        cache[tipo_cargo] = [c for c in indice["cargos"] if patron.search(c)]
+    return cache[tipo_cargo]
+
+
+@cache_resource
+def get_indice_geografia() -> dict:
+    """
+    Construye una sola vez la jerarquía geográfica del catálogo de regiones.
+    
+    Returns:
+        Diccionario con:
+        - "estados": lista de estados ordenada
+        - "arbol": {estado: {municipio: [divisiones ordenadas]}}
+        - "municipios": {estado: [municipios ordenados]}
+        - "por_division": {division: [(estado, municipio), ...] ordenados}
+    """
+    if _usar_sql():
+        df = consultar_sql(
+            "SELECT DISTINCT estado, municipio, division FROM geografia ORDER BY estado, municipio, division"
+        )
+    else:
+        df = load_geografia()
+        df = df[["estado", "municipio", "division"]].drop_duplicates()
+        df = df.sort_values(["estado", "municipio", "division"])
+    
+    arbol = {}
+    por_division = {}
+    for estado, municipio, division in df.itertuples(index=False):
+        arbol.setdefault(estado, {}).setdefault(municipio, []).append(division)
+        por_division.setdefault(division, []).append((estado, municipio))
+    
+    return {
+        "estados": list(arbol.keys()),
+        "arbol": arbol,
+        "municipios": {estado: list(municipios.keys()) for estado, municipios in arbol.items()},
+        "por_division": por_division,
+    }
+
+
+def _buscar_normalizado(mapa: dict, texto: str):
+    """
+    Busca texto en mapa; si no está tal cual, lo intenta ya normalizado.
+    Los valores que llegan de los selectores ya vienen normalizados.
+    """
+    valor = mapa.get(texto)
+    if valor is None:
+        valor = mapa.get(normalizar_texto(texto))
+    return valor
+
+
 def get_estados() -> List[str]:
     """
     Obtiene la lista de estados únicos ordenados alfabéticamente.
@@ -139,12 +1028,9 @@ def get_estados() -> List[str]:
     Returns:
         Lista de nombres de estados en UPPER CASE
     """
-    df = load_geografia()
-    estados = sorted(df["estado"].unique().tolist())
-    return estados
+    return list(get_indice_geografia()["estados"])
 
 
-@st.cache_data
 def get_municipios(estado: str) -> List[str]:
     """
     Obtiene la lista de municipios para un estado específico.
@@ -155,13 +1041,10 @@ def get_municipios(estado: str) -> List[str]:
     Returns:
         Lista de nombres de municipios ordenados alfabéticamente
     """
-    df = load_geografia()
-    estado_norm = normalizar_texto(estado)
-    municipios = df[df["estado"] == estado_norm]["municipio"].unique().tolist()
-    return sorted(municipios)
+    municipios = _buscar_normalizado(get_indice_geografia()["municipios"], estado)
+    return list(municipios) if municipios else []
 
 
-@st.cache_data
 def get_division(estado: str, municipio: str) -> Optional[str]:
     """
     Obtiene la división de CFE correspondiente a un estado y municipio.
@@ -180,7 +1063,6 @@ def get_division(estado: str, municipio: str) -> Optional[str]:
     return None
 
 
-@st.cache_data
 def get_divisiones(estado: str, municipio: str) -> List[str]:
     """
     Obtiene TODAS las divisiones de CFE para un estado y municipio.
@@ -193,22 +1075,32 @@ def get_divisiones(estado: str, municipio: str) -> List[str]:
     Returns:
         Lista de divisiones ordenadas alfabéticamente (puede tener 1 o más)
     """
-    df = load_geografia()
-    estado_norm = normalizar_texto(estado)
-    municipio_norm = normalizar_texto(municipio)
-    divisiones = df[
-        (df["estado"] == estado_norm) & 
-        (df["municipio"] == municipio_norm)
-    ]["division"].unique().tolist()
+    municipios = _buscar_normalizado(get_indice_geografia()["arbol"], estado)
+    if not municipios:
+        return []
+    divisiones = _buscar_normalizado(municipios, municipio)
+    return list(divisiones) if divisiones else []
+
+
+def get_municipios_por_division(division: str) -> List[Tuple[str, str]]:
+    """
+    Obtiene los municipios atendidos por una división de CFE.
     
-    return sorted(divisiones)
+    Args:
+        division: Nombre de la división (se normaliza automáticamente)
+        
+    Returns:
+        Lista de tuplas (estado, municipio) ordenadas
+    """
+    municipios = _buscar_normalizado(get_indice_geografia()["por_division"], division)
+    return list(municipios) if municipios else []
 
 
 # Tarifas que tienen estructura horaria (Base, Intermedia, Punta)
 TARIFAS_HORARIAS = {"GDMTH", "DIST", "DIT"}
 
 
-@st.cache_data
+@cache_data
 def get_tarifas_disponibles() -> pd.DataFrame:
     """
     Obtiene la lista de tarifas disponibles con su descripción.
@@ -216,8 +1108,15 @@ def get_tarifas_disponibles() -> pd.DataFrame:
     Returns:
         DataFrame con columnas: tarifa, descripcion (valores únicos)
     """
-    df = load_tarifas()
-    tarifas = df[["tarifa", "descripcion"]].drop_duplicates()
+    if _usar_sql():
+        # Primera fila de cada par en el orden del CSV (mismo índice que drop_duplicates)
+        tarifas = consultar_sql(
+            "SELECT MIN(fila) AS fila, tarifa, descripcion FROM tarifas "
+            "GROUP BY tarifa, descripcion ORDER BY fila"
+        ).set_index("fila").rename_axis(None)
+    else:
+        df = get_indice_tarifas()["df"]
+        tarifas = df[["tarifa", "descripcion"]].drop_duplicates()
     tarifas = tarifas.sort_values("tarifa")
     return tarifas
 
@@ -238,9 +1137,9 @@ def es_tarifa_horaria(tarifa: str) -> bool:
 def calcular_rango_12_meses(
     mes_final: int,
     anio: int,
-    df_tarifas: pd.DataFrame,
-    tarifa: str,
-    division: str,
+    df_tarifas: Optional[pd.DataFrame] = None,
+    tarifa: str = "",
+    division: str = "",
 ) -> Tuple[int, int, int, int, Optional[str]]:
     """
     Calcula el rango de 12 meses para histórico, aplicando casos borde.
@@ -248,7 +1147,8 @@ def calcular_rango_12_meses(
     Args:
         mes_final: Número de mes final (1-12)
         anio: Año del mes final seleccionado
-        df_tarifas: DataFrame de tarifas (con columnas anio, mes_numero, region, tarifa)
+        df_tarifas: DataFrame de tarifas (con columnas anio, mes_numero, region, tarifa).
+            Si es None se usa el índice de tarifas cargadas (sin recorrer el DataFrame).
         tarifa: Código de tarifa
         division: División/región CFE (se normaliza)
         
@@ -259,20 +1159,35 @@ def calcular_rango_12_meses(
     div_norm = normalizar_texto(division)
     tarifa_norm = tarifa.upper() if tarifa else ""
     
-    mask = (df_tarifas["region"] == div_norm) & (df_tarifas["tarifa"] == tarifa_norm)
-    df_filt = df_tarifas.loc[mask, ["anio", "mes_numero"]].drop_duplicates()
-    
-    if df_filt.empty:
-        return (1, anio, 12, anio, "Sin datos para esta tarifa y división.")
-    
-    df_filt = df_filt.sort_values(["anio", "mes_numero"])
-    first = df_filt.iloc[0]
-    last = df_filt.iloc[-1]
-    first_anio, first_mes = int(first["anio"]), int(first["mes_numero"])
-    last_anio, last_mes = int(last["anio"]), int(last["mes_numero"])
-    
-    first_ord = first_anio * 12 + first_mes
-    last_ord = last_anio * 12 + last_mes
+    if df_tarifas is None and _usar_sql():
+        rango = consultar_sql(
+            "SELECT MIN(anio * 12 + mes_numero) AS primero, MAX(anio * 12 + mes_numero) AS ultimo "
+            "FROM tarifas WHERE tarifa = ? AND region = ?",
+            (tarifa_norm, div_norm),
+        ).iloc[0]
+        if pd.isna(rango["primero"]):
+            return (1, anio, 12, anio, "Sin datos para esta tarifa y división.")
+        first_ord, last_ord = int(rango["primero"]), int(rango["ultimo"])
+    elif df_tarifas is None:
+        periodo = get_indice_tarifas()["periodos"].get((tarifa_norm, div_norm))
+        if periodo is None:
+            return (1, anio, 12, anio, "Sin datos para esta tarifa y división.")
+        first_ord, last_ord = periodo
+    else:
+        mask = (df_tarifas["region"] == div_norm) & (df_tarifas["tarifa"] == tarifa_norm)
+        df_filt = df_tarifas.loc[mask, ["anio", "mes_numero"]].drop_duplicates()
+        
+        if df_filt.empty:
+            return (1, anio, 12, anio, "Sin datos para esta tarifa y división.")
+        
+        df_filt = df_filt.sort_values(["anio", "mes_numero"])
+        first = df_filt.iloc[0]
+        last = df_filt.iloc[-1]
+        first_anio, first_mes = int(first["anio"]), int(first["mes_numero"])
+        last_anio, last_mes = int(last["anio"]), int(last["mes_numero"])
+        
+        first_ord = first_anio * 12 + first_mes
+        last_ord = last_anio * 12 + last_mes
     desired_end_ord = anio * 12 + mes_final
     desired_start_ord = desired_end_ord - 11
     
@@ -311,6 +1226,10 @@ def calcular_rango_12_meses(
     return (start_mes, start_anio, end_mes, end_anio, msg)
 
 
+# Columnas de la vista pivotada del histórico
+COLUMNAS_HISTORICO = ["Año", "Mes", "Fecha", "Cargo Fijo", "Base", "Intermedia", "Punta", "Cargo Cap"]
+
+
 def pivotar_historico_por_mes(df_hist: pd.DataFrame) -> pd.DataFrame:
     """
     Convierte el histórico en formato largo a una fila por (Año, Mes) con columnas
@@ -318,57 +1237,95 @@ def pivotar_historico_por_mes(df_hist: pd.DataFrame) -> pd.DataFrame:
 
     Espera df_hist con columnas: anio, mes, mes_numero, cargo, int_horario, total.
     Para tarifas simples (int_horario "sin dato") el total variable va en Base.
+    Funciona para rangos de cualquier número de años (reacomodo vectorizado,
+    sin recorrer cada mes en Python).
     """
     if df_hist.empty or "total" not in df_hist.columns or "anio" not in df_hist.columns:
-        return pd.DataFrame(columns=["Año", "Mes", "Fecha", "Cargo Fijo", "Base", "Intermedia", "Punta", "Cargo Cap"])
-
-    df = df_hist[["anio", "mes_numero", "mes", "cargo", "int_horario", "total"]].copy()
-    df["cargo"] = df["cargo"].astype(str).str.strip()
-    df["int_horario"] = df["int_horario"].astype(str).str.strip().str.upper()
-    df["mes"] = df["mes"].astype(str).str.strip().str.lower()
-
-    rows = []
-    for (anio, mes_num), g in df.groupby(["anio", "mes_numero"], sort=True):
-        mes_num = int(mes_num)
-        anio = int(anio)
-        mes_nombre = numero_a_mes(mes_num).capitalize() if 1 <= mes_num <= 12 else g["mes"].iloc[0].capitalize()
-        fecha_abrev = f"{MESES_ABREV_POR_NUM[mes_num - 1]}-{str(anio)[-2:]}" if 1 <= mes_num <= 12 else ""
-
-        fijo = g[g["cargo"] == "Fijo"]["total"]
-        cargo_fijo = float(fijo.iloc[0]) if len(fijo) else None
-
-        var = g[g["cargo"] == "Variable (Energía)"]
-        base_val = intermedia_val = punta_val = None
-        for _, r in var.iterrows():
-            ih = r["int_horario"]
-            if ih == "B":
-                base_val = float(r["total"])
-            elif ih == "I":
-                intermedia_val = float(r["total"])
-            elif ih == "P":
-                punta_val = float(r["total"])
-            elif ih == "SIN DATO" or (pd.notna(ih) and "SIN" in str(ih).upper()):
-                if base_val is None:
-                    base_val = float(r["total"])
-
-        cap = g[g["cargo"] == "Capacidad"]["total"]
-        cargo_cap = float(cap.iloc[0]) if len(cap) else None
-
-        rows.append({
-            "Año": anio,
-            "Mes": mes_nombre,
-            "Fecha": fecha_abrev,
-            "Cargo Fijo": cargo_fijo,
-            "Base": base_val,
-            "Intermedia": intermedia_val,
-            "Punta": punta_val,
-            "Cargo Cap": cargo_cap,
+        return pd.DataFrame(columns=COLUMNAS_HISTORICO)
+
+    df = df_hist[["anio", "mes_numero", "mes", "cargo", "int_horario", "total"]].dropna(subset=["anio", "mes_numero"])
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS_HISTORICO)
+    cargo = df["cargo"].astype(str).str.strip()
+    horario = df["int_horario"].astype(str).str.strip().str.upper()
+    es_variable = cargo == "Variable (Energía)"
+
+    # Columna destino de cada fila; "Base" por horario B tiene prioridad sobre "sin dato"
+    destino = pd.Series(
+        np.select(
+            [
+                cargo == "Fijo",
+                es_variable & (horario == "B"),
+                es_variable & (horario == "I"),
+                es_variable & (horario == "P"),
+                es_variable & horario.str.contains("SIN", regex=False),
+                cargo == "Capacidad",
+            ],
+            ["Cargo Fijo", "Base", "Intermedia", "Punta", "Base sin dato", "Cargo Cap"],
+            default="",
+        ),
+        index=df.index,
+    )
+    claves = pd.DataFrame({
+        "anio": df["anio"].astype(int).to_numpy(),
+        "mes_numero": df["mes_numero"].astype(int).to_numpy(),
+        "destino": destino.to_numpy(),
+        "pos": np.arange(len(df)),
+    })
+    claves = claves[claves["destino"] != ""]
+
+    # Fijo, Capacidad y "sin dato" toman la primera fila del mes; B/I/P la última
+    toma_ultima = claves["destino"].isin(["Base", "Intermedia", "Punta"])
+    elegidas = pd.concat([
+        claves[~toma_ultima].drop_duplicates(["anio", "mes_numero", "destino"], keep="first"),
+        claves[toma_ultima].drop_duplicates(["anio", "mes_numero", "destino"], keep="last"),
+    ])
+    posiciones = elegidas.pivot(index=["anio", "mes_numero"], columns="destino", values="pos")
+
+    meses = (
+        pd.DataFrame({
+            "anio": df["anio"].astype(int).to_numpy(),
+            "mes_numero": df["mes_numero"].astype(int).to_numpy(),
+            "mes": df["mes"].astype(str).str.strip().str.lower().to_numpy(),
         })
+        .drop_duplicates(["anio", "mes_numero"])
+        .sort_values(["anio", "mes_numero"])
+        .set_index(["anio", "mes_numero"])
+    )
+    posiciones = posiciones.reindex(meses.index)
+    if "Base sin dato" in posiciones.columns:
+        base = posiciones.get("Base", pd.Series(np.nan, index=posiciones.index))
+        posiciones["Base"] = base.fillna(posiciones["Base sin dato"])
+
+    totales = df["total"].to_numpy(dtype=float)
+    anios = meses.index.get_level_values("anio").to_numpy()
+    mes_nums = meses.index.get_level_values("mes_numero").to_numpy()
+    mes_valido = (mes_nums >= 1) & (mes_nums <= 12)
+    nombres = np.array([m.capitalize() for m in MESES_NOMBRES], dtype=object)
+    abreviaturas = np.array(MESES_ABREV_POR_NUM, dtype=object)
+    indice_mes = np.clip(mes_nums - 1, 0, 11)
+
+    resultado = pd.DataFrame({
+        "Año": anios,
+        "Mes": np.where(mes_valido, nombres[indice_mes], meses["mes"].str.capitalize().to_numpy()),
+        "Fecha": np.where(
+            mes_valido,
+            abreviaturas[indice_mes] + "-" + pd.Series(anios).astype(str).str[-2:].to_numpy(),
+            "",
+        ),
+    })
+    for col in ["Cargo Fijo", "Base", "Intermedia", "Punta", "Cargo Cap"]:
+        pos = posiciones[col].to_numpy() if col in posiciones.columns else np.full(len(meses), np.nan)
+        presente = ~np.isnan(pos)
+        valores = np.full(len(meses), np.nan)
+        valores[presente] = totales[pos[presente].astype(int)]
+        # Columna sin ninguna fila de ese cargo: None (igual que la vista por filas)
+        resultado[col] = valores if presente.any() else None
 
-    return pd.DataFrame(rows)
+    return resultado
 
 
-@st.cache_data
+@cache_data
 def get_anios_disponibles() -> List[int]:
     """
     Obtiene la lista de años disponibles en los datos.
@@ -377,15 +1334,17 @@ def get_anios_disponibles() -> List[int]:
     Returns:
         Lista de años disponibles para análisis (desde 2018)
     """
-    df = load_tarifas()
-    anios = sorted(df["anio"].unique().tolist())
+    if _usar_sql():
+        anios = consultar_sql("SELECT DISTINCT anio FROM tarifas ORDER BY anio")["anio"].tolist()
+    else:
+        anios = sorted(get_indice_tarifas()["df"]["anio"].unique().tolist())
     # Excluir el primer año (no tiene año anterior para comparar)
     if len(anios) > 1:
         anios = anios[1:]  # Desde el segundo año en adelante
     return anios
 
 
-@st.cache_data
+@cache_data
 def get_regiones_disponibles() -> List[str]:
     """
     Obtiene la lista de regiones/divisiones únicas en los datos de tarifas.
@@ -393,20 +1352,110 @@ def get_regiones_disponibles() -> List[str]:
     Returns:
         Lista de regiones ordenadas alfabéticamente
     """
-    df = load_tarifas()
+    if _usar_sql():
+        return consultar_sql("SELECT DISTINCT region FROM tarifas ORDER BY region")["region"].tolist()
+    df = get_indice_tarifas()["df"]
     regiones = sorted(df["region"].unique().tolist())
     return regiones
 
 
-def get_data_stats() -> dict:
+def _bytes_como_object(serie: pd.Series) -> int:
     """
-    Obtiene estadísticas de los datos cargados.
+    Estima la memoria (deep) que ocuparía una columna categórica si fuera
+    una columna object con un string por fila.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return int(serie.memory_usage(deep=True, index=False))
+    codigos = serie.cat.codes.to_numpy()
+    tamanos = np.array(
+        [sys.getsizeof(c) for c in serie.cat.categories] + [sys.getsizeof(np.nan)],
+        dtype=np.int64,
+    )
+    # El código -1 (nulo) toma el último tamaño
+    return int(codigos.size * 8 + tamanos[codigos].sum())
+
+
+def get_memoria_tarifas(df_tar: pd.DataFrame) -> dict:
+    """
+    Reporte de memoria del DataFrame de tarifas: actual (con categóricas)
+    contra el equivalente con columnas object.
+    
+    Args:
+        df_tar: DataFrame de tarifas cargado
+        
+    Returns:
+        Diccionario con bytes actuales, bytes sin categóricas y reducción (%)
+    """
+    bytes_actual = int(df_tar.memory_usage(deep=True).sum())
+    bytes_sin_categorias = int(df_tar.index.memory_usage(deep=True)) + sum(
+        _bytes_como_object(df_tar[col]) for col in df_tar.columns
+    )
+    reduccion = (1 - bytes_actual / bytes_sin_categorias) * 100 if bytes_sin_categorias else 0.0
+    return {
+        "bytes": bytes_actual,
+        "bytes_sin_categorias": bytes_sin_categorias,
+        "reduccion_pct": reduccion,
+    }
+
+
+def _bytes_por_columna(df: pd.DataFrame) -> dict:
+    """Memoria (deep) de cada columna en bytes."""
+    return {col: int(b) for col, b in df.memory_usage(deep=True, index=False).items()}
+
+
+def get_reporte_memoria() -> dict:
+    """
+    Reporte de memoria para diagnosticar qué estructura ocupa más.
+    
+    No se cachea: refleja el estado actual de los caches y del proceso.
     
     Returns:
-        Diccionario con estadísticas de carga
+        Diccionario con:
+        - "columnas_tarifas" / "columnas_geografia": {columna: bytes}
+        - "caches": {función: {"tipo", "entradas", "bytes"}} por función cacheada
+        - "rss_pico_carga": {"tarifas"|"geografia": bytes} al terminar cada carga
+        - "rss_pico": pico de RSS del proceso hasta ahora (bytes)
     """
     df_geo = load_geografia()
-    df_tar = load_tarifas()
+    # Con "sqlite" el histórico no vive en memoria del proceso
+    df_tar = pd.DataFrame() if _usar_sql() else get_indice_tarifas()["df"]
+    
+    prefijo = f"{__name__}."
+    caches = {
+        nombre[len(prefijo):] if nombre.startswith(prefijo) else nombre: stats
+        for nombre, stats in get_estadisticas_caches().items()
+    }
+    
+    return {
+        "columnas_tarifas": _bytes_por_columna(df_tar),
+        "columnas_geografia": _bytes_por_columna(df_geo),
+        "caches": caches,
+        "rss_pico_carga": dict(_rss_pico_carga),
+        "rss_pico": rss_pico_bytes(),
+    }
+
+
+@cache_data
+def _get_data_stats_base() -> dict:
+    """Conteos y memoria del DataFrame de tarifas (fijos mientras no cambien los datos)."""
+    if _usar_sql():
+        geo = consultar_sql(
+            "SELECT COUNT(*) AS total_registros, COUNT(DISTINCT estado) AS estados, "
+            "COUNT(DISTINCT municipio) AS municipios, COUNT(DISTINCT division) AS divisiones FROM geografia"
+        ).iloc[0]
+        tar = consultar_sql(
+            "SELECT COUNT(*) AS total_registros, MIN(anio) AS anio_min, MAX(anio) AS anio_max, "
+            "COUNT(DISTINCT tarifa) AS tarifas_tipos, COUNT(DISTINCT region) AS regiones FROM tarifas"
+        ).iloc[0]
+        return {
+            "geografia": {col: int(valor) for col, valor in geo.items()},
+            "tarifas": {col: int(valor) for col, valor in tar.items()},
+            # El histórico está en disco: se reporta el tamaño de la base
+            "memoria_tarifas": {"bytes_en_disco": get_almacen_sql().tamano_bytes()},
+        }
+    
+    df_geo = load_geografia()
+    df_tar = get_indice_tarifas()["df"]
     
     return {
         "geografia": {
@@ -421,10 +1470,28 @@ def get_data_stats() -> dict:
             "anio_max": df_tar["anio"].max(),
             "tarifas_tipos": df_tar["tarifa"].nunique(),
             "regiones": df_tar["region"].nunique(),
-        }
+        },
+        "memoria_tarifas": get_memoria_tarifas(df_tar),
     }
 
 
+def get_data_stats(detalle_memoria: bool = False) -> dict:
+    """
+    Obtiene estadísticas de los datos cargados.
+    
+    Args:
+        detalle_memoria: Si True agrega "memoria" con get_reporte_memoria()
+        
+    Returns:
+        Diccionario con estadísticas de carga y memoria del DataFrame de tarifas
+    """
+    stats = _get_data_stats_base()
+    if detalle_memoria:
+        stats["memoria"] = get_reporte_memoria()
+    return stats
+
+
+@cache_data
 def verificar_match_regiones() -> dict:
     """
     Verifica que las divisiones de geografía coincidan con las regiones de tarifas.
@@ -432,11 +1499,12 @@ def verificar_match_regiones() -> dict:
     Returns:
         Diccionario con resultados de la verificación
     """
-    df_geo = load_geografia()
-    df_tar = load_tarifas()
-    
-    divisiones_geo = set(df_geo["division"].unique())
-    regiones_tar = set(df_tar["region"].unique())
+    if _usar_sql():
+        divisiones_geo = set(consultar_sql("SELECT DISTINCT division FROM geografia")["division"])
+        regiones_tar = set(consultar_sql("SELECT DISTINCT region FROM tarifas")["region"])
+    else:
+        divisiones_geo = set(load_geografia()["division"].unique())
+        regiones_tar = set(get_indice_tarifas()["df"]["region"].unique())
     
     # Encontrar coincidencias y diferencias
     coinciden = divisiones_geo & regiones_tar
@@ -453,6 +1521,129 @@ def verificar_match_regiones() -> dict:
     }
 
 
+# Columnas de componentes disponibles en el CSV
+COMPONENTES = ["transmision", "distribucion", "cenace", "suministro", "scnmem", "generacion", "capacidad"]
+
+# Nombres legibles para cada componente
+COMPONENTES_NOMBRES = {
+    "transmision": "Transmisión",
+    "distribucion": "Distribución",
+    "cenace": "CENACE",
+    "suministro": "Suministro",
+    "scnmem": "SCnMEM",
+    "generacion": "Generación",
+    "capacidad": "Capacidad"
+}
+
+
+# Columnas del DataFrame de cierres de diciembre
+COLUMNAS_CIERRE = ["anio", "cargo", "int_horario", "total"] + COMPONENTES
+
+
+@cache_data
+def _get_cierres_diciembre(tarifa: str, region_norm: str, anios: Tuple[int, ...]) -> pd.DataFrame:
+    """Versión cacheada de get_cierres_diciembre (región ya normalizada, años como tupla)."""
+    if _usar_sql():
+        cierres = _consultar_tarifas_sql(COLUMNAS_CIERRE, tarifas=(tarifa,), region=region_norm, anios=anios, mes_numero=12)
+        cierres = cierres[cierres["cargo"].notna()]
+        if cierres.empty:
+            return pd.DataFrame(columns=COLUMNAS_CIERRE)
+    else:
+        indice = get_indice_tarifas()
+        filas = indice["filas"]
+        
+        # Todas las filas de diciembre de los años pedidos (cualquier cargo y horario)
+        partes = []
+        for anio in anios:
+            for cargo in indice["cargos"]:
+                for horario in indice["horarios"]:
+                    pos = filas.get((tarifa, region_norm, anio, 12, cargo, horario))
+                    if pos is not None:
+                        partes.append(pos)
+        if not partes:
+            return pd.DataFrame(columns=COLUMNAS_CIERRE)
+        
+        posiciones = np.sort(np.concatenate(partes))
+        cierres = indice["df"].iloc[posiciones][COLUMNAS_CIERRE]
+    
+    # Si hay filas repetidas se conserva la primera del CSV (mismo criterio que las consultas individuales)
+    cierres = cierres.drop_duplicates(["anio", "cargo", "int_horario"], keep="first")
+    cierres = cierres.astype({"cargo": object, "int_horario": object})
+    return cierres.reset_index(drop=True)
+
+
+def get_cierres_diciembre(tarifa: str, region: str, anios: List[int]) -> pd.DataFrame:
+    """
+    Obtiene en una sola consulta todos los cargos de diciembre (Fijo, Variable
+    por horario y Capacidad) con sus componentes para varios años.
+    
+    Args:
+        tarifa: Código de tarifa
+        region: Nombre de la región/división (se normaliza automáticamente)
+        anios: Años a consultar
+        
+    Returns:
+        DataFrame con columnas anio, cargo, int_horario, total y componentes;
+        una fila por (anio, cargo, int_horario) en el orden del CSV
+    """
+    anios_unicos = tuple(sorted({int(a) for a in anios}))
+    return _get_cierres_diciembre(tarifa, normalizar_texto(region), anios_unicos)
+
+
+def _fila_cierre(cierres: pd.DataFrame, anio: int, tipo_cargo: str, horario: Optional[str]) -> Optional[pd.Series]:
+    """
+    Primera fila de cierres que coincide con año, tipo de cargo y horario.
+    
+    Args:
+        horario: Valor exacto de int_horario, o None para cualquier horario
+    """
+    filtro = (cierres["anio"] == anio) & cierres["cargo"].isin(_cargos_de_tipo(tipo_cargo))
+    if horario is not None:
+        filtro &= cierres["int_horario"] == horario
+    filtradas = cierres[filtro]
+    if filtradas.empty:
+        return None
+    return filtradas.iloc[0]
+
+
+def _total_cierre(cierres: pd.DataFrame, anio: int, tipo_cargo: str, horario: Optional[str]) -> Optional[float]:
+    """Total de la fila de cierre que coincide, o None si no hay dato."""
+    fila = _fila_cierre(cierres, anio, tipo_cargo, horario)
+    if fila is None or pd.isna(fila["total"]):
+        return None
+    return float(fila["total"])
+
+
+def _componentes_cierre(cierres: pd.DataFrame, anio: int, tipo_cargo: str, horario: Optional[str]) -> dict:
+    """Componentes distintos de cero de la fila de cierre que coincide."""
+    fila = _fila_cierre(cierres, anio, tipo_cargo, horario)
+    if fila is None:
+        return {}
+    return {
+        comp: float(fila[comp])
+        for comp in COMPONENTES
+        if pd.notna(fila[comp]) and fila[comp] != 0
+    }
+
+
+def _cargos_por_horario_cierre(cierres: pd.DataFrame, tarifa: str, anio: int) -> dict:
+    """Diccionario de get_cargos_diciembre_por_horario a partir de cierres ya consultados."""
+    capacidad = _total_cierre(cierres, anio, "Capacidad", None)
+    
+    if es_tarifa_horaria(tarifa):
+        return {
+            "B": _total_cierre(cierres, anio, "Variable", "B"),
+            "I": _total_cierre(cierres, anio, "Variable", "I"),
+            "P": _total_cierre(cierres, anio, "Variable", "P"),
+            "capacidad": capacidad,
+        }
+    else:
+        return {
+            "simple": _total_cierre(cierres, anio, "Variable", "sin dato"),
+            "capacidad": capacidad,
+        }
+
+
 def get_cargo_variable_diciembre(tarifa: str, region: str, anio: int, horario: Optional[str] = None) -> Optional[float]:
     """
     Obtiene el cargo Variable (Energía) de diciembre para una tarifa, región, año y horario.
@@ -466,36 +1657,9 @@ def get_cargo_variable_diciembre(tarifa: str, region: str, anio: int, horario: O
     Returns:
         Valor del cargo Variable en pesos/kWh o None si no hay datos
     """
-    df = load_tarifas()
-    
-    # Normalizar región
-    region_norm = normalizar_texto(region)
-    
-    # Filtrar por tarifa, región, año, mes diciembre y cargo Variable
-    filtro = (
-        (df["tarifa"] == tarifa) &
-        (df["region"] == region_norm) &
-        (df["anio"] == anio) &
-        (df["mes"] == "diciembre") &
-        (df["cargo"].str.contains("Variable", case=False, na=False))
-    )
-    
-    # Agregar filtro de horario si aplica
-    if horario:
-        filtro = filtro & (df["int_horario"] == horario)
-    else:
-        # Para tarifas simples, buscar "sin dato" en int_horario
-        filtro = filtro & (df["int_horario"] == "sin dato")
-    
-    df_filtrado = df[filtro]
-    
-    if df_filtrado.empty:
-        return None
-    
-    # Tomar el valor total del cargo Variable
-    total = df_filtrado["total"].iloc[0]
-    
-    return total if not pd.isna(total) else None
+    cierres = get_cierres_diciembre(tarifa, region, [anio])
+    # Para tarifas simples, buscar "sin dato" en int_horario
+    return _total_cierre(cierres, anio, "Variable", horario or "sin dato")
 
 
 def get_cargo_capacidad_diciembre(tarifa: str, region: str, anio: int) -> Optional[float]:
@@ -510,28 +1674,8 @@ def get_cargo_capacidad_diciembre(tarifa: str, region: str, anio: int) -> Option
     Returns:
         Valor del cargo Capacidad en pesos/kW o None si no hay datos
     """
-    df = load_tarifas()
-    
-    # Normalizar región
-    region_norm = normalizar_texto(region)
-    
-    # Filtrar por tarifa, región, año, mes diciembre y cargo Capacidad
-    filtro = (
-        (df["tarifa"] == tarifa) &
-        (df["region"] == region_norm) &
-        (df["anio"] == anio) &
-        (df["mes"] == "diciembre") &
-        (df["cargo"].str.contains("Capacidad", case=False, na=False))
-    )
-    
-    df_filtrado = df[filtro]
-    
-    if df_filtrado.empty:
-        return None
-    
-    total = df_filtrado["total"].iloc[0]
-    
-    return total if not pd.isna(total) else None
+    cierres = get_cierres_diciembre(tarifa, region, [anio])
+    return _total_cierre(cierres, anio, "Capacidad", None)
 
 
 def get_cargos_diciembre_por_horario(tarifa: str, region: str, anio: int) -> dict:
@@ -547,20 +1691,8 @@ def get_cargos_diciembre_por_horario(tarifa: str, region: str, anio: int) -> dic
         Diccionario con cargos por horario: {"B": valor, "I": valor, "P": valor, "capacidad": valor}
         o {"simple": valor, "capacidad": valor} para tarifas sin horario
     """
-    capacidad = get_cargo_capacidad_diciembre(tarifa, region, anio)
-    
-    if es_tarifa_horaria(tarifa):
-        return {
-            "B": get_cargo_variable_diciembre(tarifa, region, anio, "B"),
-            "I": get_cargo_variable_diciembre(tarifa, region, anio, "I"),
-            "P": get_cargo_variable_diciembre(tarifa, region, anio, "P"),
-            "capacidad": capacidad,
-        }
-    else:
-        return {
-            "simple": get_cargo_variable_diciembre(tarifa, region, anio, None),
-            "capacidad": capacidad,
-        }
+    cierres = get_cierres_diciembre(tarifa, region, [anio])
+    return _cargos_por_horario_cierre(cierres, tarifa, anio)
 
 
 def calcular_variacion_diciembre(tarifa: str, region: str, anio_actual: int, anio_anterior: int) -> dict:
@@ -579,8 +1711,9 @@ def calcular_variacion_diciembre(tarifa: str, region: str, anio_actual: int, ani
     Returns:
         Diccionario con datos por horario y variaciones
     """
-    cargos_actual = get_cargos_diciembre_por_horario(tarifa, region, anio_actual)
-    cargos_anterior = get_cargos_diciembre_por_horario(tarifa, region, anio_anterior)
+    cierres = get_cierres_diciembre(tarifa, region, [anio_actual, anio_anterior])
+    cargos_actual = _cargos_por_horario_cierre(cierres, tarifa, anio_actual)
+    cargos_anterior = _cargos_por_horario_cierre(cierres, tarifa, anio_anterior)
     
     resultado = {
         "tarifa": tarifa,
@@ -610,19 +1743,90 @@ def calcular_variacion_diciembre(tarifa: str, region: str, anio_actual: int, ani
     return resultado
 
 
-# Columnas de componentes disponibles en el CSV
-COMPONENTES = ["transmision", "distribucion", "cenace", "suministro", "scnmem", "generacion", "capacidad"]
+# Conceptos del comparativo de diciembre (mismas llaves que calcular_variacion_diciembre()["horarios"])
+CONCEPTOS_DICIEMBRE = ["B", "I", "P", "simple", "capacidad"]
 
-# Nombres legibles para cada componente
-COMPONENTES_NOMBRES = {
-    "transmision": "Transmisión",
-    "distribucion": "Distribución",
-    "cenace": "CENACE",
-    "suministro": "Suministro",
-    "scnmem": "SCnMEM",
-    "generacion": "Generación",
-    "capacidad": "Capacidad"
-}
+
+@cache_resource
+def get_cierres_nacionales() -> dict:
+    """
+    Construye una sola vez los cierres de diciembre de todas las divisiones,
+    tarifas y horarios, con la misma regla que calcular_variacion_diciembre:
+    por (tarifa, region, anio, concepto) se toma la primera fila del CSV.
+    
+    Conceptos: "B"/"I"/"P" (Variable de tarifas horarias), "simple" (Variable
+    "sin dato" de tarifas simples) y "capacidad" (Capacidad, cualquier horario).
+    
+    Returns:
+        Diccionario con:
+        - "cierres": DataFrame largo con tarifa, region, concepto, anio, total y componentes
+        - "totales": DataFrame ancho con índice (tarifa, region, concepto) y una columna por año
+    """
+    columnas = ["tarifa", "region", "anio", "total"] + COMPONENTES
+    if _usar_sql():
+        # Índice = posición en el CSV, igual que las filas del DataFrame completo
+        dic = _consultar_tarifas_sql(["fila", "cargo", "int_horario"] + columnas, mes_numero=12).set_index("fila")
+    else:
+        df = get_indice_tarifas()["df"]
+        dic = df[df["mes_numero"] == 12]
+    dic = dic[dic["tarifa"].notna()]
+    cargo = dic["cargo"].astype(object)
+    horario = dic["int_horario"].astype(object)
+    es_horaria = dic["tarifa"].astype(object).isin(TARIFAS_HORARIAS)
+    es_variable = cargo.isin(_cargos_de_tipo("Variable"))
+    es_capacidad = cargo.isin(_cargos_de_tipo("Capacidad"))
+    
+    partes = [
+        dic.loc[es_variable & es_horaria & horario.isin(["B", "I", "P"]), columnas]
+        .assign(concepto=horario[es_variable & es_horaria & horario.isin(["B", "I", "P"])]),
+        dic.loc[es_variable & ~es_horaria & (horario == "sin dato"), columnas].assign(concepto="simple"),
+        dic.loc[es_capacidad, columnas].assign(concepto="capacidad"),
+    ]
+    # concat conserva el orden del CSV dentro de cada concepto: se queda la primera fila
+    cierres = pd.concat(partes).sort_index(kind="stable")
+    cierres = cierres.astype({"tarifa": object, "region": object, "concepto": object})
+    cierres = cierres.drop_duplicates(["tarifa", "region", "concepto", "anio"], keep="first")
+    cierres = cierres.reset_index(drop=True)
+    
+    totales = cierres.pivot(index=["tarifa", "region", "concepto"], columns="anio", values="total")
+    return {"cierres": cierres, "totales": totales}
+
+
+def calcular_ranking_diciembre(anio_actual: int, anio_anterior: int) -> pd.DataFrame:
+    """
+    Variación diciembre vs diciembre de todas las divisiones, tarifas y
+    conceptos a la vez (ranking nacional).
+    
+    Args:
+        anio_actual: Año de análisis
+        anio_anterior: Año de comparación
+        
+    Returns:
+        DataFrame con columnas tarifa, region, concepto, anterior, actual,
+        variacion_pct y posicion (1 = mayor alza entre las divisiones de la
+        misma tarifa y concepto); solo filas con variación calculable,
+        ordenado de mayor a menor variación
+    """
+    totales = get_cierres_nacionales()["totales"]
+    columnas = ["tarifa", "region", "concepto", "anterior", "actual", "variacion_pct", "posicion"]
+    if anio_actual not in totales.columns or anio_anterior not in totales.columns:
+        return pd.DataFrame(columns=columnas)
+    
+    actual = totales[anio_actual].to_numpy()
+    anterior = totales[anio_anterior].to_numpy()
+    valida = ~np.isnan(actual) & ~np.isnan(anterior) & (anterior != 0)
+    
+    ranking = totales.index[valida].to_frame(index=False)
+    ranking["anterior"] = anterior[valida]
+    ranking["actual"] = actual[valida]
+    ranking["variacion_pct"] = (ranking["actual"] / ranking["anterior"] - 1) * 100
+    ranking["posicion"] = (
+        ranking.groupby(["tarifa", "concepto"])["variacion_pct"]
+        .rank(ascending=False, method="min")
+        .astype(int)
+    )
+    ranking = ranking.sort_values("variacion_pct", ascending=False, kind="stable", ignore_index=True)
+    return ranking[columnas]
 
 
 def get_componentes_diciembre(
@@ -645,41 +1849,8 @@ def get_componentes_diciembre(
     Returns:
         Diccionario con valores de cada componente
     """
-    df = load_tarifas()
-    
-    # Normalizar región
-    region_norm = normalizar_texto(region)
-    
-    # Filtrar por tarifa, región, año, mes diciembre y tipo de cargo
-    filtro = (
-        (df["tarifa"] == tarifa) &
-        (df["region"] == region_norm) &
-        (df["anio"] == anio) &
-        (df["mes"] == "diciembre") &
-        (df["cargo"].str.contains(tipo_cargo, case=False, na=False))
-    )
-    
-    # Agregar filtro de horario si aplica
-    if horario:
-        filtro = filtro & (df["int_horario"] == horario)
-    else:
-        filtro = filtro & (df["int_horario"] == "sin dato")
-    
-    df_filtrado = df[filtro]
-    
-    if df_filtrado.empty:
-        return {}
-    
-    # Extraer valores de cada componente
-    row = df_filtrado.iloc[0]
-    resultado = {}
-    
-    for comp in COMPONENTES:
-        valor = row.get(comp)
-        if pd.notna(valor) and valor != 0:
-            resultado[comp] = float(valor)
-    
-    return resultado
+    cierres = get_cierres_diciembre(tarifa, region, [anio])
+    return _componentes_cierre(cierres, anio, tipo_cargo, horario or "sin dato")
 
 
 def calcular_variacion_componentes(
@@ -704,8 +1875,9 @@ def calcular_variacion_componentes(
     Returns:
         Lista de diccionarios ordenados por impacto (abs(variación)) descendente
     """
-    comp_actual = get_componentes_diciembre(tarifa, region, anio_actual, horario, tipo_cargo)
-    comp_anterior = get_componentes_diciembre(tarifa, region, anio_anterior, horario, tipo_cargo)
+    cierres = get_cierres_diciembre(tarifa, region, [anio_actual, anio_anterior])
+    comp_actual = _componentes_cierre(cierres, anio_actual, tipo_cargo, horario or "sin dato")
+    comp_anterior = _componentes_cierre(cierres, anio_anterior, tipo_cargo, horario or "sin dato")
     
     # Obtener todos los componentes presentes en ambos años
     todos_componentes = set(comp_actual.keys()) | set(comp_anterior.keys())
@@ -746,6 +1918,94 @@ def calcular_variacion_componentes(
     return resultados
 
 
+COLUMNAS_MATRIZ_COMPONENTES = [
+    "anio_anterior", "anio", "componente", "nombre", "anterior", "actual", "var_absoluta", "var_pct"
+]
+
+
+@cache_data
+def _get_matriz_componentes(tarifa: str, region_norm: str, horario: str, tipo_cargo: str) -> pd.DataFrame:
+    """Versión cacheada de calcular_matriz_componentes (región ya normalizada)."""
+    anios = get_anios_disponibles()
+    columnas = ["anio", "mes_numero", "cargo", "int_horario"] + COMPONENTES
+    if _usar_sql():
+        df = _consultar_tarifas_sql(columnas, tarifas=(tarifa,), region=region_norm, mes_numero=12)
+        if df.empty or not anios:
+            return pd.DataFrame(columns=COLUMNAS_MATRIZ_COMPONENTES)
+    else:
+        indice = get_indice_tarifas()
+        posiciones = indice["series"].get((tarifa, region_norm))
+        if posiciones is None or not anios:
+            return pd.DataFrame(columns=COLUMNAS_MATRIZ_COMPONENTES)
+        df = indice["df"].iloc[np.sort(posiciones)][columnas]
+    
+    # Un cierre por año: primera fila de diciembre del CSV con el cargo y horario pedidos
+    df = df[
+        (df["mes_numero"] == 12)
+        & df["cargo"].isin(_cargos_de_tipo(tipo_cargo))
+        & (df["int_horario"] == horario)
+    ]
+    cierres = df.drop_duplicates("anio", keep="first").set_index("anio")[COMPONENTES]
+    
+    # Componentes en cero o sin dato cuentan como ausentes (igual que calcular_variacion_componentes)
+    valores = cierres.astype(float).where(cierres != 0)
+    actual = valores.reindex(anios).to_numpy()
+    anterior = valores.reindex([a - 1 for a in anios]).to_numpy()
+    
+    hay_actual = ~np.isnan(actual)
+    hay_anterior = ~np.isnan(anterior)
+    ambos = hay_actual & hay_anterior
+    var_absoluta = np.where(ambos, actual - anterior, np.where(hay_actual, actual, -anterior))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var_pct = np.where(
+            ambos,
+            np.where(anterior != 0, (actual / anterior - 1) * 100, np.nan),
+            np.where(hay_actual, 100.0, -100.0),
+        )
+    
+    n_anios, n_comp = actual.shape
+    matriz = pd.DataFrame({
+        "anio_anterior": np.repeat(np.array(anios) - 1, n_comp),
+        "anio": np.repeat(anios, n_comp),
+        "componente": np.tile(COMPONENTES, n_anios),
+        "nombre": np.tile([COMPONENTES_NOMBRES.get(c, c) for c in COMPONENTES], n_anios),
+        "anterior": anterior.ravel(),
+        "actual": actual.ravel(),
+        "var_absoluta": var_absoluta.ravel(),
+        "var_pct": var_pct.ravel(),
+    })
+    # Solo componentes presentes en alguno de los dos diciembres del par
+    return matriz[(hay_actual | hay_anterior).ravel()].reset_index(drop=True)
+
+
+def calcular_matriz_componentes(
+    tarifa: str,
+    region: str,
+    horario: Optional[str] = None,
+    tipo_cargo: str = "Variable"
+) -> pd.DataFrame:
+    """
+    Calcula en un solo paso la variación de cada componente para todos los
+    pares de diciembres consecutivos (año anterior, año) del histórico.
+    
+    Cada fila equivale a un elemento de calcular_variacion_componentes para
+    ese par de años: un componente que solo existe en un año cuenta como
+    +100% (nuevo) o -100% (eliminado).
+    
+    Args:
+        tarifa: Código de tarifa
+        region: Nombre de la región/división (se normaliza automáticamente)
+        horario: "B", "I", "P" para tarifas horarias, None para simples
+        tipo_cargo: "Variable" o "Capacidad"
+        
+    Returns:
+        DataFrame con columnas anio_anterior, anio, componente, nombre, anterior,
+        actual, var_absoluta y var_pct (NaN si no aplica), ordenado por año y
+        en el orden de COMPONENTES
+    """
+    return _get_matriz_componentes(tarifa, normalizar_texto(region), horario or "sin dato", tipo_cargo)
+
+
 # Orden cronológico de meses
 MESES_ORDEN = [
     'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
@@ -760,6 +2020,78 @@ MESES_ABREV = {
 }
 
 
+@cache_data
+def _get_matriz_mensual(tarifa: str, region_norm: str, tipo_cargo: str, anios: Optional[Tuple[int, ...]]) -> pd.DataFrame:
+    """Versión cacheada de get_matriz_mensual (región ya normalizada, años como tupla)."""
+    columnas_mes = list(range(1, 13))
+    columnas = ["anio", "mes_numero", "cargo", "int_horario", "total"]
+    if _usar_sql():
+        df = _consultar_tarifas_sql(columnas, tarifas=(tarifa,), region=region_norm, anios=anios)
+    else:
+        # Solo las particiones (anio, tarifa) de la consulta
+        df = load_tarifas(anios=anios, tarifas=(tarifa,))
+        df = df.loc[df["region"] == region_norm, columnas]
+    if df.empty:
+        return pd.DataFrame(columns=columnas_mes, index=pd.MultiIndex.from_tuples([], names=["anio", "int_horario"]))
+    
+    df = df[
+        df["cargo"].str.contains(tipo_cargo, case=False, na=False)
+        & df["total"].notna()
+        & df["mes_numero"].between(1, 12)
+    ]
+    # Si hay varias filas para el mismo mes gana la última con dato (orden del CSV)
+    df = df.drop_duplicates(["anio", "int_horario", "mes_numero"], keep="last")
+    df = df.astype({"int_horario": object})
+    
+    matriz = df.pivot(index=["anio", "int_horario"], columns="mes_numero", values="total")
+    matriz = matriz.reindex(columns=columnas_mes).sort_index()
+    matriz.columns.name = None
+    return matriz
+
+
+def get_matriz_mensual(
+    tarifa: str,
+    region: str,
+    tipo_cargo: str = "Variable",
+    anios: Optional[List[int]] = None
+) -> pd.DataFrame:
+    """
+    Obtiene en un solo paso vectorizado los valores mensuales de un cargo para
+    todos los años y horarios de una tarifa y región.
+    
+    Args:
+        tarifa: Código de tarifa
+        region: Nombre de la región/división (se normaliza automáticamente)
+        tipo_cargo: "Variable", "Capacidad" o "Fijo"
+        anios: Años a incluir (solo se leen sus particiones), o None para todos
+        
+    Returns:
+        DataFrame con índice (anio, int_horario) y columnas 1-12 (mes); NaN si no hay dato
+    """
+    anios_unicos = tuple(sorted({int(a) for a in anios})) if anios is not None else None
+    return _get_matriz_mensual(tarifa, normalizar_texto(region), tipo_cargo, anios_unicos)
+
+
+def _tendencia_desde_matriz(matriz: pd.DataFrame, anio: int, horario: Optional[str]) -> List[dict]:
+    """Lista de 12 meses (formato de get_tendencia_mensual) para un año y horario de la matriz."""
+    clave = (anio, horario or "sin dato")
+    fila = matriz.loc[clave] if clave in matriz.index else None
+    
+    resultados = []
+    for mes_num, mes in enumerate(MESES_ORDEN, start=1):
+        valor = None
+        if fila is not None and pd.notna(fila[mes_num]):
+            valor = float(fila[mes_num])
+        resultados.append({
+            "mes": mes,
+            "mes_abrev": MESES_ABREV.get(mes, mes[:3].title()),
+            "mes_num": mes_num,
+            "valor": valor
+        })
+    
+    return resultados
+
+
 def get_tendencia_mensual(
     tarifa: str,
     region: str,
@@ -780,47 +2112,8 @@ def get_tendencia_mensual(
     Returns:
         Lista de diccionarios con mes y valor, ordenados cronológicamente
     """
-    df = load_tarifas()
-    
-    # Normalizar región
-    region_norm = normalizar_texto(region)
-    
-    # Filtrar por tarifa, región, año y tipo de cargo
-    filtro = (
-        (df["tarifa"] == tarifa) &
-        (df["region"] == region_norm) &
-        (df["anio"] == anio) &
-        (df["cargo"].str.contains(tipo_cargo, case=False, na=False))
-    )
-    
-    # Agregar filtro de horario si aplica
-    if horario:
-        filtro = filtro & (df["int_horario"] == horario)
-    else:
-        filtro = filtro & (df["int_horario"] == "sin dato")
-    
-    df_filtrado = df[filtro]
-    
-    # Crear diccionario de mes -> valor
-    datos_mes = {}
-    for _, row in df_filtrado.iterrows():
-        mes = row["mes"].lower()
-        valor = row["total"]
-        if pd.notna(valor):
-            datos_mes[mes] = float(valor)
-    
-    # Construir lista ordenada por mes
-    resultados = []
-    for mes in MESES_ORDEN:
-        valor = datos_mes.get(mes)
-        resultados.append({
-            "mes": mes,
-            "mes_abrev": MESES_ABREV.get(mes, mes[:3].title()),
-            "mes_num": MESES_ORDEN.index(mes) + 1,
-            "valor": valor
-        })
-    
-    return resultados
+    matriz = get_matriz_mensual(tarifa, region, tipo_cargo, [anio])
+    return _tendencia_desde_matriz(matriz, anio, horario)
 
 
 def get_datos_tendencia_comparativa(
@@ -845,8 +2138,9 @@ def get_datos_tendencia_comparativa(
     Returns:
         Lista de diccionarios listos para Plotly (mes, año, valor)
     """
-    tendencia_actual = get_tendencia_mensual(tarifa, region, anio_actual, horario, tipo_cargo)
-    tendencia_anterior = get_tendencia_mensual(tarifa, region, anio_anterior, horario, tipo_cargo)
+    matriz = get_matriz_mensual(tarifa, region, tipo_cargo, [anio_actual, anio_anterior])
+    tendencia_actual = _tendencia_desde_matriz(matriz, anio_actual, horario)
+    tendencia_anterior = _tendencia_desde_matriz(matriz, anio_anterior, horario)
     
     datos = []
     
@@ -873,6 +2167,86 @@ def get_datos_tendencia_comparativa(
     return datos
 
 
+# Llave de cada serie mensual del cubo de promedios (más el año)
+CLAVE_SERIE = ["tarifa", "region", "cargo", "int_horario"]
+
+
+@cache_resource
+def get_cubo_promedios() -> pd.DataFrame:
+    """
+    Construye una sola vez el cubo de promedios anuales de todas las series.
+    
+    Para cada (tarifa, region, cargo, int_horario, anio) guarda el promedio,
+    el número de meses con dato y su máscara, y la comparación contra el año
+    anterior usando solo los meses comunes (misma regla que
+    calcular_variacion_promedio_anual).
+    
+    Returns:
+        DataFrame con índice (tarifa, region, cargo, int_horario, anio) y columnas:
+        promedio, num_meses, mascara_meses (bit i = mes i+1), num_meses_anterior,
+        num_meses_comunes, promedio_actual_comun, promedio_anterior_comun, variacion_pct
+    """
+    df = get_indice_tarifas()["df"]
+    df = df[df["total"].notna() & df["mes_numero"].between(1, 12)]
+    df = df.dropna(subset=CLAVE_SERIE)
+    df = df.astype({col: object for col in CLAVE_SERIE})
+    # Si hay varias filas para el mismo mes gana la última (igual que la matriz mensual)
+    df = df.drop_duplicates(CLAVE_SERIE + ["anio", "mes_numero"], keep="last")
+    
+    valores = df.pivot(index=CLAVE_SERIE + ["anio"], columns="mes_numero", values="total")
+    valores = valores.reindex(columns=range(1, 13)).sort_index()
+    indice = valores.index
+    
+    # Mismas series desplazadas un año hacia atrás
+    indice_anterior = pd.MultiIndex.from_arrays(
+        [indice.get_level_values(col) for col in CLAVE_SERIE] + [indice.get_level_values("anio") - 1],
+        names=indice.names,
+    )
+    actual = valores.to_numpy()
+    anterior = valores.reindex(indice_anterior).to_numpy()
+    
+    con_dato = ~np.isnan(actual)
+    con_dato_anterior = ~np.isnan(anterior)
+    comunes = con_dato & con_dato_anterior
+    num_meses = con_dato.sum(axis=1)
+    num_comunes = comunes.sum(axis=1)
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        promedio = np.where(con_dato, actual, 0).sum(axis=1) / num_meses
+        promedio_actual_comun = np.where(comunes, actual, 0).sum(axis=1) / num_comunes
+        promedio_anterior_comun = np.where(comunes, anterior, 0).sum(axis=1) / num_comunes
+        variacion = np.where(
+            promedio_anterior_comun != 0,
+            (promedio_actual_comun / promedio_anterior_comun - 1) * 100,
+            np.nan,
+        )
+    
+    return pd.DataFrame({
+        "promedio": promedio,
+        "num_meses": num_meses,
+        "mascara_meses": (con_dato * (1 << np.arange(12))).sum(axis=1),
+        "num_meses_anterior": con_dato_anterior.sum(axis=1),
+        "num_meses_comunes": num_comunes,
+        "promedio_actual_comun": promedio_actual_comun,
+        "promedio_anterior_comun": promedio_anterior_comun,
+        "variacion_pct": variacion,
+    }, index=indice)
+
+
+def _clave_cubo(tarifa: str, region: str, anio: int, horario: Optional[str], tipo_cargo: str) -> Optional[tuple]:
+    """
+    Llave del cubo de promedios, o None si tipo_cargo no corresponde a
+    exactamente un cargo o el backend es "sqlite" (en esos casos se calcula
+    desde la matriz mensual, sin construir el cubo en memoria).
+    """
+    if _usar_sql():
+        return None
+    cargos = _cargos_por_tipo(get_indice_tarifas(), tipo_cargo)
+    if len(cargos) != 1:
+        return None
+    return (tarifa, normalizar_texto(region), cargos[0], horario or "sin dato", anio)
+
+
 def calcular_promedio_anual(
     tarifa: str,
     region: str,
@@ -893,6 +2267,19 @@ def calcular_promedio_anual(
     Returns:
         Diccionario con promedio, meses disponibles y lista de meses
     """
+    clave = _clave_cubo(tarifa, region, anio, horario, tipo_cargo)
+    if clave is not None:
+        cubo = get_cubo_promedios()
+        if clave not in cubo.index:
+            return {"promedio": None, "num_meses": 0, "meses": []}
+        fila = cubo.loc[clave]
+        mascara = int(fila["mascara_meses"])
+        return {
+            "promedio": float(fila["promedio"]),
+            "num_meses": int(fila["num_meses"]),
+            "meses": [mes for i, mes in enumerate(MESES_ORDEN) if mascara & (1 << i)]
+        }
+    
     tendencia = get_tendencia_mensual(tarifa, region, anio, horario, tipo_cargo)
     
     # Filtrar solo meses con valores
@@ -936,9 +2323,45 @@ def calcular_variacion_promedio_anual(
     Returns:
         Diccionario con promedios, variación y meses comparados
     """
-    # Obtener tendencias de ambos años
-    tendencia_actual = get_tendencia_mensual(tarifa, region, anio_actual, horario, tipo_cargo)
-    tendencia_anterior = get_tendencia_mensual(tarifa, region, anio_anterior, horario, tipo_cargo)
+    # Años consecutivos: lectura directa del cubo precalculado
+    clave = _clave_cubo(tarifa, region, anio_actual, horario, tipo_cargo)
+    if clave is not None and anio_anterior == anio_actual - 1:
+        cubo = get_cubo_promedios()
+        if clave in cubo.index:
+            fila = cubo.loc[clave]
+            num_meses_actual = int(fila["num_meses"])
+            num_meses_anterior = int(fila["num_meses_anterior"])
+        else:
+            clave_anterior = clave[:-1] + (anio_anterior,)
+            fila = None
+            num_meses_actual = 0
+            num_meses_anterior = int(cubo.loc[clave_anterior, "num_meses"]) if clave_anterior in cubo.index else 0
+        
+        if fila is None or fila["num_meses_comunes"] == 0:
+            return {
+                "promedio_actual": None,
+                "promedio_anterior": None,
+                "variacion_pct": None,
+                "num_meses_actual": num_meses_actual,
+                "num_meses_anterior": num_meses_anterior,
+                "num_meses_comunes": 0,
+                "disponible": False
+            }
+        
+        return {
+            "promedio_actual": float(fila["promedio_actual_comun"]),
+            "promedio_anterior": float(fila["promedio_anterior_comun"]),
+            "variacion_pct": float(fila["variacion_pct"]) if pd.notna(fila["variacion_pct"]) else None,
+            "num_meses_actual": num_meses_actual,
+            "num_meses_anterior": num_meses_anterior,
+            "num_meses_comunes": int(fila["num_meses_comunes"]),
+            "disponible": True
+        }
+    
+    # Obtener tendencias de ambos años desde la misma matriz mensual
+    matriz = get_matriz_mensual(tarifa, region, tipo_cargo, [anio_actual, anio_anterior])
+    tendencia_actual = _tendencia_desde_matriz(matriz, anio_actual, horario)
+    tendencia_anterior = _tendencia_desde_matriz(matriz, anio_anterior, horario)
     
     # Crear diccionarios de mes -> valor
     valores_actual = {item["mes"]: item["valor"] for item in tendencia_actual if item["valor"] is not None}
@@ -976,3 +2399,522 @@ def calcular_variacion_promedio_anual(
         "num_meses_comunes": len(meses_comunes),
         "disponible": True
     }
+
+
+@cache_data
+def get_analisis_tarifa(tarifa: str, region: str, anio_actual: int, anio_anterior: int) -> dict:
+    """
+    Reúne todos los cálculos de la vista Análisis de Comportamiento para una
+    tarifa, de modo que la vista se calcula una vez por combinación y las
+    siguientes aperturas de la pestaña salen del cache.
+    
+    Args:
+        tarifa: Código de tarifa
+        region: Nombre de la región/división
+        anio_actual: Año de análisis
+        anio_anterior: Año de comparación
+        
+    Returns:
+        Diccionario con:
+        - "diciembre": resultado de calcular_variacion_diciembre
+        - "horarios": ["B", "I", "P"] para tarifas horarias, [None] para simples
+        - "componentes": {horario: calcular_variacion_componentes(..., "Variable")}
+        - "promedio_fijo": calcular_variacion_promedio_anual(..., None, "Fijo")
+        - "promedios": {horario: calcular_variacion_promedio_anual(..., "Variable")}
+        - "tendencias": {horario: get_datos_tendencia_comparativa(..., "Variable")}
+        Si no hay datos de diciembre solo se calcula "diciembre".
+    """
+    diciembre = calcular_variacion_diciembre(tarifa, region, anio_actual, anio_anterior)
+    horarios = ["B", "I", "P"] if es_tarifa_horaria(tarifa) else [None]
+    analisis = {"diciembre": diciembre, "horarios": horarios}
+    if not diciembre["disponible"]:
+        return analisis
+    
+    args = (tarifa, region, anio_actual, anio_anterior)
+    analisis["componentes"] = {
+        h: calcular_variacion_componentes(*args, horario=h, tipo_cargo="Variable") for h in horarios
+    }
+    analisis["promedio_fijo"] = calcular_variacion_promedio_anual(*args, horario=None, tipo_cargo="Fijo")
+    analisis["promedios"] = {
+        h: calcular_variacion_promedio_anual(*args, horario=h, tipo_cargo="Variable") for h in horarios
+    }
+    analisis["tendencias"] = {
+        h: get_datos_tendencia_comparativa(*args, horario=h, tipo_cargo="Variable") for h in horarios
+    }
+    return analisis
+
+
+# Conceptos del recibo simulado: columnas de la matriz de precios y del vector de cantidades
+CONCEPTOS_SIMULADOR = ["fijo", "B", "I", "P", "simple", "capacidad"]
+
+
+def _conceptos_simulador(df: pd.DataFrame) -> np.ndarray:
+    """Concepto de CONCEPTOS_SIMULADOR de cada fila (None si el cargo no entra en el recibo)."""
+    cargo = df["cargo"].astype(object)
+    horario = df["int_horario"].astype(object).to_numpy()
+    variable = cargo.isin(_cargos_de_tipo("Variable")).to_numpy()
+    return np.select(
+        [
+            cargo.isin(_cargos_de_tipo("Fijo")).to_numpy(),
+            variable & np.isin(horario, ["B", "I", "P"]),
+            variable & (horario == "sin dato"),
+            cargo.isin(_cargos_de_tipo("Capacidad")).to_numpy(),
+        ],
+        ["fijo", horario, "simple", "capacidad"],
+        default=None,
+    )
+
+
+@cache_data
+def _get_precios_simulador(tarifa: str, region_norm: str) -> dict:
+    """Versión cacheada de las matrices de precios de simular_recibos (región ya normalizada)."""
+    columnas = ["anio", "mes_numero", "cargo", "int_horario", "total"]
+    if _usar_sql():
+        df = _consultar_tarifas_sql(columnas, tarifas=(tarifa,), region=region_norm)
+    else:
+        indice = get_indice_tarifas()
+        posiciones = indice["series"].get((tarifa, region_norm))
+        posiciones = np.sort(posiciones) if posiciones is not None else np.array([], dtype=np.int64)
+        df = indice["df"].iloc[posiciones][columnas]
+    
+    df = df.assign(concepto=_conceptos_simulador(df))
+    df = df[df["concepto"].notna() & df["mes_numero"].between(1, 12)]
+    # Conceptos que la tarifa no cobra en ningún mes (p. ej. Capacidad en PDBT) cuestan 0
+    no_aplica = [c for c in CONCEPTOS_SIMULADOR if c not in set(df["concepto"])]
+    
+    # Mensual: última fila con dato de cada mes (igual que get_matriz_mensual)
+    mensual = df[df["total"].notna()].drop_duplicates(["anio", "mes_numero", "concepto"], keep="last")
+    mensual = mensual.pivot(index=["anio", "mes_numero"], columns="concepto", values="total")
+    mensual = mensual.reindex(columns=CONCEPTOS_SIMULADOR).sort_index()
+    mensual[no_aplica] = 0.0
+    
+    # Diciembre: primera fila del CSV de cada año (igual que get_cierres_diciembre)
+    cierres = df[df["mes_numero"] == 12].drop_duplicates(["anio", "concepto"], keep="first")
+    cierres = cierres.pivot(index="anio", columns="concepto", values="total")
+    cierres = cierres.reindex(columns=CONCEPTOS_SIMULADOR).sort_index()
+    cierres[no_aplica] = 0.0
+    
+    return {
+        "anio": mensual.index.get_level_values("anio").to_numpy(dtype=np.int64),
+        "mes_numero": mensual.index.get_level_values("mes_numero").to_numpy(dtype=np.int64),
+        "fecha": pd.to_datetime(pd.DataFrame({
+            "year": mensual.index.get_level_values("anio"), "month": mensual.index.get_level_values("mes_numero"), "day": 1
+        })).to_numpy(),
+        "precios": mensual.to_numpy(dtype=float),
+        "anios_diciembre": cierres.index.to_numpy(dtype=np.int64),
+        "precios_diciembre": cierres.to_numpy(dtype=float),
+    }
+
+
+def _cantidades_recibo(
+    tarifa: str,
+    kwh: float,
+    kwh_periodos: Optional[dict],
+    demanda_kw: float
+) -> np.ndarray:
+    """Vector de cantidades en el orden de CONCEPTOS_SIMULADOR (1 para el cargo fijo)."""
+    if es_tarifa_horaria(tarifa):
+        if kwh_periodos is None:
+            raise ValueError(f"La tarifa {tarifa} es horaria: se requieren los kWh por periodo (B, I, P)")
+        energia = [kwh_periodos.get(h, 0.0) for h in ("B", "I", "P")] + [0.0]
+    else:
+        simple = sum(kwh_periodos.values()) if kwh_periodos is not None else kwh
+        energia = [0.0, 0.0, 0.0, simple]
+    cantidades = np.array([1.0] + energia + [demanda_kw], dtype=float)
+    if (cantidades < 0).any() or np.isnan(cantidades).any():
+        raise ValueError("Los kWh y la demanda deben ser números no negativos")
+    return cantidades
+
+
+def _desglose_recibo(precios: np.ndarray, cantidades: np.ndarray) -> np.ndarray:
+    """
+    Importe del recibo de cada mes en una sola operación sobre la matriz de precios.
+    
+    Args:
+        precios: Matriz (meses × CONCEPTOS_SIMULADOR) en $/mes, $/kWh y $/kW
+        cantidades: Vector de _cantidades_recibo
+        
+    Returns:
+        Matriz (meses × 4) con fijo, energía, capacidad y total en pesos. Un
+        concepto con cantidad 0 cuesta 0 aunque no tenga precio ese mes; si se
+        consume sin precio, el mes queda en NaN
+    """
+    importes = np.where(cantidades == 0, 0.0, precios * cantidades)
+    fijo = importes[:, 0]
+    energia = importes[:, 1:5].sum(axis=1)
+    capacidad = importes[:, 5]
+    return np.column_stack([fijo, energia, capacidad, fijo + energia + capacidad])
+
+
+def simular_recibos(
+    tarifa: str,
+    region: str,
+    kwh: float = 0.0,
+    kwh_periodos: Optional[dict] = None,
+    demanda_kw: float = 0.0
+) -> dict:
+    """
+    Calcula el recibo en pesos de un mismo consumo para cada mes del histórico.
+    
+    Las matrices de precios (Fijo, Variable por periodo y Capacidad) se
+    arman una vez por tarifa y región; cada simulación es solo precio ×
+    cantidad sobre todos los meses a la vez, así que cambiar el consumo no
+    vuelve a consultar las tarifas.
+    
+    Args:
+        tarifa: Código de tarifa
+        region: Nombre de la región/división (se normaliza automáticamente)
+        kwh: Consumo total del mes (tarifas simples)
+        kwh_periodos: {"B": kWh, "I": kWh, "P": kWh}; obligatorio en tarifas
+            horarias, en tarifas simples se usa su suma en lugar de kwh
+        demanda_kw: Demanda del mes en kW (cargo de Capacidad)
+        
+    Returns:
+        Diccionario con:
+        - "mensual": DataFrame con columnas anio, mes_numero, fecha, fijo,
+          energia, capacidad y total ($), un renglón por mes con tarifas
+        - "diciembre": DataFrame con el recibo de cada diciembre (cierre del
+          año, primera fila del CSV) y su variación contra el diciembre
+          anterior: columnas anio, fijo, energia, capacidad, total, anterior,
+          var_absoluta y var_pct (NaN si no aplica)
+        
+    Raises:
+        ValueError: Si la tarifa es horaria y faltan los kWh por periodo, o
+            alguna cantidad es negativa
+    """
+    cantidades = _cantidades_recibo(tarifa, kwh, kwh_periodos, demanda_kw)
+    precios = _get_precios_simulador(tarifa, normalizar_texto(region))
+    
+    desglose = _desglose_recibo(precios["precios"], cantidades)
+    mensual = pd.DataFrame({
+        "anio": precios["anio"],
+        "mes_numero": precios["mes_numero"],
+        "fecha": precios["fecha"],
+        "fijo": desglose[:, 0],
+        "energia": desglose[:, 1],
+        "capacidad": desglose[:, 2],
+        "total": desglose[:, 3],
+    })
+    
+    anios = precios["anios_diciembre"]
+    cierres = _desglose_recibo(precios["precios_diciembre"], cantidades)
+    total = cierres[:, 3]
+    # Diciembre anterior de cada año (NaN si no hay diciembre del año previo)
+    posicion = np.minimum(np.searchsorted(anios, anios - 1), max(len(anios) - 1, 0))
+    anterior = np.where(anios[posicion] == anios - 1, total[posicion], np.nan) if len(anios) else total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var_pct = np.where(anterior != 0, (total / anterior - 1) * 100, np.nan)
+    
+    diciembre = pd.DataFrame({
+        "anio": anios,
+        "fijo": cierres[:, 0],
+        "energia": cierres[:, 1],
+        "capacidad": cierres[:, 2],
+        "total": total,
+        "anterior": anterior,
+        "var_absoluta": total - anterior,
+        "var_pct": var_pct,
+    })
+    return {"mensual": mensual, "diciembre": diciembre}
+
+
+def hay_incrementos_nuevos() -> bool:
+    """
+    Indica si en el directorio de datos hay archivos de incremento distintos a
+    los de la última carga (solo compara nombres; no construye el índice).
+    
+    Returns:
+        True si conviene llamar a actualizar_tarifas()
+    """
+    cargados = _incrementos_cargados.get(str(TARIFAS_FILE), [])
+    return [ruta.name for ruta in archivos_incremento_tarifas(TARIFAS_FILE)] != cargados
+
+
+def _extender_indice_tarifas(indice: dict, df_nuevo: pd.DataFrame, nombres: List[str]) -> None:
+    """
+    Agrega filas al final del índice compartido sin reconstruirlo: solo se
+    agrupan las filas nuevas y sus posiciones se suman a las llaves existentes.
+    """
+    desplazamiento = len(indice["df"])
+    df = _concatenar_tarifas([indice["df"], df_nuevo])
+    fecha_ord = (df["anio"] * 12 + df["mes_numero"]).to_numpy()
+    
+    filas = dict(indice["filas"])
+    for clave, pos in _posiciones_por_grupo(df_nuevo, CLAVE_INDICE_TARIFAS).items():
+        pos = pos + desplazamiento
+        filas[clave] = np.concatenate([filas[clave], pos]) if clave in filas else pos
+    
+    series = dict(indice["series"])
+    periodos = dict(indice["periodos"])
+    for clave, pos in _posiciones_por_grupo(df_nuevo, ["tarifa", "region"]).items():
+        pos = pos + desplazamiento
+        series[clave] = np.concatenate([series[clave], pos]) if clave in series else pos
+        fechas = fecha_ord[series[clave]]
+        periodos[clave] = (int(fechas.min()), int(fechas.max()))
+    
+    # Se reemplazan todas las llaves a la vez para que las lecturas concurrentes vean un índice coherente
+    indice.update({
+        "df": df,
+        "total": df["total"].to_numpy(dtype=float),
+        "filas": filas,
+        "cargos": [c for c in df["cargo"].unique().tolist() if isinstance(c, str)],
+        "horarios": df["int_horario"].unique().tolist(),
+        "periodos": periodos,
+        "series": series,
+        "cargos_por_tipo": {},
+        "incrementos": indice["incrementos"] + nombres,
+    })
+
+
+def actualizar_tarifas() -> dict:
+    """
+    Agrega al histórico los archivos de incremento nuevos (ver
+    archivos_incremento_tarifas) sin recargar ni reprocesar el CSV completo.
+    
+    Solo se normalizan los archivos nuevos (cada uno queda en su propio
+    Parquet en CACHE_DIR), el índice compartido (o la base SQLite con el
+    backend "sqlite") se extiende con sus filas y se invalidan únicamente
+    los resultados derivados afectados:
+    - cálculos por (tarifa, región, año): cierres de diciembre, matrices, análisis y precios del simulador de las series tocadas
+    - rangos de disponibilidad: años, regiones, tarifas y estadísticas
+    - cubos de diciembre y de promedios anuales (se reconstruyen en la siguiente consulta)
+    
+    Si un incremento ya aplicado cambió o desapareció, o un archivo nuevo
+    ordena antes que uno ya aplicado, se vacían todos los caches (recarga completa).
+    También si otro proceso ya agregó incrementos a la base SQLite compartida.
+    
+    Las sesiones que detectan el mismo incremento a la vez se serializan: la
+    primera lo agrega y las demás ya no encuentran archivos nuevos.
+    
+    Returns:
+        Diccionario con:
+        - "archivos": nombres de los incrementos agregados
+        - "filas": filas agregadas
+        - "afectadas": combinaciones (tarifa, región, año) con filas nuevas
+        - "invalidadas": entradas de cache invalidadas por función
+        - "recarga_completa": True si se vaciaron todos los caches
+    """
+    with _candado_actualizacion:
+        return _actualizar_tarifas()
+
+
+def _actualizar_tarifas() -> dict:
+    """Cuerpo de actualizar_tarifas; se llama con _candado_actualizacion tomado."""
+    actuales = archivos_incremento_tarifas(TARIFAS_FILE)
+    nombres_actuales = [ruta.name for ruta in actuales]
+    resultado = {"archivos": [], "filas": 0, "afectadas": [], "invalidadas": {}, "recarga_completa": False}
+    
+    ruta_meta = CACHE_DIR / f"{TARIFAS_FILE.stem}.json"
+    if _usar_sql():
+        almacen = get_almacen_sql()
+        meta = almacen.meta()
+        aplicados = [inc["nombre"] for inc in meta["incrementos"]]
+        if aplicados != _incrementos_cargados.get(str(TARIFAS_FILE), aplicados):
+            # Otro proceso extendió la base compartida después de la última carga de este
+            limpiar_caches()
+            resultado["recarga_completa"] = True
+            return resultado
+    else:
+        indice = get_indice_tarifas()
+        aplicados = indice["incrementos"]
+        meta = _leer_meta_cache(ruta_meta) or {}
+    guardados = {inc["nombre"]: inc for inc in meta.get("incrementos", [])}
+    vigentes = (
+        nombres_actuales[:len(aplicados)] == aplicados
+        # Sin cache persistente no hay huellas guardadas: solo se comparan los nombres
+        and (not meta or all(
+            _huella_vigente(guardados.get(nombre), TARIFAS_FILE.parent / nombre) for nombre in aplicados
+        ))
+    )
+    if not vigentes:
+        limpiar_caches()
+        resultado["recarga_completa"] = True
+        return resultado
+    
+    nuevos = actuales[len(aplicados):]
+    if not nuevos:
+        return resultado
+    
+    if _usar_sql():
+        df_nuevo, agregados = _agregar_incrementos_sql(almacen, nuevos)
+        if agregados != [ruta.name for ruta in nuevos]:
+            # Otro proceso agregó parte de los archivos: esas filas no están en los caches de este
+            limpiar_caches()
+            resultado["recarga_completa"] = True
+            return resultado
+    else:
+        # Normalizar solo los archivos nuevos y registrarlos en los metadatos del cache
+        partes, huellas = [], []
+        for ruta in nuevos:
+            df_inc, huella_inc = _leer_incremento(ruta, None)
+            partes.append(df_inc)
+            huellas.append(huella_inc)
+        df_nuevo = _concatenar_tarifas(partes)
+        if meta:
+            try:
+                _escribir_meta_cache(ruta_meta, {**meta, "incrementos": list(guardados.values()) + huellas})
+            except OSError:
+                pass
+        _extender_indice_tarifas(indice, df_nuevo, [ruta.name for ruta in nuevos])
+    _incrementos_cargados[str(TARIFAS_FILE)] = nombres_actuales
+    
+    # Combinaciones (tarifa, región, año) y series tocadas por las filas nuevas
+    afectadas = set(zip(
+        df_nuevo["tarifa"].astype(object), df_nuevo["region"].astype(object), df_nuevo["anio"].astype(int)
+    ))
+    series = {(tarifa, region) for tarifa, region, _ in afectadas}
+    
+    def anios_afectados(tarifa, region_norm, anios):
+        return any((tarifa, region_norm, anio) in afectadas for anio in anios)
+    
+    invalidadas = {
+        "_get_cierres_diciembre": _get_cierres_diciembre.invalidar(
+            lambda tarifa, region_norm, anios: anios_afectados(tarifa, region_norm, anios)
+        ),
+        "_get_matriz_componentes": _get_matriz_componentes.invalidar(
+            lambda tarifa, region_norm, *args, **kwargs: (tarifa, region_norm) in series
+        ),
+        "_get_precios_simulador": _get_precios_simulador.invalidar(
+            lambda tarifa, region_norm: (tarifa, region_norm) in series
+        ),
+        "_get_matriz_mensual": _get_matriz_mensual.invalidar(
+            lambda tarifa, region_norm, tipo_cargo, anios: (
+                (tarifa, region_norm) in series if anios is None else anios_afectados(tarifa, region_norm, anios)
+            )
+        ),
+        "get_analisis_tarifa": get_analisis_tarifa.invalidar(
+            lambda tarifa, region, anio_actual, anio_anterior: anios_afectados(
+                tarifa, normalizar_texto(region), (anio_actual, anio_anterior)
+            )
+        ),
+    }
+    
+    # Lecturas por partición: solo las que incluyen un (anio, tarifa) con filas nuevas
+    particiones = {(anio, tarifa) for tarifa, _, anio in afectadas}
+    invalidadas["load_tarifas"] = load_tarifas.invalidar(
+        lambda anios=None, tarifas=None: any(
+            (anios is None or anio in anios) and (tarifas is None or tarifa in tarifas)
+            for anio, tarifa in particiones
+        )
+    )
+    
+    # Rangos de disponibilidad y cubos: se recalculan completos desde el índice ya extendido
+    # (leen get_indice_tarifas()["df"], no load_tarifas(), así que no se vuelve a leer el histórico)
+    for funcion in (
+        get_tarifas_disponibles, get_anios_disponibles, get_regiones_disponibles,
+        _get_data_stats_base, verificar_match_regiones, get_cierres_nacionales, get_cubo_promedios,
+        _get_catalogo_sql,
+    ):
+        funcion.clear()
+    
+    resultado.update({
+        "archivos": [ruta.name for ruta in nuevos],
+        "filas": len(df_nuevo),
+        "afectadas": sorted(afectadas),
+        "invalidadas": invalidadas,
+    })
+    return resultado
+
+
+def _resultados_iguales(a, b, rtol: float = 1e-9) -> bool:
+    """
+    Compara resultados de los dos backends: DataFrames por valor (sin
+    distinguir categóricas de texto ni int de float), floats con tolerancia
+    relativa y None/NaN como equivalentes.
+    """
+    if isinstance(a, pd.DataFrame) and isinstance(b, pd.DataFrame):
+        if list(a.columns) != list(b.columns) or len(a) != len(b) or not a.index.equals(b.index):
+            return False
+        return all(
+            _resultados_iguales(a[col].astype(object).tolist(), b[col].astype(object).tolist(), rtol)
+            for col in a.columns
+        )
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_resultados_iguales(a[k], b[k], rtol) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_resultados_iguales(x, y, rtol) for x, y in zip(a, b))
+    if (a is None or (isinstance(a, float) and np.isnan(a))) and (b is None or (isinstance(b, float) and np.isnan(b))):
+        return True
+    if isinstance(a, (int, float, np.number)) and isinstance(b, (int, float, np.number)):
+        return bool(np.isclose(float(a), float(b), rtol=rtol, atol=0.0))
+    return a == b
+
+
+def _bateria_equivalencia(combinaciones: List[Tuple[str, str]], anios: List[int]) -> dict:
+    """Resultados de las funciones públicas de consulta con el backend activo ({nombre: resultado})."""
+    resultados = {
+        "get_tarifas_disponibles": get_tarifas_disponibles(),
+        "get_anios_disponibles": get_anios_disponibles(),
+        "get_regiones_disponibles": get_regiones_disponibles(),
+        "get_estados": get_estados(),
+        "get_municipios_por_division": {r: get_municipios_por_division(r) for _, r in combinaciones},
+        "verificar_match_regiones": verificar_match_regiones(),
+        "conteos": {k: v for k, v in get_data_stats().items() if k != "memoria_tarifas"},
+    }
+    for anio in anios:
+        resultados[f"calcular_ranking_diciembre({anio})"] = calcular_ranking_diciembre(anio, anio - 1)
+    for tarifa, region in combinaciones:
+        horarios = ["B", "I", "P"] if es_tarifa_horaria(tarifa) else [None]
+        clave = f"{tarifa}/{region}"
+        resultados[f"calcular_matriz_componentes({clave})"] = [calcular_matriz_componentes(tarifa, region, h) for h in horarios]
+        resultados[f"get_matriz_mensual({clave})"] = [get_matriz_mensual(tarifa, region, tipo) for tipo in ("Variable", "Fijo", "Capacidad")]
+        consumo = {"kwh_periodos": {"B": 1000.0, "I": 2000.0, "P": 500.0}} if es_tarifa_horaria(tarifa) else {"kwh": 800.0}
+        resultados[f"simular_recibos({clave})"] = simular_recibos(tarifa, region, demanda_kw=50.0, **consumo)
+        for anio in anios:
+            clave_anio = f"{clave}/{anio}"
+            resultados[f"load_tarifas({anio}, {tarifa})"] = load_tarifas(anios=(anio,), tarifas=(tarifa,))
+            resultados[f"calcular_rango_12_meses({clave_anio})"] = calcular_rango_12_meses(12, anio, tarifa=tarifa, division=region)
+            resultados[f"get_analisis_tarifa({clave_anio})"] = get_analisis_tarifa(tarifa, region, anio, anio - 1)
+            resultados[f"promedios({clave_anio})"] = [
+                (calcular_promedio_anual(tarifa, region, anio, h, tipo),
+                 calcular_variacion_promedio_anual(tarifa, region, anio, anio - 1, h, tipo))
+                for h in horarios for tipo in ("Variable", "Capacidad")
+            ]
+    return resultados
+
+
+def verificar_equivalencia_sql(max_combinaciones: int = 20, max_anios: int = 3) -> dict:
+    """
+    Comprueba que el backend "sqlite" da los mismos resultados que "pandas".
+    
+    Ejecuta la misma batería de funciones públicas (catálogos, cierres de
+    diciembre, ranking, matrices, promedios, análisis completo, simulador de
+    recibos y lecturas por partición) con cada backend y compara resultado por resultado.
+    Las combinaciones (tarifa, región) se eligen repartidas sobre todas las
+    tarifas y regiones. Al terminar se restaura el backend que estaba activo.
+    
+    Args:
+        max_combinaciones: Número de combinaciones (tarifa, región) a comparar
+        max_anios: Número de años (los más recientes) a comparar
+    
+    Returns:
+        Diccionario con:
+        - "comprobaciones": número de resultados comparados
+        - "diferencias": nombres de los resultados que no coinciden
+        - "equivalente": True si no hubo diferencias
+    """
+    backend_previo = get_backend_datos()
+    try:
+        configurar_backend_datos("pandas")
+        tarifas = get_tarifas_disponibles()["tarifa"].astype(str).tolist()
+        regiones = get_regiones_disponibles()
+        todas = [(t, r) for t in tarifas for r in regiones]
+        paso = max(1, len(todas) // max(1, max_combinaciones))
+        # Paso coprimo con el número de regiones para no repetir siempre la misma región
+        while len(regiones) > 1 and np.gcd(paso, len(regiones)) != 1:
+            paso += 1
+        combinaciones = [todas[(i * paso) % len(todas)] for i in range(min(max_combinaciones, len(todas)))]
+        anios = get_anios_disponibles()[-max_anios:]
+        
+        esperado = _bateria_equivalencia(combinaciones, anios)
+        configurar_backend_datos("sqlite")
+        obtenido = _bateria_equivalencia(combinaciones, anios)
+    finally:
+        configurar_backend_datos(backend_previo)
+    
+    diferencias = [nombre for nombre in esperado if not _resultados_iguales(esperado[nombre], obtenido[nombre])]
+    return {
+        "comprobaciones": len(esperado),
+        "diferencias": diferencias,
+        "equivalente": not diferencias,
+    }
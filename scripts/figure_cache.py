@@ -0,0 +1,150 @@
+"""
+CFE Tariff Analyzer - Figure Cache
+==================================
+Cache LRU acotado de figuras Plotly serializadas (JSON).
+
+Las gráficas del análisis se identifican por
+(tarifa, region, anio_actual, anio_anterior, horario, tipo_cargo, tipo_grafica).
+En un acierto la figura se reconstruye desde su JSON sin volver a armar el
+DataFrame ni pasar por Plotly Express y su validación; solo se construye la
+figura en el primer render de cada combinación.
+"""
+
+from typing import Callable, Hashable
+from collections import OrderedDict
+import json
+import threading
+
+if __package__:
+    from .cache_backend import cache_resource
+else:
+    from cache_backend import cache_resource
+
+# Límites del cache: lo que se alcance primero provoca desalojo LRU
+MAX_FIGURAS = 256
+MAX_BYTES_FIGURAS = 32 * 1024 ** 2
+
+
+def _deserializar_figura(spec: str):
+    """
+    Reconstruye una figura desde su JSON sin validar cada propiedad
+    (el JSON salió de una figura ya validada).
+    """
+    import plotly.graph_objects as go
+
+    datos = json.loads(spec)
+    try:
+        return go.Figure(datos, _validate=False)
+    except TypeError:
+        # Versiones de Plotly sin el parámetro _validate
+        return go.Figure(datos)
+
+
+class CacheFiguras:
+    """
+    Cache LRU de figuras serializadas, acotado por número de figuras y bytes.
+
+    Es seguro entre hilos: una misma instancia se comparte entre sesiones.
+    """
+
+    def __init__(self, max_entradas: int = MAX_FIGURAS, max_bytes: int = MAX_BYTES_FIGURAS):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._figuras: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._bytes = 0
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave: Hashable, construir: Callable):
+        """
+        Devuelve la figura de `clave`, construyéndola con `construir()` si no
+        está en el cache.
+
+        Args:
+            clave: Tupla que identifica la gráfica
+            construir: Función sin argumentos que arma la figura Plotly
+
+        Returns:
+            Figura Plotly (go.Figure)
+        """
+        with self._candado:
+            spec = self._figuras.get(clave)
+            if spec is not None:
+                self._figuras.move_to_end(clave)
+                self.aciertos += 1
+        if spec is not None:
+            return _deserializar_figura(spec)
+
+        figura = construir()
+        self.guardar(clave, figura.to_json())
+        with self._candado:
+            self.fallos += 1
+        return figura
+
+    def guardar(self, clave: Hashable, spec: str) -> None:
+        """Guarda el JSON de una figura y desaloja las menos usadas si se excede algún límite."""
+        tamano = len(spec)
+        if tamano > self.max_bytes:
+            return
+        with self._candado:
+            anterior = self._figuras.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._figuras[clave] = spec
+            self._bytes += tamano
+            while len(self._figuras) > self.max_entradas or self._bytes > self.max_bytes:
+                _, desalojada = self._figuras.popitem(last=False)
+                self._bytes -= len(desalojada)
+
+    def invalidar(self, predicado: Callable[[Hashable], bool]) -> int:
+        """
+        Elimina las figuras cuya clave cumple el predicado.
+
+        Args:
+            predicado: Función que recibe la clave y devuelve True si la figura ya no es válida
+
+        Returns:
+            Número de figuras eliminadas
+        """
+        with self._candado:
+            claves = [clave for clave in self._figuras if predicado(clave)]
+            for clave in claves:
+                self._bytes -= len(self._figuras.pop(clave))
+        return len(claves)
+
+    def limpiar(self) -> None:
+        """Vacía el cache."""
+        with self._candado:
+            self._figuras.clear()
+            self._bytes = 0
+
+    def memory_usage(self, deep: bool = True) -> int:
+        """Bytes de las figuras guardadas (usado por el reporte de memoria)."""
+        return self._bytes
+
+    def estadisticas(self) -> dict:
+        """
+        Estado del cache.
+
+        Returns:
+            Diccionario con entradas, bytes, aciertos y fallos
+        """
+        with self._candado:
+            return {
+                "entradas": len(self._figuras),
+                "bytes": self._bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+            }
+
+
+@cache_resource
+def get_cache_figuras() -> CacheFiguras:
+    """
+    Obtiene el cache de figuras compartido por el proceso.
+
+    Returns:
+        Instancia de CacheFiguras
+    """
+    return CacheFiguras()
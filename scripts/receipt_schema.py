@@ -0,0 +1,375 @@
+"""
+CFE Tariff Analyzer - Receipt Schema
+====================================
+Esquemas de captura de recibo por tarifa (HU-6.2 a HU-6.4): qué campos
+variables tiene el recibo de cada tarifa y cómo se validan.
+
+Las definiciones viven en ESQUEMAS_FILE y se leen una sola vez por proceso.
+Cada campo se compila a una regla con sus límites ya resueltos (tipo,
+mínimo, máximo, decimales), así que validar un formulario en cada rerun o
+un lote de miles de recibos solo aplica reglas ya armadas:
+- validar(): un recibo, valor por valor (formulario)
+- validar_lote(): muchos recibos, columna por columna con pandas
+
+Tipos de campo:
+- numerico: número >= 0 (kWh, kW)
+- monetario: número >= 0 con máximo dos decimales
+- factor_potencia: número entre 0 y 1
+- texto: cualquier texto
+
+Una tarifa sin esquema definido es "abierta": acepta campos arbitrarios
+como texto (el esquema se construye bajo demanda al guardar, ver
+receipt_store).
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import math
+import numpy as np
+import pandas as pd
+
+if __package__:
+    from .cache_backend import cache_resource
+    from .data_loader import DATA_DIR, MESES_NOMBRES, get_tarifas_disponibles
+    from .receipt_store import COLUMNAS_GENERALES_RECIBO
+else:
+    from cache_backend import cache_resource
+    from data_loader import DATA_DIR, MESES_NOMBRES, get_tarifas_disponibles
+    from receipt_store import COLUMNAS_GENERALES_RECIBO
+
+ESQUEMAS_FILE = DATA_DIR / "04_esquemas_recibo_por_tarifa.json"
+
+# Límites por tipo de campo: (mínimo, máximo, decimales); None = sin límite
+LIMITES_TIPO_CAMPO = {
+    "numerico": (0.0, None, None),
+    "monetario": (0.0, None, 2),
+    "factor_potencia": (0.0, 1.0, None),
+    "texto": (None, None, None),
+}
+
+# Tolerancia al comparar contra el redondeo a N decimales (errores de punto flotante)
+TOLERANCIA_DECIMALES = 1e-6
+
+MENSAJE_OBLIGATORIO = "Campo obligatorio"
+MENSAJE_NO_NUMERICO = "Debe ser un número"
+MENSAJE_MES = "Mes no válido"
+MENSAJE_ANIO = "Debe ser un año"
+
+
+class CampoRecibo:
+    """
+    Campo variable compilado: definición del esquema más su regla de
+    validación con los límites ya resueltos.
+    """
+
+    def __init__(self, definicion: dict):
+        self.nombre = definicion["nombre"]
+        self.etiqueta = definicion.get("etiqueta", self.nombre)
+        self.tipo = definicion.get("tipo", "texto")
+        if self.tipo not in LIMITES_TIPO_CAMPO:
+            raise ValueError(f"Tipo de campo desconocido en {self.nombre}: {self.tipo}")
+        self.obligatorio = bool(definicion.get("obligatorio", False))
+        minimo, maximo, decimales = LIMITES_TIPO_CAMPO[self.tipo]
+        self.minimo = definicion.get("min", minimo)
+        self.maximo = definicion.get("max", maximo)
+        self.decimales = definicion.get("decimales", decimales)
+        self.es_numerico = self.tipo != "texto"
+        self.mensaje_minimo = (
+            "No se aceptan valores negativos" if self.minimo == 0 else f"Debe ser mayor o igual a {self.minimo:g}"
+        ) if self.minimo is not None else None
+        self.mensaje_maximo = f"Debe ser menor o igual a {self.maximo:g}" if self.maximo is not None else None
+        if self.tipo == "factor_potencia":
+            self.mensaje_minimo = self.mensaje_maximo = f"Debe estar entre {self.minimo:g} y {self.maximo:g}"
+        self.mensaje_decimales = f"Máximo {self.decimales} decimales" if self.decimales is not None else None
+        self.validar: Callable[[Any], Tuple[Any, Optional[str]]] = self._compilar()
+
+    def _compilar(self) -> Callable[[Any], Tuple[Any, Optional[str]]]:
+        """Regla de un valor: devuelve (valor normalizado, mensaje de error o None)."""
+        obligatorio, minimo, maximo, decimales = self.obligatorio, self.minimo, self.maximo, self.decimales
+        escala = 10 ** decimales if decimales is not None else None
+        mensaje_minimo, mensaje_maximo, mensaje_decimales = self.mensaje_minimo, self.mensaje_maximo, self.mensaje_decimales
+
+        def validar_texto(valor):
+            texto = "" if _es_vacio(valor) else str(valor).strip()
+            if not texto:
+                return None, MENSAJE_OBLIGATORIO if obligatorio else None
+            return texto, None
+
+        def validar_numero(valor):
+            if _es_vacio(valor):
+                return None, MENSAJE_OBLIGATORIO if obligatorio else None
+            try:
+                numero = float(valor.strip() if isinstance(valor, str) else valor)
+            except (TypeError, ValueError):
+                return None, MENSAJE_NO_NUMERICO
+            if not math.isfinite(numero):
+                return None, MENSAJE_NO_NUMERICO
+            if minimo is not None and numero < minimo:
+                return None, mensaje_minimo
+            if maximo is not None and numero > maximo:
+                return None, mensaje_maximo
+            if escala is not None:
+                if abs(numero * escala - round(numero * escala)) > TOLERANCIA_DECIMALES:
+                    return None, mensaje_decimales
+                numero = round(numero, decimales)
+            return numero, None
+
+        return validar_numero if self.es_numerico else validar_texto
+
+    def validar_serie(self, serie: pd.Series) -> pd.Series:
+        """
+        La misma regla de validar() sobre una columna completa.
+
+        Returns:
+            Serie con el mensaje de error de cada valor (None si es válido)
+        """
+        limpia, vacio = _limpiar_serie(serie)
+        if not self.es_numerico:
+            return pd.Series(np.where(vacio & self.obligatorio, MENSAJE_OBLIGATORIO, None), index=serie.index, dtype=object)
+
+        numeros = _numeros_serie(limpia, vacio)
+        with np.errstate(invalid="ignore"):
+            condiciones = [
+                vacio & self.obligatorio,
+                ~vacio & ~np.isfinite(numeros),
+                (numeros < self.minimo) if self.minimo is not None else np.zeros(len(numeros), dtype=bool),
+                (numeros > self.maximo) if self.maximo is not None else np.zeros(len(numeros), dtype=bool),
+            ]
+            if self.decimales is not None:
+                escalados = numeros * 10 ** self.decimales
+                condiciones.append(np.abs(escalados - np.round(escalados)) > TOLERANCIA_DECIMALES)
+        mensajes = [MENSAJE_OBLIGATORIO, MENSAJE_NO_NUMERICO, self.mensaje_minimo, self.mensaje_maximo, self.mensaje_decimales]
+        return pd.Series(
+            np.select(condiciones, mensajes[:len(condiciones)], default=None), index=serie.index, dtype=object
+        )
+
+
+def _es_vacio(valor: Any) -> bool:
+    """None, NaN o texto en blanco."""
+    if valor is None:
+        return True
+    if isinstance(valor, str):
+        return not valor.strip()
+    return isinstance(valor, float) and math.isnan(valor)
+
+
+def _limpiar_serie(serie: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """
+    Versión por columna de _es_vacio: recorta los textos (los demás valores
+    quedan igual) y marca los vacíos.
+
+    Returns:
+        (serie recortada, máscara de vacíos)
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie, serie.isna().to_numpy()
+    try:
+        recortada = serie.str.strip()
+    except AttributeError:  # columna object sin ningún texto
+        return serie, serie.isna().to_numpy()
+    limpia = recortada.where(recortada.notna(), serie)
+    return limpia, (limpia.isna() | (limpia == "")).to_numpy(dtype=bool)
+
+
+def _numeros_serie(limpia: pd.Series, vacio: np.ndarray) -> np.ndarray:
+    """Valores como float (NaN si están vacíos o no son números)."""
+    return pd.to_numeric(limpia.where(~vacio), errors="coerce").astype(float).to_numpy()
+
+
+class EsquemaRecibo:
+    """Campos variables compilados de una tarifa."""
+
+    def __init__(self, tarifa: str, definiciones: Optional[List[dict]]):
+        self.tarifa = tarifa
+        # Sin definición: tarifa abierta, cualquier campo se guarda como texto
+        self.abierto = definiciones is None
+        self.campos = [CampoRecibo(d) for d in definiciones or []]
+        self._por_nombre = {campo.nombre: campo for campo in self.campos}
+
+    def validar(self, valores: dict) -> Tuple[dict, dict]:
+        """
+        Valida los campos variables de un recibo.
+
+        Args:
+            valores: {campo: valor capturado}
+
+        Returns:
+            (campos normalizados listos para guardar, {campo: mensaje de error})
+        """
+        normalizados, errores = {}, {}
+        for campo in self.campos:
+            valor, error = campo.validar(valores.get(campo.nombre))
+            if error:
+                errores[campo.nombre] = error
+            elif valor is not None:
+                normalizados[campo.nombre] = valor
+        for nombre, valor in valores.items():
+            if nombre in self._por_nombre or _es_vacio(valor):
+                continue
+            if self.abierto:
+                normalizados[nombre] = str(valor).strip()
+            else:
+                errores[nombre] = f"Campo no definido para la tarifa {self.tarifa}"
+        return normalizados, errores
+
+    def validar_lote(self, valores: pd.DataFrame) -> pd.DataFrame:
+        """
+        Valida muchos recibos de la tarifa a la vez, una columna por campo.
+
+        Args:
+            valores: Una fila por recibo y una columna por campo capturado
+
+        Returns:
+            DataFrame con el mismo índice y una columna por campo con error
+            en algún recibo (mensaje o None)
+        """
+        errores = {}
+        for campo in self.campos:
+            columna = valores[campo.nombre] if campo.nombre in valores else pd.Series(None, index=valores.index, dtype=object)
+            mensajes = campo.validar_serie(columna)
+            if mensajes.notna().any():
+                errores[campo.nombre] = mensajes
+        if not self.abierto:
+            for nombre in valores.columns.difference(list(self._por_nombre), sort=False):
+                capturado = ~_limpiar_serie(valores[nombre])[1]
+                if capturado.any():
+                    errores[nombre] = pd.Series(
+                        np.where(capturado, f"Campo no definido para la tarifa {self.tarifa}", None), index=valores.index
+                    )
+        return pd.DataFrame(errores, index=valores.index)
+
+
+class RegistroEsquemas:
+    """
+    Esquemas compilados por código de tarifa.
+
+    Las definiciones se leen una vez; cada tarifa se compila la primera vez
+    que se pide y queda lista para las siguientes validaciones.
+    """
+
+    def __init__(self, definiciones: Dict[str, dict], tarifas: List[str]):
+        self._definiciones = definiciones
+        self._esquemas: Dict[str, EsquemaRecibo] = {}
+        for tarifa in tarifas:
+            self.obtener(tarifa)
+
+    def tarifas(self) -> List[str]:
+        """Tarifas con esquema compilado."""
+        return list(self._esquemas)
+
+    def obtener(self, tarifa: str) -> EsquemaRecibo:
+        """Esquema compilado de la tarifa (abierto si no tiene definición)."""
+        esquema = self._esquemas.get(tarifa)
+        if esquema is None:
+            definicion = self._definiciones.get(tarifa)
+            esquema = EsquemaRecibo(tarifa, definicion["campos"] if definicion is not None else None)
+            self._esquemas[tarifa] = esquema
+        return esquema
+
+    def validar(self, recibo: dict) -> Tuple[dict, dict]:
+        """
+        Valida un recibo completo: datos generales (HU-6.1) y campos de su tarifa.
+
+        Args:
+            recibo: Diccionario con tarifa, numero_servicio, mes, anio y
+                "campos" ({campo: valor})
+
+        Returns:
+            (campos normalizados, {campo: mensaje de error}); sin errores, los
+            campos normalizados son los que se pasan a AlmacenRecibos.guardar()
+        """
+        errores = _errores_generales(recibo)
+        if "tarifa" in errores:
+            return {}, errores
+        campos, errores_campos = self.obtener(recibo["tarifa"]).validar(recibo.get("campos") or {})
+        errores.update(errores_campos)
+        return campos, errores
+
+    def validar_lote(self, recibos: List[dict]) -> List[dict]:
+        """
+        Valida muchos recibos agrupándolos por tarifa: cada esquema revisa
+        sus columnas una sola vez para todo el grupo.
+
+        Args:
+            recibos: Recibos con el formato de validar()
+
+        Returns:
+            Lista alineada con recibos: {campo: mensaje de error} ({} si es válido)
+        """
+        resultado = [{} for _ in recibos]
+        generales = pd.DataFrame.from_records(recibos, columns=COLUMNAS_GENERALES_RECIBO) if recibos else None
+        lotes = [_errores_generales_lote(generales)] if recibos else []
+
+        por_tarifa: Dict[str, List[int]] = {}
+        for posicion, recibo in enumerate(recibos):
+            if not _es_vacio(recibo.get("tarifa")):
+                por_tarifa.setdefault(recibo["tarifa"], []).append(posicion)
+        for tarifa, posiciones in por_tarifa.items():
+            valores = pd.DataFrame.from_records(
+                [recibos[p].get("campos") or {} for p in posiciones], index=posiciones
+            )
+            lotes.append(self.obtener(tarifa).validar_lote(valores))
+
+        # Solo los errores se convierten a objetos Python
+        for errores in lotes:
+            for nombre in errores.columns:
+                for posicion, mensaje in errores[nombre].dropna().items():
+                    resultado[posicion][nombre] = mensaje
+        return resultado
+
+
+def _errores_generales(recibo: dict) -> dict:
+    """Errores de los datos generales obligatorios de un recibo."""
+    errores = {campo: MENSAJE_OBLIGATORIO for campo in COLUMNAS_GENERALES_RECIBO if _es_vacio(recibo.get(campo))}
+    if "mes" not in errores and str(recibo["mes"]).strip().lower() not in MESES_NOMBRES:
+        errores["mes"] = MENSAJE_MES
+    if "anio" not in errores:
+        anio = recibo["anio"]
+        try:
+            anio = float(anio.strip() if isinstance(anio, str) else anio)
+        except (TypeError, ValueError):
+            anio = math.nan
+        if not (math.isfinite(anio) and anio.is_integer()):
+            errores["anio"] = MENSAJE_ANIO
+    return errores
+
+
+def _errores_generales_lote(generales: pd.DataFrame) -> pd.DataFrame:
+    """_errores_generales por columna: un mensaje (o None) por recibo y dato general."""
+    errores = {}
+    for campo in COLUMNAS_GENERALES_RECIBO:
+        limpia, vacio = _limpiar_serie(generales[campo])
+        mensajes = np.where(vacio, MENSAJE_OBLIGATORIO, None)
+        if campo == "mes":
+            valido = limpia.astype(str).str.lower().isin(MESES_NOMBRES).to_numpy()
+            mensajes = np.where(~vacio & ~valido, MENSAJE_MES, mensajes)
+        elif campo == "anio":
+            numeros = _numeros_serie(limpia, vacio)
+            with np.errstate(invalid="ignore"):
+                valido = np.isfinite(numeros) & (numeros == np.round(numeros))
+            mensajes = np.where(~vacio & ~valido, MENSAJE_ANIO, mensajes)
+        errores[campo] = pd.Series(mensajes, index=generales.index, dtype=object)
+    return pd.DataFrame(errores)
+
+
+def cargar_definiciones(ruta=ESQUEMAS_FILE) -> Dict[str, dict]:
+    """
+    Lee las definiciones de esquemas por tarifa.
+
+    Returns:
+        {tarifa: {"campos": [definición de campo, ...]}}; vacío si no existe el archivo
+    """
+    if not ruta.exists():
+        return {}
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo).get("tarifas", {})
+
+
+@cache_resource
+def get_registro_esquemas() -> RegistroEsquemas:
+    """
+    Registro compartido de esquemas: lee ESQUEMAS_FILE y compila los
+    esquemas de las tarifas de get_tarifas_disponibles() una sola vez.
+    """
+    tarifas = get_tarifas_disponibles()["tarifa"].astype(str).tolist()
+    return RegistroEsquemas(cargar_definiciones(), tarifas)
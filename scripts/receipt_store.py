@@ -0,0 +1,398 @@
+"""
+CFE Tariff Analyzer - Receipt Store
+===================================
+Registro local de recibos capturados (HU-6.5): base SQLite en modo WAL de
+solo inserción.
+
+- Inmutable: triggers rechazan UPDATE y DELETE sobre la tabla recibos.
+- Guardar cuesta lo mismo con 10 o con 500,000 recibos: solo se agrega una
+  fila al final (no se reescribe ningún archivo).
+- Varias sesiones de Streamlit guardan a la vez: un hilo escritor por proceso
+  junta los recibos pendientes y los confirma en una sola transacción
+  (un fsync por lote); entre procesos, SQLite serializa las escrituras.
+- Compactación periódica: cada COMPACTAR_CADA recibos el WAL se vuelca a la
+  base y se trunca, así que no crece sin límite.
+
+Tablas:
+- recibos: id (folio), datos generales, campos variables (JSON) y timestamp_captura
+- esquemas: campos variables registrados por tarifa (se amplían, nunca se quitan)
+
+La exportación a CSV (HU-6.6) se escribe por lotes: las columnas salen de la
+tabla esquemas y las filas se leen por folio, así que la memoria no depende
+del número de recibos.
+"""
+
+from typing import Iterator, List, Optional
+from datetime import datetime, timezone
+import csv
+import io
+import json
+import os
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+
+if __package__:
+    from .cache_backend import cache_resource
+    from .data_loader import DATA_DIR
+else:
+    from cache_backend import cache_resource
+    from data_loader import DATA_DIR
+
+RECIBOS_FILE = DATA_DIR / "recibos_capturados.sqlite"
+
+# Datos generales obligatorios de cada recibo (HU-6.1)
+COLUMNAS_GENERALES_RECIBO = ["tarifa", "numero_servicio", "mes", "anio"]
+
+# Máximo de recibos por transacción y espera para juntar un lote (segundos)
+LOTE_MAX_RECIBOS = 256
+ESPERA_LOTE_S = 0.002
+
+# Recibos entre compactaciones del WAL
+COMPACTAR_CADA = 1000
+
+# Espera máxima por el candado de escritura de otro proceso (milisegundos)
+ESPERA_CANDADO_MS = 30_000
+
+# Espera máxima de guardar() por la confirmación (abrir la conexión + tomar el candado)
+ESPERA_GUARDADO_S = 2 * ESPERA_CANDADO_MS / 1000
+
+# Recibos por lote al exportar
+LOTE_EXPORTACION = 5000
+
+# Columnas fijas del CSV exportado; después van los campos variables de todos los esquemas
+COLUMNAS_EXPORTACION = ["id"] + COLUMNAS_GENERALES_RECIBO + ["timestamp_captura"]
+
+_ESQUEMA_SQL = """
+CREATE TABLE IF NOT EXISTS recibos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tarifa TEXT NOT NULL,
+    numero_servicio TEXT NOT NULL,
+    mes TEXT NOT NULL,
+    anio INTEGER NOT NULL,
+    campos TEXT NOT NULL DEFAULT '{}',
+    timestamp_captura TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS esquemas (
+    tarifa TEXT PRIMARY KEY,
+    campos TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS recibos_sin_edicion BEFORE UPDATE ON recibos
+BEGIN
+    SELECT RAISE(ABORT, 'Los recibos guardados no se pueden modificar');
+END;
+CREATE TRIGGER IF NOT EXISTS recibos_sin_eliminacion BEFORE DELETE ON recibos
+BEGIN
+    SELECT RAISE(ABORT, 'Los recibos guardados no se pueden eliminar');
+END;
+"""
+
+
+class _Pendiente:
+    """Recibo en la cola del escritor; el llamador espera a que se confirme."""
+
+    def __init__(self, fila: tuple, campos: List[str]):
+        self.fila = fila
+        self.campos = campos
+        self.listo = threading.Event()
+        self.id: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self._candado = threading.Lock()
+        self._tomado = False
+        self._cancelado = False
+
+    def tomar(self) -> bool:
+        """El escritor lo incluye en un lote; False si el llamador ya desistió."""
+        with self._candado:
+            self._tomado = not self._cancelado
+            return self._tomado
+
+    def cancelar(self) -> bool:
+        """El llamador desiste; False si el escritor ya lo está confirmando."""
+        with self._candado:
+            self._cancelado = not self._tomado
+            return self._cancelado
+
+
+class AlmacenRecibos:
+    """
+    Registro de recibos de solo inserción.
+
+    guardar() encola el recibo y bloquea hasta que su lote quedó confirmado
+    en disco, así que la confirmación al usuario nunca se adelanta al fsync.
+    """
+
+    def __init__(self, ruta: Path, max_lote: int = LOTE_MAX_RECIBOS, espera_lote_s: float = ESPERA_LOTE_S):
+        self.ruta = Path(ruta)
+        self.max_lote = max_lote
+        self.espera_lote_s = espera_lote_s
+        self._cola: "queue.Queue[_Pendiente]" = queue.Queue()
+        self._hilo: Optional[threading.Thread] = None
+        self._candado = threading.Lock()
+        self._desde_compactacion = 0
+
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        conexion = self._conectar()
+        try:
+            conexion.executescript(_ESQUEMA_SQL)
+            self._esquemas = {
+                tarifa: json.loads(campos) for tarifa, campos in conexion.execute("SELECT tarifa, campos FROM esquemas")
+            }
+        finally:
+            conexion.close()
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Conexión de escritura en modo WAL con fsync en cada commit."""
+        conexion = sqlite3.connect(self.ruta, timeout=ESPERA_CANDADO_MS / 1000, isolation_level=None, check_same_thread=False)
+        try:
+            conexion.execute("PRAGMA journal_mode = WAL")
+            conexion.execute("PRAGMA synchronous = FULL")
+            conexion.execute(f"PRAGMA busy_timeout = {ESPERA_CANDADO_MS}")
+        except BaseException:
+            conexion.close()
+            raise
+        return conexion
+
+    def guardar(self, recibo: dict) -> dict:
+        """
+        Guarda un recibo de forma definitiva.
+
+        Args:
+            recibo: Datos generales (COLUMNAS_GENERALES_RECIBO) y, opcionalmente,
+                "campos": {campo: valor} con los datos variables de la tarifa
+
+        Returns:
+            Diccionario con "id" (folio) y "timestamp_captura" (UTC, ISO 8601)
+
+        Raises:
+            ValueError: si falta un dato general
+            sqlite3.Error: si no se pudo escribir (el recibo no quedó guardado)
+            sqlite3.OperationalError: si no se confirmó en ESPERA_GUARDADO_S (ej.
+                otro proceso retiene el candado de escritura)
+        """
+        faltantes = [col for col in COLUMNAS_GENERALES_RECIBO if recibo.get(col) in (None, "")]
+        if faltantes:
+            raise ValueError(f"Faltan datos generales del recibo: {', '.join(faltantes)}")
+        campos = dict(recibo.get("campos") or {})
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        fila = (
+            str(recibo["tarifa"]), str(recibo["numero_servicio"]), str(recibo["mes"]), int(recibo["anio"]),
+            json.dumps(campos, ensure_ascii=False), timestamp,
+        )
+
+        pendiente = _Pendiente(fila, list(campos))
+        self._asegurar_escritor()
+        self._cola.put(pendiente)
+        if not pendiente.listo.wait(ESPERA_GUARDADO_S):
+            if pendiente.cancelar():
+                raise sqlite3.OperationalError(
+                    f"El recibo no se guardó: la base siguió ocupada {ESPERA_GUARDADO_S:g} s"
+                )
+            # El escritor ya lo tomó: su transacción está acotada por el busy timeout
+            if not pendiente.listo.wait(ESPERA_GUARDADO_S):
+                raise sqlite3.OperationalError(
+                    "Sin confirmación del recibo; revisa el histórico antes de volver a guardarlo"
+                )
+        if pendiente.error is not None:
+            raise pendiente.error
+        return {"id": pendiente.id, "timestamp_captura": timestamp}
+
+    def _asegurar_escritor(self) -> None:
+        """Arranca el hilo escritor en el primer guardado."""
+        with self._candado:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._escribir, name="recibos-escritor", daemon=True)
+                self._hilo.start()
+
+    def _escribir(self) -> None:
+        """Hilo escritor: confirma los recibos pendientes por lotes."""
+        conexion = None
+        while True:
+            lote = [self._cola.get()]
+            # Junta lo que llegue mientras tanto (otras sesiones guardando a la vez)
+            while len(lote) < self.max_lote:
+                try:
+                    lote.append(self._cola.get(timeout=self.espera_lote_s))
+                except queue.Empty:
+                    break
+            # Los que ya dejaron de esperar (timeout en guardar) no se escriben
+            lote = [pendiente for pendiente in lote if pendiente.tomar()]
+            if not lote:
+                continue
+            try:
+                # Si la base está ocupada el error llega a este lote y se reintenta en el siguiente
+                if conexion is None:
+                    conexion = self._conectar()
+                self._confirmar_lote(conexion, lote)
+            except Exception as error:  # el hilo sigue vivo; cada llamador recibe el error
+                for pendiente in lote:
+                    pendiente.error = error
+            for pendiente in lote:
+                pendiente.listo.set()
+
+            self._desde_compactacion += len(lote)
+            if conexion is not None and self._desde_compactacion >= COMPACTAR_CADA and self._cola.empty():
+                try:
+                    self._compactar(conexion)
+                except sqlite3.Error:
+                    pass
+
+    def _confirmar_lote(self, conexion: sqlite3.Connection, lote: List[_Pendiente]) -> None:
+        """Inserta un lote en una transacción (y amplía los esquemas si hay campos nuevos)."""
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            ids = []
+            esquemas_nuevos = {}
+            for pendiente in lote:
+                cursor = conexion.execute(
+                    "INSERT INTO recibos (tarifa, numero_servicio, mes, anio, campos, timestamp_captura) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    pendiente.fila,
+                )
+                ids.append(cursor.lastrowid)
+                tarifa = pendiente.fila[0]
+                conocidos = esquemas_nuevos.get(tarifa, self._esquemas.get(tarifa))
+                if conocidos is None or any(c not in conocidos for c in pendiente.campos):
+                    if tarifa not in esquemas_nuevos:
+                        # Otro proceso pudo ampliar el esquema: se parte de lo guardado (con el candado tomado)
+                        guardado = conexion.execute("SELECT campos FROM esquemas WHERE tarifa = ?", (tarifa,)).fetchone()
+                        conocidos = json.loads(guardado[0]) if guardado else []
+                    esquemas_nuevos[tarifa] = conocidos + [c for c in pendiente.campos if c not in conocidos]
+            for tarifa, campos in esquemas_nuevos.items():
+                conexion.execute(
+                    "INSERT INTO esquemas (tarifa, campos) VALUES (?, ?) "
+                    "ON CONFLICT (tarifa) DO UPDATE SET campos = excluded.campos",
+                    (tarifa, json.dumps(campos, ensure_ascii=False)),
+                )
+            conexion.execute("COMMIT")
+        except BaseException:
+            conexion.execute("ROLLBACK")
+            raise
+        self._esquemas.update(esquemas_nuevos)
+        for pendiente, id_recibo in zip(lote, ids):
+            pendiente.id = id_recibo
+
+    def _compactar(self, conexion: sqlite3.Connection) -> None:
+        """Vuelca el WAL a la base y lo trunca."""
+        conexion.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conexion.execute("PRAGMA optimize")
+        self._desde_compactacion = 0
+
+    def compactar(self) -> None:
+        """
+        Compacta el registro: vuelca el WAL a la base y lo trunca.
+
+        El escritor lo hace solo cada COMPACTAR_CADA recibos; como los recibos
+        nunca se borran, la base no deja páginas libres que requieran VACUUM.
+        """
+        conexion = self._conectar()
+        try:
+            self._compactar(conexion)
+        finally:
+            conexion.close()
+
+    def contar(self) -> int:
+        """Número de recibos guardados."""
+        conexion = self._conectar()
+        try:
+            # id es AUTOINCREMENT y no hay borrados: el último folio es el total
+            return conexion.execute("SELECT COALESCE(MAX(id), 0) FROM recibos").fetchone()[0]
+        finally:
+            conexion.close()
+
+    def esquemas(self) -> dict:
+        """
+        Campos variables registrados por tarifa.
+
+        Returns:
+            {tarifa: [campos en el orden en que aparecieron]}
+        """
+        conexion = self._conectar()
+        try:
+            return {tarifa: json.loads(campos) for tarifa, campos in conexion.execute("SELECT tarifa, campos FROM esquemas")}
+        finally:
+            conexion.close()
+
+    def iterar_csv(self, tamano_lote: int = LOTE_EXPORTACION) -> Iterator[bytes]:
+        """
+        Genera el histórico completo en CSV por bloques (HU-6.6).
+
+        Las columnas son COLUMNAS_EXPORTACION más la unión de los campos de
+        todos los esquemas (tabla esquemas, sin recorrer los recibos); en cada
+        fila los campos que no aplican a su tarifa quedan vacíos. Todo se lee
+        de una misma foto de la base: los recibos guardados durante la
+        exportación no aparecen a medias. El primer bloque (encabezado) sale
+        antes de leer cualquier recibo.
+
+        Args:
+            tamano_lote: Recibos por bloque
+
+        Yields:
+            Bloques del CSV en UTF-8 (el primero con BOM para que Excel reconozca los acentos)
+        """
+        conexion = self._conectar()
+        try:
+            # Transacción de lectura: en modo WAL fija la foto sin bloquear a los escritores
+            conexion.execute("BEGIN")
+            campos = []
+            for (campos_tarifa,) in conexion.execute("SELECT campos FROM esquemas ORDER BY tarifa"):
+                campos.extend(c for c in json.loads(campos_tarifa) if c not in campos)
+
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(COLUMNAS_EXPORTACION + campos)
+            yield buffer.getvalue().encode("utf-8-sig")
+
+            ultimo = 0
+            while True:
+                filas = conexion.execute(
+                    "SELECT id, tarifa, numero_servicio, mes, anio, timestamp_captura, campos "
+                    "FROM recibos WHERE id > ? ORDER BY id LIMIT ?",
+                    (ultimo, tamano_lote),
+                ).fetchall()
+                if not filas:
+                    break
+                buffer.seek(0)
+                buffer.truncate()
+                for *generales, campos_recibo in filas:
+                    valores = json.loads(campos_recibo)
+                    escritor.writerow(generales + [valores.get(c, "") for c in campos])
+                yield buffer.getvalue().encode("utf-8")
+                ultimo = filas[-1][0]
+            conexion.execute("COMMIT")
+        finally:
+            conexion.close()
+
+    def exportar_csv(self, destino: Path, tamano_lote: int = LOTE_EXPORTACION) -> int:
+        """
+        Escribe el histórico completo en un archivo CSV (ver iterar_csv).
+
+        Args:
+            destino: Ruta del CSV; se escribe aparte y se reemplaza al terminar
+            tamano_lote: Recibos por bloque
+
+        Returns:
+            Bytes escritos
+        """
+        destino = Path(destino)
+        tmp = destino.with_name(destino.name + ".tmp")
+        escritos = 0
+        with open(tmp, "wb") as archivo:
+            for bloque in self.iterar_csv(tamano_lote):
+                archivo.write(bloque)
+                escritos += len(bloque)
+        os.replace(tmp, destino)
+        return escritos
+
+
+@cache_resource
+def get_almacen_recibos() -> AlmacenRecibos:
+    """
+    Registro de recibos compartido por todas las sesiones del proceso
+    (un solo hilo escritor).
+
+    Returns:
+        AlmacenRecibos sobre RECIBOS_FILE
+    """
+    return AlmacenRecibos(RECIBOS_FILE)
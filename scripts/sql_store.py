@@ -0,0 +1,203 @@
+"""
+CFE Tariff Analyzer - SQL Store
+===============================
+Base SQLite local con el histórico de tarifas y el catálogo geográfico ya
+normalizados, para el backend "sqlite" de data_loader y para consultas SQL
+ad hoc de los analistas.
+
+Tablas:
+- tarifas: una fila por fila del CSV (más incrementos); `fila` conserva el
+  orden original, índices por serie (tarifa, region, anio, mes_numero) y por
+  partición (anio, tarifa)
+- geografia: catálogo estado/municipio/división
+- _meta: huellas de los archivos de origen (JSON)
+
+La base vive en disco y se comparte entre procesos: cada consulta trae solo
+las filas que pide, sin cargar el histórico en un DataFrame por worker.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Filas por lote al insertar
+LOTE_INSERCION = 200_000
+# Segundos que una escritura espera a que otra conexión libere la base
+ESPERA_ESCRITURA_S = 60
+
+INDICES_TARIFAS = {
+    "ix_tarifas_serie": ["tarifa", "region", "anio", "mes_numero"],
+    "ix_tarifas_particion": ["anio", "tarifa"],
+    "ix_tarifas_mes": ["mes_numero"],
+    "ix_tarifas_cargo": ["cargo"],
+}
+
+
+class AlmacenSQL:
+    """
+    Base SQLite de tarifas y geografía.
+
+    Las lecturas usan una conexión de solo lectura por hilo (Streamlit
+    atiende cada sesión en su propio hilo); las escrituras abren su propia
+    conexión y, al reconstruir, la base se escribe aparte y se reemplaza de
+    forma atómica.
+    """
+
+    def __init__(self, ruta: Path):
+        self.ruta = Path(ruta)
+        self._local = threading.local()
+        self._generacion = 0
+        self._candado = threading.Lock()
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Conexión de solo lectura del hilo actual (se renueva tras reconstruir)."""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None or self._local.generacion != self._generacion:
+            if conexion is not None:
+                conexion.close()
+            conexion = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conexion = conexion
+            self._local.generacion = self._generacion
+        return conexion
+
+    def existe(self) -> bool:
+        """True si la base ya fue construida."""
+        return self.ruta.exists()
+
+    def meta(self) -> Optional[dict]:
+        """
+        Huellas de los archivos con los que se construyó la base.
+
+        Returns:
+            Diccionario guardado por construir() y actualizado por agregar_tarifas(), o None si no hay base
+        """
+        if not self.existe():
+            return None
+        try:
+            fila = self._conexion().execute("SELECT valor FROM _meta WHERE clave = 'origen'").fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(fila[0]) if fila else None
+
+    def construir(self, lotes_tarifas: Iterable[pd.DataFrame], geografia: pd.DataFrame, meta: dict) -> None:
+        """
+        Crea la base desde cero en un archivo temporal y la reemplaza.
+
+        Args:
+            lotes_tarifas: DataFrames normalizados en el orden del CSV
+            geografia: Catálogo geográfico normalizado
+            meta: Huellas de los archivos de origen
+        """
+        tmp = self.ruta.with_suffix(".sqlite.tmp")
+        if tmp.exists():
+            tmp.unlink()
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        conexion = sqlite3.connect(tmp)
+        try:
+            conexion.execute("PRAGMA journal_mode = OFF")
+            conexion.execute("PRAGMA synchronous = OFF")
+            siguiente = 0
+            for lote in lotes_tarifas:
+                siguiente = self._insertar(conexion, lote, siguiente)
+            geografia.reset_index(drop=True).rename_axis("fila").to_sql(
+                "geografia", conexion, index=True, if_exists="replace"
+            )
+            for nombre, columnas in INDICES_TARIFAS.items():
+                conexion.execute(f"CREATE INDEX {nombre} ON tarifas ({', '.join(columnas)})")
+            conexion.execute("CREATE INDEX ix_geografia ON geografia (estado, municipio, division)")
+            conexion.execute("CREATE TABLE _meta (clave TEXT PRIMARY KEY, valor TEXT)")
+            conexion.execute("INSERT INTO _meta VALUES ('origen', ?)", (json.dumps(meta),))
+            conexion.commit()
+        finally:
+            conexion.close()
+        with self._candado:
+            os.replace(tmp, self.ruta)
+            self._generacion += 1
+
+    def agregar_tarifas(self, incrementos: List[Tuple[dict, pd.DataFrame]]) -> List[dict]:
+        """
+        Agrega incrementos mensuales al final de la tabla de tarifas.
+
+        Todo ocurre en una transacción BEGIN IMMEDIATE: las huellas registradas
+        en _meta se releen dentro de ella y se omiten los incrementos que otra
+        sesión o proceso ya agregó, así que un archivo nunca se inserta dos veces.
+
+        Args:
+            incrementos: (huella con "nombre", filas normalizadas) por archivo, en orden
+
+        Returns:
+            Huellas de los incrementos agregados (vacía si ya estaban todos)
+        """
+        conexion = sqlite3.connect(self.ruta, timeout=ESPERA_ESCRITURA_S, isolation_level=None)
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                meta = json.loads(conexion.execute("SELECT valor FROM _meta WHERE clave = 'origen'").fetchone()[0])
+                registrados = {inc["nombre"] for inc in meta.get("incrementos", [])}
+                agregados = [(huella, df) for huella, df in incrementos if huella["nombre"] not in registrados]
+                siguiente = conexion.execute("SELECT COALESCE(MAX(fila) + 1, 0) FROM tarifas").fetchone()[0]
+                for _, df in agregados:
+                    siguiente = self._anexar(conexion, df, siguiente)
+                if agregados:
+                    meta["incrementos"] = meta.get("incrementos", []) + [huella for huella, _ in agregados]
+                    conexion.execute("UPDATE _meta SET valor = ? WHERE clave = 'origen'", (json.dumps(meta),))
+                conexion.execute("COMMIT")
+            except BaseException:
+                conexion.execute("ROLLBACK")
+                raise
+        finally:
+            conexion.close()
+        if agregados:
+            with self._candado:
+                self._generacion += 1
+        return [huella for huella, _ in agregados]
+
+    @staticmethod
+    def _insertar(conexion: sqlite3.Connection, df: pd.DataFrame, inicio: int) -> int:
+        """Inserta un lote con fila = inicio.. y devuelve la siguiente fila libre."""
+        lote = df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+        lote.index = pd.RangeIndex(inicio, inicio + len(lote), name="fila")
+        lote.to_sql("tarifas", conexion, index=True, if_exists="append", chunksize=LOTE_INSERCION)
+        return inicio + len(lote)
+
+    @staticmethod
+    def _anexar(conexion: sqlite3.Connection, df: pd.DataFrame, inicio: int) -> int:
+        """
+        Como _insertar, pero sin confirmar la transacción abierta (to_sql hace
+        commit por su cuenta); la tabla de tarifas ya debe existir.
+        """
+        columnas = ["fila"] + list(df.columns)
+        nombres = ", ".join(f'"{col}"' for col in columnas)
+        sql = f"INSERT INTO tarifas ({nombres}) VALUES ({', '.join('?' for _ in columnas)})"
+        lote = df.astype(object).where(df.notna(), None)
+        lote.index = pd.RangeIndex(inicio, inicio + len(lote))
+        for desde in range(0, len(lote), LOTE_INSERCION):
+            conexion.executemany(sql, lote.iloc[desde:desde + LOTE_INSERCION].itertuples(index=True, name=None))
+        return inicio + len(lote)
+
+    def consultar(self, sql: str, parametros: tuple = ()) -> pd.DataFrame:
+        """
+        Ejecuta una consulta de solo lectura.
+
+        Args:
+            sql: Sentencia SELECT (parámetros con ?)
+            parametros: Valores de los parámetros
+
+        Returns:
+            DataFrame con el resultado
+        """
+        return pd.read_sql_query(sql, self._conexion(), params=parametros)
+
+    def columnas(self, tabla: str) -> List[str]:
+        """Columnas de una tabla en el orden de creación (sin la llave fila)."""
+        info = self._conexion().execute(f"PRAGMA table_info({tabla})").fetchall()
+        return [fila[1] for fila in info if fila[1] != "fila"]
+
+    def tamano_bytes(self) -> int:
+        """Tamaño del archivo de la base."""
+        return self.ruta.stat().st_size if self.existe() else 0